@@ -3,17 +3,43 @@
 """
 import falcon
 import falcon.asgi
+import functools
 import threading
 from shared.SharedServices import force_type
-from falc.FalconResources import GetManyResource, RESTResource
+from api.APIExecutor import APIExecutor
+from api.MicroBatcher import MicroBatcher
+from shared.JSONEncoder import get_encoder
+from falc.FalconResources import GetManyResource, RESTResource, StatsResource, call_controller
+from falc.CompressionMiddleware import CompressionMiddleware
 
 
 class FalconAPI: 
-	def __init__ (self, apic):
+	def __init__ (self, apic, workers=8, max_pending=64, timeout=30.0, encoder=None, compress_min=1024, compress_level=6, etags='body', batch_window=None, batch_keys=100, post_limit=64 * 1024):
 		"""Class to run api via falcon.
 		
 		Attributes:
 			apic (api.APIController): The api controller to extend.
+			workers (int, optional): The amount of threads to run database work on.
+			max_pending (int, optional): The most requests allowed to queue for a thread before 
+				being rejected with a 503.
+			timeout (float, optional): Seconds a request waits for its database work before 
+				failing with a 504. If 0, waits forever.
+			encoder (str, optional): The name of the JSON encoder to use, see `shared.JSONEncoder`. 
+				Defaults to the fastest one installed.
+			compress_min (int, optional): The smallest response body in bytes compressed for 
+				clients accepting gzip or deflate. If None, responses are never compressed.
+			compress_level (int, optional): The zlib compression level, from 1 to 9.
+			etags (str, optional): How entity tags are made for GET responses. 'body' hashes 
+				the body, 'versions' uses the versions of the tables read so a request with a 
+				current tag skips the database too, but only notices writes made through this 
+				api. If None, no entity tags are sent.
+			batch_window (float, optional): Seconds lookups by id wait to be gathered with those 
+				of concurrent requests into one query per model, i.e. 0.002. If None, each 
+				lookup is its own query.
+			batch_keys (int, optional): The most ids gathered into one query, a full batch 
+				is run without waiting out the window.
+			post_limit (int, optional): The largest body in bytes accepted by post requests, 
+				raise it for bulk loads.
 			
 		Raises:
 			TypeError: If a non APIController is passed as the apic. 
@@ -22,12 +48,23 @@ class FalconAPI:
 		force_type(apic, 'api.APIController.APIController', caller=caller)
 		
 		self.apic = apic
-		self.gm = GetManyResource(self.apic)
-		self.r = RESTResource(self.apic)
+		self.executor = APIExecutor(workers=workers, max_pending=max_pending, timeout=timeout)
+		self.encoder = get_encoder(encoder)
+		self.batcher = None
+		if batch_window != None:
+			fetch = functools.partial(call_controller, self.apic, self.executor, 'context_query_ids')
+			self.batcher = MicroBatcher(fetch, window=batch_window, max_keys=batch_keys)
+		self.gm = GetManyResource(self.apic, self.executor, self.encoder, etags=etags, post_limit=post_limit)
+		self.r = RESTResource(self.apic, self.executor, self.encoder, etags=etags, batcher=self.batcher)
+		self.s = StatsResource(self.executor, self.apic.cache, self.apic.flight, self.apic.objects, self.batcher)
+		self.middleware = []
+		if compress_min != None:
+			self.middleware.append(CompressionMiddleware(min_size=compress_min, level=compress_level))
 	
 	def run_app(self):
-		self.app = falcon.asgi.App()
+		self.app = falcon.asgi.App(middleware=self.middleware)
 		self.app.add_route('/api/{model}', self.gm)
 		self.app.add_route('/api/{model}/{id}', self.r)
+		self.app.add_route('/stats', self.s)
 		return self.app
 		
\ No newline at end of file
@@ -2,16 +2,21 @@
 
 Attributes:
 	API_REL_CHAR (str): Character to separate relations in API naming scheme.
+	MAX_BIND (int): The most values bound into one statement, the lowest limit of the 
+		providers (sqlite before 3.32).
 """
 
 import copy
+from db.AliasName import AliasName
 from db.Database import Database
 from db.DatabaseTable import DatabaseTable
 from db.DatabaseField import DatabaseField
 from db.ProtectionOption import ProtectionOption
 from shared.SharedServices import force_type, is_type
+from api.RowDecoder import RowDecoder
 
 API_REL_CHAR = '_'
+MAX_BIND = 999
 
 class APIContext:
 	"""Class representing an API context.
@@ -23,6 +28,14 @@ class APIContext:
 		schema (list of Database): The schema for the database as a list of Databases.
 		table (DatabaseTable): The table to create the context for.
 		model (dict of DatabaseField): The resultant model for this context.
+		api_name (AliasName): The names this context can be requested by in the api.
+		page_lim (int, optional): Max amount of results to return at once for this context,
+			overriding the api wide limit. If 0, returns all. Defaults to None, using the api limit.
+		decoder (RowDecoder): The compiled decoder for result rows, built on first use.
+		tables (list of DatabaseTable): The tables of the context, its own table first. 
+		joins (list of str): The join conditions, `joins[i]` joining `tables[i + 1]` to its parent.
+		parents (list of int): The index of each table's parent in `tables`, None for the 
+			context's own table.
 		
 	"""
 	def __init__ (self, schema, table):
@@ -33,12 +46,19 @@ class APIContext:
 		force_type(table, 'db.DatabaseTable.DatabaseTable', caller=caller)
 		
 		self.name = table.fq_name.replace('.', API_REL_CHAR)
+		aliases = []
+		for a in table.api_name.aliases:
+			aliases.append(a.replace('.', API_REL_CHAR))
+		self.api_name = AliasName(self.name, aliases)
+		self.page_lim = None
+		self.decoder = None
 		self.schema = schema
 		self.table = table.clone()
 		self.tables = []
 		self.tables.append(self.table)
 		self.reqs = []
 		self.joins = []
+		self.parents = [None]
 		
 		self.gen_model()
 		
@@ -64,18 +84,21 @@ class APIContext:
 				joiner = self.tables[0].db_name + '.' + f.name + ' = t' + str(len(self.tables) + 1) + '.' + f.relation.name
 				self.joins.append(joiner)
 				self.model[f.fq_name + '_branch'] = {}
-				self.branch_rel(self.model[f.fq_name + '_branch'], f)
+				self.branch_rel(self.model[f.fq_name + '_branch'], f, 0)
 	
 	
-	def branch_rel (self, parent, branch_field):
+	def branch_rel (self, parent, branch_field, parent_index=0):
 		"""Recursive method to follow branching relations out of the main table context.
 		
 		Args:
 			branch_field (DatabaseField): The field with the relation to branch out on. 
+			parent_index (int, optional): The index in `tables` of the table holding the field.
 		"""
 		api_name_p1 = branch_field.api_name.name + API_REL_CHAR
 		parent_table = branch_field.relation.parent
 		self.tables.append(parent_table.clone())
+		self.parents.append(parent_index)
+		index = len(self.tables) - 1
 		parent_table = self.tables[len(self.tables) - 1]
 		tid = 't' + str(len(self.tables))
 		self.tables[len(self.tables) - 1].db_name = tid
@@ -95,7 +118,7 @@ class APIContext:
 				joiner = parent_table.db_name + '.' + f.name + ' = t' + str(len(self.tables) + 1) + '.' + f.relation.name
 				self.joins.append(joiner)
 				parent[f.fq_name + '_branch'] = {}
-				self.branch_rel(parent[f.fq_name + '_branch'], parent[f.fq_name])
+				self.branch_rel(parent[f.fq_name + '_branch'], parent[f.fq_name], index)
 				
 	
 	def types_view (self):
@@ -187,153 +210,92 @@ class APIContext:
 		return sql
 		
 	def post_sql_parts (self, packed):
-		"""Method to generate first pieces of sql queries for insertions.
+		"""Method to generate the sql queries for insertions.
+		
+		Values are bound separately from the statement text, so every insertion into 
+		a table shares the same statement.
 		
 		Args:
 			packed (dict): Values packed into and paralleling the model dict.
 		
 		Returns:
-			(list of list of str, list of DatabaseField): A list of insertion statements to be appended onto with values.
+			list of (str, tuple): The insertion statements, related tables first, and their values.
 		"""
 		sql = []
+		for fq_name, values in self.__post_rows(packed):
+			sql.append((self.__insert_sql(fq_name, len(values)), values))
+		return sql
 		
-		s = 'INSERT INTO ' + self.tables[0].fq_name + '\nVALUES\n('
-		for key in packed:
-			if '_branch' not in key:
-				if key + '_branch' in packed:
-					if 'varchar' in self.model[key].typ:
-						s += "'" + str(packed[key]) + "',"
-					else:
-						s += str(packed[key]) + ','
-					self.__post_sql_parts_rec(packed[key + '_branch'], self.model[key + '_branch'], self.model[key].relation, sql)
-				else:
-					if 'varchar' in self.model[key].typ:
-						s += "'" + str(packed[key]) + "',"
-					else:
-						s += str(packed[key]) + ','
-		s = s[:len(s) - 1]
-		s += ');'
-		sql.append(s)
+	def post_many_sql_parts (self, packs, chunk=500):
+		"""Method to generate multi-row sql queries inserting many instances at once.
 		
-		return sql
+		The rows of each table are inserted together, in statements of at most `chunk` 
+		rows and `MAX_BIND` values.
 		
-	def __post_sql_parts_rec (self, pack_node, model_node, reld, sql):
-		pt = reld.parent
-		s = 'INSERT INTO ' + pt.fq_name + '\nVALUES\n('
-		for key in pack_node:
-			if '_branch' not in key:
-				if key + '_branch' in pack_node:
-					if 'varchar' in model_node[key].typ:
-						s += "'" + pack_node[key] + "',"
-					else:
-						s += str(pack_node[key]) + ','
-					self.__post_sql_parts_rec(pack_node[key + '_branch'], model_node[key + '_branch'], sql)
-				else:
-					if 'varchar' in model_node[key].typ:
-						s += "'" + pack_node[key] + "',"
-					else:
-						s += str(pack_node[key]) + ','
-		s = s[:len(s) - 1]
-		s += ');'
-		sql.append(s)
+		Args:
+			packs (list of dict): The values of each instance, packed into and paralleling 
+				the model dict.
+			chunk (int, optional): The most rows inserted by one statement.
 		
-	def del_sql_parts (self, packed):
+		Returns:
+			list of (str, tuple): The insertion statements, related tables first, and their values.
+		"""
+		rows = {}
+		for packed in packs:
+			for fq_name, values in self.__post_rows(packed):
+				if fq_name not in rows:
+					rows[fq_name] = []
+				rows[fq_name].append(values)
+				
 		sql = []
-		s = 'DELETE FROM ' + self.tables[0].fq_name + ' WHERE '
+		for fq_name in rows:
+			width = len(rows[fq_name][0])
+			size = max(1, min(chunk, MAX_BIND // max(1, width)))
+			for i in range(0, len(rows[fq_name]), size):
+				part = rows[fq_name][i:i + size]
+				values = tuple([v for row in part for v in row])
+				sql.append((self.__insert_sql(fq_name, width, len(part)), values))
+		return sql
+		
+	def __post_rows (self, packed):
+		"""Lists the rows to insert for an instance, related tables first.
+		
+		Returns:
+			list of (str, tuple): The fully qualified name of each table and its row of values.
+		"""
+		rows = []
+		values = []
 		for key in packed:
 			if '_branch' not in key:
-				if 'PRI' in self.model[key].key:
-					if 'char' in self.model[key].typ:
-						s += self.model[key].name + "='" + str(packed[key]) + "'"
-					else:
-						s += self.model[key].name + '=' + str(packed[key])
+				values.append(packed[key])
 				if key + '_branch' in packed:
-					rel_t = self.model[key].relation.parent
-					self.__del_sql_parts_rec(packed[key + '_branch'], self.model[key + '_branch'], rel_t, sql)
+					self.__post_rows_rec(packed[key + '_branch'], self.model[key + '_branch'], self.model[key].relation, rows)
+		rows.append((self.tables[0].fq_name, tuple(values)))
+		return rows
 		
-		s += ';'
-		sql.append(s)
-		return sql
-		
-	def __del_sql_parts_rec (self, pack_node, model_node, rel_t, sql):
-		s = 'DELETE FROM ' + rel_t.fq_name + ' WHERE '
+	def __post_rows_rec (self, pack_node, model_node, reld, rows):
+		pt = reld.parent
+		values = []
 		for key in pack_node:
 			if '_branch' not in key:
-				if 'PRI' in model_node[key].key:
-					if 'char' in model_node[key].typ:
-						s += model_node[key].name + "='" + str(pack_node[key]) + "'"
-					else:
-						s += model_node[key].name + '=' + str(pack_node[key])
+				values.append(pack_node[key])
 				if key + '_branch' in pack_node:
-					rel_t = model_node[key].relation.parent
-					self.__del_sql_parts_rec(pack_node[key + '_branch'], model_node[key + '_branch'], rel_t, sql)
-					
-		s += ';'
-		sql.append(s)
-		
-	def to_model_pack (self, pack):
-		model_pack = {}
-		for key in self.model:
-			if '_branch' not in key:
-				if key + '_branch' in self.model:
-					model_pack[key] = self.model[key].relation.api_name.name
-					model_pack[key + '_branch'] = {}
-					model_pack[key] = self.__to_model_pack_rec(model_pack[key + '_branch'], pack[self.model[key].api_name.name], self.model[key + '_branch'], model_pack[key])
-				else:
-					model_pack[key] = pack[self.model[key].api_name.name]
-		return model_pack
-		
-	def __to_model_pack_rec (self, hook, val_node, model_node, rel_f):
+					self.__post_rows_rec(pack_node[key + '_branch'], model_node[key + '_branch'], model_node[key].relation, rows)
+		rows.append((pt.fq_name, tuple(values)))
 		
-		retval = None
+	def __insert_sql (self, fq_name, count, rows=1):
+		row = '(' + ', '.join(['%s'] * count) + ')'
+		return 'INSERT INTO ' + fq_name + '\nVALUES\n' + ', '.join([row] * rows) + ';'
 		
-		for key in model_node:
-			if model_node[key].name == rel_f:
-				retval = val_node[model_node[key].api_name.name]
-			if '_branch' not in key:
-				if key + '_branch' in model_node:
-					hook[key] = model_node[key].relation.api_name.name
-					hook[key + '_branch'] = {}
-					hook[key] = self.__to_model_pack_rec(hook[key + '_branch'], val_node[model_node[key].api_name.name], model_node[key + '_branch'], hook[key])
-				else:
-					hook[key] = val_node[model_node[key].api_name.name]
-		return retval
-	
 	def unpack_single (self, result):
 		"""Unpacks a single instance of this context into a dict.
 		
 		Args:
 			result (tuple): The result of a sql query from this context.
 		"""
-		fields = self.flat_fields()
-		values = []
-		for item in result:
-			values.append(item)
-			
-		structure = self.types_view()
-		
-		for key in structure:
-			if not is_type(structure[key], 'dict'):
-				ind = -1
-				for f in fields:
-					if f.api_name.name == key:
-						ind = fields.index(f)
-				structure[key] = values[ind]
-			else:
-				self.__unpack_single_rec(fields, values, structure[key])
-					
-		return structure
-		
-	def __unpack_single_rec (self, fields, values, parent):
-		for key in parent:
-			if not is_type(parent[key], 'dict'):
-				ind = -1
-				for f in fields:
-					if f.api_name.name == key:
-						ind = fields.index(f)
-				parent[key] = values[ind]
-			else:
-				self.__unpack_single_rec(fields, values, parent[key])		
+		if self.decoder == None:
+			self.decoder = RowDecoder(self)
+		return self.decoder.decode(result)
 	
 	def pack_api (self, packed):
 		"""Repacks model packed dict into dict with valid api key names.
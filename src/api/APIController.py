@@ -5,11 +5,116 @@ Attributes:
 	NONSP_TYPES (list of str): The types for each of the common params.
 """
 
-NONSP_PARAMS = ['order_by', 'order_dir', 'page', 'q']
-NONSP_TYPES = ['str', 'str', 'int', 'str']
+NONSP_PARAMS = ['order_by', 'order_dir', 'page', 'page_size', 'q', 'cursor', 'fields', 'expand']
+NONSP_TYPES = ['str', 'str', 'int', 'int', 'str', 'str', 'str', 'str']
 API_REL_CHAR = '_'
 
+import base64
+import binascii
+import json
 from shared.SharedServices import force_type, is_type
+from api.ContextPlan import ContextPlan
+from api.ContextRegistry import ContextRegistry
+from api.RowStream import RowStream
+from api.TableVersions import TableVersions
+from api.ResultCache import ResultCache, estimate_size
+from api.SingleFlight import SingleFlight
+from api.ObjectCache import ObjectCache, NOT_FOUND
+from api.DataLoader import DataLoader
+from api.Relation import MAX_IN
+from api.APIContext import MAX_BIND
+from db.ConstraintError import ConstraintError
+
+def encode_cursor (values):
+	"""Encodes the position of a keyset page into an opaque continuation token.
+	
+	Args:
+		values (list): The values identifying the position, i.e. the last seen keys.
+		
+	Returns:
+		str: The url safe token.
+	"""
+	raw = json.dumps(values, default=str, separators=(',', ':')).encode('utf-8')
+	return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+	
+def decode_cursor (token):
+	"""Decodes a continuation token made by `encode_cursor`.
+	
+	Args:
+		token (str): The token to decode.
+		
+	Returns:
+		list: The values encoded in the token, None if the token is malformed.
+	"""
+	try:
+		raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+		values = json.loads(raw.decode('utf-8'))
+	except (binascii.Error, ValueError):
+		return None
+	if not is_type(values, 'list'):
+		return None
+	return values
+
+class StreamRequest:
+	"""Class marking a query yielded by a query generator whose rows should be streamed.
+	
+	The drivers send back an iterator of row chunks instead of a list of rows.
+	
+	Attributes:
+		sql (str): The sql query to execute.
+		params (tuple): Values to bind to the %s placeholders in the query.
+		size (int): The most rows per chunk.
+	"""
+	def __init__ (self, sql, params, size):
+		self.sql = sql
+		self.params = params
+		self.size = size
+
+class SharedQuery:
+	"""Class marking a query yielded by a query generator that identical concurrent 
+	queries may share.
+	
+	The drivers run the query through the controller's `SingleFlight`, so callers 
+	yielding equal keys at the same time are sent back the same rows.
+	
+	Attributes:
+		key (tuple): Identifies the query, equal keys must mean interchangeable results.
+		sql (str): The sql query to execute.
+		params (tuple): Values to bind to the %s placeholders in the query.
+	"""
+	def __init__ (self, key, sql, params):
+		self.key = key
+		self.sql = sql
+		self.params = params
+
+class TransactionRequest:
+	"""Class marking queries yielded by a query generator that must all succeed or fail together.
+	
+	The drivers run `work` to completion inside one transaction, so it may read rows and 
+	decide on the statements to run from them, then send back the value it returns. If 
+	a statement fails they roll back and throw the error into the generator instead.
+	
+	Attributes:
+		work (generator): A query generator yielding `(sql, params)` tuples only, see 
+			`run_statements` for running a list of statements.
+	"""
+	def __init__ (self, work):
+		self.work = work
+
+def run_statements (statements):
+	"""Query generator running statements in order.
+	
+	Args:
+		statements (list of (str, tuple)): The sql statements and the values to bind to 
+			their %s placeholders.
+			
+	Returns:
+		list of list of tuple: The rows of each statement.
+	"""
+	rows = []
+	for s in statements:
+		rows.append((yield s))
+	return rows
 
 class APIController:
 	"""Class for handling sql query translation to api responses.
@@ -21,21 +126,150 @@ class APIController:
 	Attributes:
 		dbc (DatabaseConnection): Valid connection to the database for querying.
 		contexts (list of APIContext): The contexts to include in the api.
-		page_lim (int): Max amount of results to return at once. If 0, returns all.
+		registry (ContextRegistry): The contexts indexed by name and alias.
+		page_lim (int): Max amount of results to return at once. If 0, returns all. Contexts 
+			may set their own `page_lim` to override it.
+		stream_chunk (int, optional): The most rows read from the database at once when 
+			streaming results.
+		cache_bytes (int, optional): The memory budget of the query result cache. If 0, 
+			results aren't cached.
+		cache_ttl (float, optional): Seconds a cached result is kept. If 0, results are kept 
+			until a write invalidates them or they are evicted.
+		versions (TableVersions): The versions of the tables written through the api.
+		cache (ResultCache): The query result cache, None if results aren't cached.
+		coalesce (bool, optional): Whether identical reads running at the same time share 
+			one database query.
+		flight (SingleFlight): Coalesces identical reads, None if reads aren't coalesced.
+		object_cache (int, optional): The most objects held by the cache of single objects 
+			read by id. If 0, objects aren't cached.
+		object_ttl (float, optional): Seconds a cached object is kept. If 0, objects are kept 
+			until a delete invalidates them or they are evicted.
+		objects (ObjectCache): The cache of single objects, None if objects aren't cached.
+		insert_chunk (int, optional): The most rows inserted by one statement when creating 
+			many instances at once.
+		plans (dict of [str, ContextPlan]): The precompiled query plan of each context, by name.
 	"""
-	def __init__ (self, dbc, contexts, page_lim):
+	def __init__ (self, dbc, contexts, page_lim, stream_chunk=500, cache_bytes=0, cache_ttl=60.0, coalesce=True, object_cache=0, object_ttl=0.0, insert_chunk=500):
 		caller = 'APIController.__init__'
 		force_type(dbc, 'db.DatabaseConnection.DatabaseConnection', caller=caller)
 		force_type(contexts, 'list', caller=caller)
 		for c in contexts:
 			force_type(c, 'api.APIContext.APIContext', caller=caller)
 		force_type(page_lim, 'int', caller=caller)
+		force_type(stream_chunk, 'int', caller=caller)
+		force_type(cache_bytes, 'int', caller=caller)
+		force_type(object_cache, 'int', caller=caller)
+		force_type(insert_chunk, 'int', caller=caller)
 		
 		self.dbc = dbc
-		self.contexts = contexts
+		self.registry = ContextRegistry()
 		self.page_lim = page_lim
+		self.stream_chunk = stream_chunk
+		self.versions = TableVersions()
+		self.cache = None
+		if cache_bytes > 0:
+			self.cache = ResultCache(self.versions, max_bytes=cache_bytes, ttl=cache_ttl)
+		self.flight = None
+		if coalesce:
+			self.flight = SingleFlight()
+		self.objects = None
+		if object_cache > 0:
+			self.objects = ObjectCache(max_entries=object_cache, ttl=object_ttl)
+		self.insert_chunk = insert_chunk
+		
+		self.plans = {}
+		for c in contexts:
+			self.add_context(c)
+			
+	@property
+	def contexts (self):
+		"""list of APIContext: The contexts currently included in the api."""
+		return list(self.registry)
+		
+	def add_context (self, context):
+		"""Adds a context to the api, or replaces the context of the same name.
+		
+		Args:
+			context (APIContext): The context to add.
+			
+		Raises:
+			TypeError: If a non APIContext is passed.
+			ValueError: If the context's name or an alias is taken by another context.
+		"""
+		caller = 'APIController.add_context'
+		force_type(context, 'api.APIContext.APIContext', caller=caller)
+		
+		plan = ContextPlan(context)
+		old = self.registry.get(context.name)
+		old_plan = self.plans.get(context.name)
+		if old is not None and old is not context:
+			self.registry.remove(context.name)
+		try:
+			self.plans[context.name] = plan
+			self.registry.add(context)
+		except ValueError:
+			if old is not None:
+				self.plans[context.name] = ContextPlan(old)
+				self.registry.add(old)
+			else:
+				self.plans.pop(context.name, None)
+			raise
+		if old_plan != None:
+			self.__forget(context.name, [old_plan, plan])
+		
+	def remove_context (self, context_name):
+		"""Removes a context from the api.
+		
+		Args:
+			context_name (str): The name or an alias of the context to remove.
+			
+		Returns:
+			APIContext: The removed context.
+			
+		Raises:
+			ValueError: If no context goes by the name.
+		"""
+		context = self.registry.remove(context_name)
+		plan = self.plans.pop(context.name, None)
+		if plan != None:
+			self.__forget(context.name, [plan])
+		return context
+		
+	def __forget (self, context_name, plans):
+		"""Drops the results cached for a context whose plan is replaced or removed.
+		
+		Cached results are keyed by context name and rows, so they would be decoded with 
+		the new plan. The tables the plans read are moved on to new versions, which also 
+		keeps queries already running from caching or sharing rows of the old plan.
+		"""
+		tables = []
+		for plan in plans:
+			tables += [t for t in plan.tables if t not in tables]
+		self.versions.bump(tables)
+		if self.objects != None:
+			self.objects.invalidate([context_name])
 		
 	
+	def context_versions (self, context_name):
+		"""Gets the versions of the tables a context reads.
+		
+		Results of the context can only have changed through the api if the versions have.
+		
+		Args:
+			context_name (str): The api name ('database_table') of the context.
+			
+		Returns:
+			(str, tuple of int): The name of the context and the versions of its tables, None 
+				if no context goes by the name.
+		"""
+		context = self.registry.get(context_name)
+		if context == None:
+			return None
+		plan = self.plans.get(context.name)
+		if plan == None:
+			return None
+		return context.name, self.versions.snapshot(plan.tables)
+		
 	def context_query_multiple (self, context_name, args):
 		"""Queries for multiple instances of a context using params.
 		
@@ -50,15 +284,50 @@ class APIController:
 		Raises:
 			TypeError: If the arg types are unexpected.
 		"""
+		return self.__run(self.__query_multiple(context_name, args))
+		
+	async def context_query_multiple_async (self, context_name, args):
+		"""Awaitable version of `context_query_multiple` running on the async provider.
+		"""
+		return await self.__run_async(self.__query_multiple(context_name, args))
+		
+	def context_stream_multiple (self, context_name, args):
+		"""Queries for multiple instances of a context using params, streaming the results.
+		
+		Takes the same params as `context_query_multiple`, but results are returned as a 
+		`RowStream` so they can be written either decoded or as row tuples. When the results 
+		are unbounded, meaning no paging applies, the stream reads the rows from the database 
+		a chunk at a time and holds a database connection until it is exhausted. An empty 
+		unbounded stream means no results were found. A page is read up front into a single 
+		chunk, its continuation token in `next_cursor` when keyset paged.
+		
+		Args:
+			context_name (str): The api name ('database_table') of the context.
+			args (dict): The parameters from the request. 
+			
+		Returns:
+			RowStream or str, int: The streamed results or the error message, and an 
+						http response code.
+		
+		Raises:
+			TypeError: If the arg types are unexpected.
+		"""
+		return self.__run(self.__query_multiple(context_name, args, stream=True))
+		
+	async def context_stream_multiple_async (self, context_name, args):
+		"""Awaitable version of `context_stream_multiple` running on the async provider.
+		
+		The chunks of the returned `RowStream` are iterated with `async for`.
+		"""
+		return await self.__run_async(self.__query_multiple(context_name, args, stream=True))
+		
+	def __query_multiple (self, context_name, args, stream=False):
 		result = []
 		caller = 'APIController.context_query_multiple'
 		force_type(context_name, 'str', caller=caller)
 		force_type(args, 'dict', caller=caller)
 		
-		context = None
-		for c in self.contexts:
-			if c.name == context_name:
-				context = c
+		context = self.registry.get(context_name)
 		
 		if context == None:
 			return "Bad model/context requested: '" + context_name + "'", 404
@@ -66,125 +335,399 @@ class APIController:
 		if len(context.tables) < 1:
 			return "Bad model/context processing: '" + context_name + "'", 500
 			
-		if 'page' in args and self.page_lim == 0:
+		plan = self.plans[context.name]
+			
+		page_lim = self.page_lim
+		if context.page_lim != None:
+			page_lim = context.page_lim
+			
+		if 'cursor' in args:
+			if 'page' in args:
+				return "Bad parameters: 'cursor' and 'page' can't be combined", 400
+			if plan.key_field == None:
+				return "Bad parameter: 'cursor' needs a primary key on '" + context_name + "'", 400
+			if page_lim == 0 and 'page_size' not in args:
+				return "Missing 'page_size' parameter, required with 'cursor'", 400
+			try:
+				page_size = int(args.get('page_size', page_lim))
+			except ValueError:
+				return "Bad parameter: 'page_size' must be an integer", 400
+			if page_size < 1:
+				return "Bad parameter: 'page_size' must be at least 1", 400
+			if page_lim != 0 and page_size > page_lim:
+				page_size = page_lim
+		elif 'page' in args and page_lim == 0:
 			return 'Bad \'page\' parameter, api not using paging', 400
-		if 'page' not in args and self.page_lim != 0:
+		elif 'page' not in args and page_lim != 0:
 			return 'Missing \'page\' parameter, api requires paging', 400
+		elif 'page_size' in args and page_lim == 0:
+			return 'Bad \'page_size\' parameter, api not using paging', 400
 			
-		fields = context.flat_fields()
-		valid_params = []
-		param_types = []
-		for f in fields:
-			valid_params.append(f.api_name.name)
-			if 'char' in f.typ or 'text' in f.typ:
-				param_types.append('str')
-			elif 'tinyint' in f.typ:
-				param_types.append('bool')
-			elif 'int' in f.typ:
-				param_types.append('int')
-			elif 'float' in f.typ or 'real' in f.typ:
-				param_types.append('float')
+		if page_lim != 0 and 'cursor' not in args:
+			try:
+				page = int(args['page'])
+				page_size = int(args.get('page_size', page_lim))
+			except ValueError:
+				return "Bad parameters: 'page' and 'page_size' must be integers", 400
+			if page < 1 or page_size < 1:
+				return "Bad parameters: 'page' and 'page_size' must be at least 1", 400
+			if page_size > page_lim:
+				page_size = page_lim
+		
+		names = None
+		used = []
+		if 'fields' in args:
+			names = []
+			for n in args['fields'].split(','):
+				if n in plan.by_api:
+					names.append(n)
+				elif n in plan.branches:
+					names += plan.branches[n]
+				else:
+					return "Bad parameter: 'fields' has no field '" + n + "'", 400
+					
+		expand = None
+		if 'expand' in args:
+			if 'fields' in args:
+				return "Bad parameters: 'fields' and 'expand' can't be combined", 400
+			expand = set()
+			for n in args['expand'].split(','):
+				if n == '':
+					continue
+				if n not in plan.relations_by_name:
+					return "Bad parameter: 'expand' has no relation '" + n + "'", 400
+				expand.add(n)
+				expand.update(plan.relations_by_name[n].ancestors)
+			names = list(plan.root_names)
+			
+		conditions = []
+		params = []
+		ids, error = self.__filters(plan, args, conditions, params, used)
+		if error != None:
+			return error
+		extra = []
+		if ids != None and names != None and plan.key_field.api_name.name not in names:
+			extra.append(plan.key_field)
+				
+		filters = (list(conditions), list(params))
+		in_order = ids != None and 'order_by' not in args and 'cursor' not in args
+					
+		suffix = ''
+		if 'order_by' in args or 'order_dir' in args:
+			if 'order_by' in args and 'order_dir' in args:
+				if args['order_by'] not in plan.by_api:
+					return "Bad parameter: 'order_by' not a valid field", 400
+				this_f = plan.by_api[args['order_by']]
+				used.append(args['order_by'])
+				if args['order_dir'].upper() not in ['ASC', 'DESC']:
+					return "Bad parameter: 'order_dir' not a valid value", 400
+					
+				suffix += '\nORDER BY ' + this_f.sql_name + ' ' + args['order_dir'].upper()
+				
 			else:
-				param_types.append('any')
+				return "Bad parameters: 'order_by' and 'order_dir' must both be present", 400
+
+		if 'cursor' in args:
+			seek = self.__seek(plan, args, conditions, params)
+			if seek != None:
+				return seek
+			suffix = '\nORDER BY '
+			if 'order_by' in args and this_f is not plan.key_field:
+				suffix += this_f.sql_name + ' ' + args['order_dir'].upper() + ', '
+			suffix += plan.key_field.sql_name + ' ' + args.get('order_dir', 'ASC').upper()
+			suffix += '\nLIMIT %s'
+			params.append(page_size + 1)
+			if names != None:
+				for k in self.__cursor_keys(plan, args):
+					if k.api_name.name not in names and k.api_name.name not in [e.api_name.name for e in extra]:
+						extra.append(k)
+		elif page_lim != 0:
+			if plan.key_field != None:
+				if in_order:
+					suffix += '\nORDER BY ' + self.__in_order(plan, ids, params)
+				elif 'order_by' not in args:
+					suffix += '\nORDER BY ' + plan.key_field.sql_name
+				elif this_f is not plan.key_field:
+					suffix += ', ' + plan.key_field.sql_name + ' ' + args['order_dir'].upper()
+			suffix += '\nLIMIT %s OFFSET %s'
+			params.append(page_size)
+			params.append((page - 1) * page_size)
+		elif in_order:
+			suffix += '\nORDER BY ' + self.__in_order(plan, ids, params)
+			
+		if len(params) > MAX_BIND:
+			return 'Bad parameters: at most ' + str(MAX_BIND) + ' values can be bound into one query', 400
+			
+		if expand != None:
+			# Joins that may drop rows are kept by the projection, so expanding returns 
+			# the same rows as the eager query
+			plan = plan.project(names, used + [e.api_name.name for e in extra], [r.field for r in plan.relations] + extra)
+		elif names != None:
+			plan = plan.project(names, used + [e.api_name.name for e in extra], extra)
+		sql = plan.sql(conditions, suffix)
+		key = ('multiple', context.name, tuple(sorted(args.items())))
+		if stream and page_lim == 0 and 'cursor' not in args and expand == None and ids == None:
+			result = None
+			if self.cache != None:
+				stamp = self.versions.snapshot(plan.tables)
+				result = self.cache.get(key)
+			if result == None:
+				chunks = yield StreamRequest(sql, tuple(params), self.stream_chunk)
+				if self.cache != None:
+					chunks = self.cache.collect(chunks, key, plan.tables, stamp)
+				return RowStream(chunks, plan), 200
+			if len(result) == 0:
+				return '', 404
+			return RowStream([result], plan), 200
+			
+		result = yield from self.__cached_query(key, plan, sql, tuple(params))
+		
+		if len(result) == 0 and ids == None and args.get('cursor', '') == '':
+			return '', 404
+		else:
+			next_token = None
+			if 'cursor' in args and len(result) > page_size:
+				result = result[:page_size]
+				next_token = self.__next_cursor(plan, args, result[-1])
+				
+			missing = None
+			if ids != None:
+				key_name = plan.key_field.api_name.name
+				if page_lim == 0 and 'cursor' not in args:
+					found = [r[plan.position(key_name)] for r in result]
+				else:
+					# Only a page of the matches was read, the keys of all of them are needed
+					keys = self.plans[context.name].project([key_name], used)
+					found = yield from self.__cached_query(('missing',) + key[1:], keys, keys.sql(filters[0]), tuple(filters[1]))
+					found = [r[0] for r in found]
+				found = set(found)
+				missing = [v for v, c in ids if c not in found]
+				
+			if expand != None:
+				objects = yield from self.__expand(plan, result, expand)
+				if stream:
+					rows = RowStream([objects], plan, next_token)
+					rows.objects = True
+					rows.missing = missing
+					return rows, 200
+				return self.__envelope(objects, args, next_token, missing), 200
+				
+			if stream:
+				rows = RowStream([result], plan, next_token)
+				rows.missing = missing
+				return rows, 200
+				
+			results = plan.decoder.decode_all(result)
+			return self.__envelope(results, args, next_token, missing), 200
+			
+	def __filters (self, plan, args, conditions, params, used):
+		"""Compiles the filter parameters of a request into sql conditions.
 		
-		sql_query = context.get_sql_parts()
-		if len(context.joins) != 0:
-			sql_query += ' \n\tAND '
+		Args:
+			plan (ContextPlan): The plan of the queried context.
+			args (dict): The parameters from the request.
+			conditions (list of str): The sql conditions, appended to.
+			params (list): The values to bind to the conditions, appended to.
+			used (list of str): The api names of the fields filtered on, appended to.
+			
+		Returns:
+			list of (str, any), (str, int): The ids of a `{pk}_in` filter as given and as 
+				coerced to the key's type, None if there is none. The error message and http 
+				response code if a parameter is bad, else None.
+		"""
+		ids = None
+		in_name = None
+		if plan.key_field != None and plan.key_field.api_name.name + '_in' not in plan.by_api:
+			in_name = plan.key_field.api_name.name + '_in'
+		if in_name in args:
+			key_name = plan.key_field.api_name.name
+			ids = []
+			seen = set()
+			for v in args[in_name].split(','):
+				try:
+					c = plan.coerce(key_name, v)
+				except ValueError:
+					return None, ("Bad value for parameter '" + in_name + "': '" + v + "'", 400)
+				if c not in seen:
+					seen.add(c)
+					ids.append((v, c))
+			if len(ids) > MAX_IN:
+				return None, ("Bad parameter: '" + in_name + "' takes at most " + str(MAX_IN) + " ids", 400)
 			
 		if 'q' in args:
 			for key in args:
 				if key not in NONSP_PARAMS:
-					return 'Bad parameters for \'q\': "' + key + '"', 400
+					return None, ('Bad parameters for \'q\': "' + key + '"', 400)
 
-			keys = list(args.keys())
-			vals = list(args.values())
-			
 			q = args['q']
 			
-			sql_query += '('
-			for f in fields:
-				typ = param_types[fields.index(f)]
-				sql_query += f.sql_name + " LIKE \"%%%s%%\" OR " % q
-				
-			if sql_query[-3:] == 'OR ':
-					sql_query = sql_query[:len(sql_query) - 4]	
-			sql_query += ')'
+			likes = []
+			for f in plan.fields:
+				likes.append(f.sql_name + ' LIKE %s')
+				params.append('%' + q + '%')
+				used.append(f.api_name.name)
+			conditions.append('(' + ' OR '.join(likes) + ')')
 		else:
 			for key in args:
 				is_comp = key.replace('_comp', '')
-				if key not in valid_params and is_comp not in valid_params and key not in NONSP_PARAMS:
-					return 'Bad parameter: "' + key + '"', 400
+				if key not in plan.by_api and is_comp not in plan.by_api and key not in NONSP_PARAMS and key != in_name:
+					return None, ('Bad parameter: "' + key + '"', 400)
 					
 			for key in args:
-				if '_comp' not in key and key in valid_params:
-					val = args[key]
+				if '_comp' not in key and key in plan.by_api:
 					comp_str = ' = '
 					if key + '_comp' in args:
 						comp_str = self.__comp_to_symbol(args[key + '_comp'])
 					if comp_str == None:
-						return "Bad comparator value for '" + key + "_comp': '" + args[key + '_comp'] + "'", 400
-					this_field = None
-					for f in fields:
-						if f.api_name.name == key:
-							this_field = f
-					if this_field == None:
-						return "Cannot find parameter field: '" + key + "'", 500
+						return None, ("Bad comparator value for '" + key + "_comp': '" + args[key + '_comp'] + "'", 400)
+					this_field = plan.by_api[key]
+					used.append(key)
 					
-					if '_comp' in key:
-						ind = valid_params.index(key.replace('_comp'))
-					else:
-						ind = valid_params.index(key)
-					if param_types[ind] == 'str':
-						if comp_str == ' LIKE ':
-							sql_query += this_field.sql_name + comp_str + '"%' + str(args[key]) + '%" AND '
-						else:
-							sql_query += this_field.sql_name + comp_str + '"' + str(args[key]) + '" AND '
-					else:
-						sql_query += this_field.sql_name + comp_str + str(args[key]) + ' AND '
-					
-			if sql_query[-4:] == 'AND ':
-				sql_query = sql_query[:len(sql_query) - 5]	
-			
-					
-		if 'order_by' in args or 'order_dir' in args:
-			if 'order_by' in args and 'order_dir' in args:
-				this_f = None
-				for f in fields:
-					if f.api_name.name == args['order_by']:
-						this_f = f
-				if this_f == None:
-					return "Bad parameter: 'order_by' not a valid field", 400
-				if args['order_dir'].upper() not in ['ASC', 'DESC']:
-					return "Bad parameter: 'order_dir' not a valid value", 400
+					if comp_str == ' IN ' or comp_str == ' NOT IN ':
+						values = []
+						for v in str(args[key]).split(','):
+							try:
+								values.append(plan.coerce(key, v))
+							except ValueError:
+								return None, ("Bad value for parameter '" + key + "': '" + v + "'", 400)
+						if len(values) > MAX_IN:
+							return None, ("Bad parameter: '" + key + "' takes at most " + str(MAX_IN) + " values", 400)
+						conditions.append(this_field.sql_name + comp_str + '(' + ', '.join(['%s'] * len(values)) + ')')
+						params += values
+						continue
 					
-				sql_query += '\nORDER BY ' + this_f.sql_name + ' ' + args['order_dir'].upper()
+					conditions.append(this_field.sql_name + comp_str + '%s')
+					if comp_str == ' LIKE ':
+						params.append('%' + str(args[key]) + '%')
+					else:
+						try:
+							params.append(plan.coerce(key, args[key]))
+						except ValueError:
+							return None, ("Bad value for parameter '" + key + "': '" + str(args[key]) + "'", 400)
+							
+			if ids != None:
+				conditions.append(plan.key_field.sql_name + ' IN (' + ', '.join(['%s'] * len(ids)) + ')')
+				params += [c for v, c in ids]
+				used.append(plan.key_field.api_name.name)
 				
-			else:
-				return "Bad parameters: 'order_by' and 'order_dir' must both be present", 400
-
-		if 'page' in args and self.page_lim != 0:
-			max = int(args['page']) * self.page_lim
-			sql_query += '\nLIMIT ' + str(max) + ';'
-		else:
-			sql_query += ';'
+		return ids, None
+		
+	def __envelope (self, results, args, next_token, missing):
+		"""Wraps the results of a keyset page or of a `{pk}_in` filter along with their 
+		continuation token and the ids that weren't found.
+		
+		Returns:
+			list or dict: The results as they are if there is nothing to wrap them with.
+		"""
+		if 'cursor' not in args and missing == None:
+			return results
+		body = { 'results': results }
+		if 'cursor' in args:
+			body['next'] = next_token
+		if missing != None:
+			body['missing'] = missing
+		return body
+		
+	def __in_order (self, plan, ids, params):
+		"""Makes the ordering returning the rows of a `{pk}_in` filter in the order of its ids.
+		
+		Args:
+			plan (ContextPlan): The plan of the queried context.
+			ids (list of (str, any)): The ids as given and as coerced to the key's type.
+			params (list): The values bound in the query so far, the ids are appended.
+			
+		Returns:
+			str: The sql expression to order by.
+		"""
+		whens = ''
+		for i in range(len(ids)):
+			whens += ' WHEN %s THEN ' + str(i)
+			params.append(ids[i][1])
+		return 'CASE ' + plan.key_field.sql_name + whens + ' END'
 			
-		result = self.dbc.query(sql_query)
+	def __expand (self, plan, rows, expand):
+		"""Query generator step decoding rows of the context's own table, loading the 
+		relations listed in `expand` and leaving the others as bare foreign keys.
 		
-		if len(result) == 0:
-			return '', 404
-		else:
-			results = []
-			for row in result:
-				dat = context.unpack_single(row)
-				results.append(dat)
-			if 'page' in args and self.page_lim != 0:
-				min = self.page_lim * (int(args['page']) - 1)
-				max = int(args['page']) * self.page_lim - 1
-				if min >= len(results) or max >= len(results):
-					return [], 404
-				results = results[(-1 * self.page_lim):]
-				
-			return results, 200
+		Related rows are loaded with a `DataLoader` for this request, a level of relations 
+		at a time, with one query per related table for all of the keys found in the level above.
+		
+		Args:
+			plan (ContextPlan): The plan the rows were queried with, a projection returning 
+				the fields of the context's own table and selecting the foreign keys of its 
+				relations as `extra`. Related tables are only joined where their join may 
+				filter rows, see `ContextPlan.prunable`.
+			rows (list of tuple): The rows.
+			expand (set of str): The api names of the relations to load.
+			
+		Returns:
+			list of dict: The decoded rows.
+		"""
+		objects = []
+		root = [(n, plan.indexes[n]) for n in plan.root_names]
+		base = len(plan.fields)
+		for row in rows:
+			obj = {}
+			for n, i in root:
+				obj[n] = row[i]
+			for j in range(len(plan.relations)):
+				obj[plan.relations[j].name] = row[base + j]
+			objects.append(obj)
+			
+		return (yield from DataLoader().expand(objects, plan.relations, expand))
+		
+	def __cursor_keys (self, plan, args):
+		"""Gets the fields a keyset page is ordered by, the primary key last as tie breaker.
+		"""
+		keys = []
+		if 'order_by' in args and plan.by_api[args['order_by']] is not plan.key_field:
+			keys.append(plan.by_api[args['order_by']])
+		keys.append(plan.key_field)
+		return keys
+			
+	def __seek (self, plan, args, conditions, params):
+		"""Adds the condition seeking past the position in the 'cursor' token, if there is one.
+		
+		Returns:
+			(str, int): An error message and return code if the token is bad, None otherwise.
+		"""
+		if args['cursor'] == '':
+			return None
+		keys = self.__cursor_keys(plan, args)
+		values = decode_cursor(args['cursor'])
+		if values == None or len(values) != len(keys) + 2 or values[0] != args.get('order_by') or values[1] != args.get('order_dir', 'ASC').upper():
+			return "Bad parameter: 'cursor' is not valid for this query", 400
+			
+		desc = args.get('order_dir', 'ASC').upper() == 'DESC'
+		comp = ' > '
+		if desc:
+			comp = ' < '
+		names = ', '.join([k.sql_name for k in keys])
+		marks = ', '.join(['%s'] * len(keys))
+		seek = '(' + names + ')' + comp + '(' + marks + ')'
+		if len(keys) > 1 and keys[0].nullable:
+			# NULL compares as neither, both providers sort NULLs first ascending and last 
+			# descending, so seek through them on the key alone
+			order_name = keys[0].sql_name
+			if values[2] == None:
+				seek = order_name + ' IS NULL AND ' + keys[1].sql_name + comp + '%s'
+				if not desc:
+					seek += ' OR ' + order_name + ' IS NOT NULL'
+				values = values[:2] + values[3:]
+			elif desc:
+				seek += ' OR ' + order_name + ' IS NULL'
+		conditions.append('(' + seek + ')')
+		for v in values[2:]:
+			params.append(v)
+		return None
+		
+	def __next_cursor (self, plan, args, row):
+		"""Makes the token for the keyset page following the one ending in `row`.
+		"""
+		values = [args.get('order_by'), args.get('order_dir', 'ASC').upper()]
+		for k in self.__cursor_keys(plan, args):
+			values.append(row[plan.position(k.api_name.name)])
+		return encode_cursor(values)
 					
 	
 	def context_post_single (self, context_name, args):
@@ -201,24 +744,29 @@ class APIController:
 		Raises:
 			TypeError: If the arg types are unexpected.
 		"""
+		return self.__run(self.__post_single(context_name, args))
+		
+	async def context_post_single_async (self, context_name, args):
+		"""Awaitable version of `context_post_single` running on the async provider.
+		"""
+		return await self.__run_async(self.__post_single(context_name, args))
+		
+	def __post_single (self, context_name, args):
 
 		caller = 'APIController.context_put_single'
 		force_type(context_name, 'str', caller=caller)
 		
-		context = None
-		for c in self.contexts:
-			if c.name == context_name:
-				context = c
+		context = self.registry.get(context_name)
 
 		if context == None:
 			return "Bad model/context requested: '" + context_name + "'", 404
 		if len(context.tables) < 1:
 			return "Bad model/context processing: '" + context_name + "'", 500
 
-		fields = context.flat_fields()
+		plan = self.plans[context.name]
 		keys = list(args.keys())
 
-		for f in fields:
+		for f in plan.fields:
 			if f.api_name.name not in keys and f.key != 'PRI':
 				return "Missing required arg in body: '" + f.api_name.name + "'", 400
 		
@@ -226,21 +774,133 @@ class APIController:
 		sqls = context.post_sql_parts(packed)
 		api_pack = context.pack_api(packed)
 
-		for s in sqls:
-			result = self.dbc.query(s)
+		try:
+			yield TransactionRequest(run_statements(sqls))
+		except ConstraintError:
+			return 'Insertion failed and was rolled back, the id may already be taken', 409
+		except RuntimeError:
+			return 'Insertion failed and was rolled back', 500
+		self.versions.bump(plan.tables)
+		
+		if self.objects != None:
+			# The body isn't cached, the stored row may differ from it i.e. by defaults or 
+			# type conversion, and is read back on the next lookup
+			self.objects.forget_missing(self.__affected(plan.tables))
 		
 		return api_pack, 201
 		
+	def context_post_many (self, context_name, items):
+		"""Handles post requests to create many instances of the context at once.
+		
+		The rows of each table are inserted with multi-row statements, all in one transaction. 
+		Instances with missing values are reported and left out, if the insertion fails 
+		none of the instances are created.
+		
+		Args:
+			context_name (str): The api name ('database_table') of the context.
+			items (list of dict): The request values of each new instance.
+		
+		Returns:
+			dict, int: The error message if a bad request, else the amounts `created` and 
+						`failed` with the per instance `results`, in order, each holding 
+						its `index`, `status` and either the created `data` or an `error`. 
+						A return code of 201 if all instances were created, 207 if some 
+						were, else 400 or 500.
+		
+		Raises:
+			TypeError: If the arg types are unexpected.
+		"""
+		return self.__run(self.__post_many(context_name, items))
+		
+	async def context_post_many_async (self, context_name, items):
+		"""Awaitable version of `context_post_many` running on the async provider.
+		"""
+		return await self.__run_async(self.__post_many(context_name, items))
+		
+	def __post_many (self, context_name, items):
+		caller = 'APIController.context_post_many'
+		force_type(context_name, 'str', caller=caller)
+		force_type(items, 'list', caller=caller)
+		
+		context = self.registry.get(context_name)
+
+		if context == None:
+			return "Bad model/context requested: '" + context_name + "'", 404
+		if len(context.tables) < 1:
+			return "Bad model/context processing: '" + context_name + "'", 500
+		if len(items) == 0:
+			return 'No instances in body', 400
+			
+		plan = self.plans[context.name]
+		results = []
+		packs = []
+		for i in range(len(items)):
+			item = items[i]
+			if not is_type(item, 'dict'):
+				results.append({ 'index': i, 'status': 400, 'error': 'Instance is not an object' })
+				continue
+			missing = [f.api_name.name for f in plan.fields if f.api_name.name not in item and f.key != 'PRI']
+			if len(missing) > 0:
+				results.append({ 'index': i, 'status': 400, 'error': "Missing required arg in body: '" + missing[0] + "'" })
+				continue
+			try:
+				packed = context.pack_single(item)
+			except AttributeError as e:
+				results.append({ 'index': i, 'status': 400, 'error': str(e) })
+				continue
+			packs.append(packed)
+			results.append({ 'index': i, 'status': 201, 'data': context.pack_api(packed) })
+		created = [r for r in results if r['status'] == 201]
+		
+		if len(packs) > 0:
+			try:
+				yield TransactionRequest(run_statements(context.post_many_sql_parts(packs, self.insert_chunk)))
+			except RuntimeError:
+				for r in created:
+					r['status'] = 500
+					r['error'] = 'Insertion failed, no instances were created'
+					del r['data']
+				return { 'created': 0, 'failed': len(results), 'results': results }, 500
+			self.versions.bump(plan.tables)
+			
+			if self.objects != None:
+				self.objects.forget_missing(self.__affected(plan.tables))
+		
+		retno = 400
+		if len(created) == len(results):
+			retno = 201
+		elif len(created) > 0:
+			retno = 207
+		return { 'created': len(created), 'failed': len(results) - len(created), 'results': results }, retno
+		
 		
 	def context_del_single (self, context_name, id):
+		"""Handles delete requests removing an instance of the context by id, along with 
+		its related rows.
+		
+		Args:
+			context_name (str): The api name ('database_table') of the context.
+			id (str): The id of the instance.
+			
+		Returns:
+			str, int: An empty string, or the error message if the instance couldn't be 
+						deleted. An http response code based on query execution.
+		
+		Raises:
+			TypeError: If the arg types are unexpected.
+		"""
+		return self.__run(self.__del_single(context_name, id))
+		
+	async def context_del_single_async (self, context_name, id):
+		"""Awaitable version of `context_del_single` running on the async provider.
+		"""
+		return await self.__run_async(self.__del_single(context_name, id))
+		
+	def __del_single (self, context_name, id):
 		caller = 'APIController.context_del_single'
 		force_type(context_name, 'str', caller=caller)
-		print("HERE")
 		
-		context = None
-		for c in self.contexts:
-			if c.name == context_name:
-				context = c
+		context = self.registry.get(context_name)
 		
 		if context == None:
 			return "Bad model/context requested: '" + context_name + "'", 404
@@ -248,42 +908,136 @@ class APIController:
 		if len(context.tables) < 1:
 			return "Bad model/context processing: '" + context_name + "'", 500
 		
-		key_field = None
-		for key in context.model:
-			field = context.model[key]
-			if not is_type(field, 'dict'):
-				if field.key == 'PRI':
-					key_field = field
+		plan = self.plans[context.name]
 				
-		if key_field == None:
+		if plan.key_field == None:
 			return "No primary key field found for '" + context_name + "'", 500
+		if len(plan.deletes) == 0:
+			return "No key found for every related table of '" + context_name + "'", 500
 			
-		sql_query = context.get_sql_parts()
-		if len(context.joins) != 0:
-			sql_query += ' \n\tAND '
-		if 'char' in key_field.typ:
-			sql_query += key_field.sql_name + '="%s";' % id
-		else:
-			sql_query += key_field.sql_name + '=%s;' % id
+		deleted = yield from self.__delete(plan, [plan.key_field.sql_name + ' = %s'], [id], [])
 		
-		result = self.dbc.query(sql_query)
-		print("HERE")
-
-		if len(result) == 0:
+		if deleted == None:
+			return 'Delete failed and was rolled back, related rows may still be referenced', 409
+		if deleted == 0:
 			return '', 404
-		elif len(result) == 1:
-			json_data = context.unpack_single(result[0])
-			model_packed = context.to_model_pack(json_data)
-			print(model_packed)
-			del_sql = context.del_sql_parts(model_packed)
-			print(del_sql)
-			for i in reversed(range(len(del_sql))):
-				sql = del_sql[i]
-				result = self.dbc.query(sql)
-			return '', 204
-		else:
-			return 'Found more than expected contexts', 500
+		return '', 204
+		
+	def context_del_many (self, context_name, args):
+		"""Handles delete requests removing every instance of the context matching filters, 
+		along with their related rows.
+		
+		Takes the same filters as `context_query_multiple`, at least one is required.
+		
+		Args:
+			context_name (str): The api name ('database_table') of the context.
+			args (dict): The filter parameters from the request.
+			
+		Returns:
+			dict, int: The error message if a bad request, else the amount of instances 
+						`deleted`. An http response code based on query execution.
+		
+		Raises:
+			TypeError: If the arg types are unexpected.
+		"""
+		return self.__run(self.__del_many(context_name, args))
+		
+	async def context_del_many_async (self, context_name, args):
+		"""Awaitable version of `context_del_many` running on the async provider.
+		"""
+		return await self.__run_async(self.__del_many(context_name, args))
+		
+	def __del_many (self, context_name, args):
+		caller = 'APIController.context_del_many'
+		force_type(context_name, 'str', caller=caller)
+		force_type(args, 'dict', caller=caller)
+		
+		context = self.registry.get(context_name)
 		
+		if context == None:
+			return "Bad model/context requested: '" + context_name + "'", 404
+		
+		if len(context.tables) < 1:
+			return "Bad model/context processing: '" + context_name + "'", 500
+		
+		plan = self.plans[context.name]
+				
+		if plan.key_field == None:
+			return "No primary key field found for '" + context_name + "'", 500
+		if len(plan.deletes) == 0:
+			return "No key found for every related table of '" + context_name + "'", 500
+			
+		for key in args:
+			if key in NONSP_PARAMS and key != 'q':
+				return "Bad parameter for delete: '" + key + "'", 400
+		if len(args) == 0:
+			return 'Missing filter parameters, deleting every instance is not allowed', 400
+			
+		conditions = []
+		params = []
+		used = []
+		if 'q' in args and args['q'] == '':
+			return "Bad parameter for delete: 'q' can't be empty", 400
+		ids, error = self.__filters(plan, args, conditions, params, used)
+		if error != None:
+			return error
+		if len(conditions) == 0:
+			# i.e. only comparators were given, whose fields weren't
+			return 'Missing filter parameters, deleting every instance is not allowed', 400
+		if len(params) > MAX_BIND:
+			return 'Bad parameters: at most ' + str(MAX_BIND) + ' values can be bound into one query', 400
+			
+		deleted = yield from self.__delete(plan, conditions, params, used)
+		
+		if deleted == None:
+			return 'Delete failed and was rolled back, related rows may still be referenced', 409
+		return { 'deleted': deleted }, 200
+		
+	def __delete (self, plan, conditions, params, used):
+		"""Query generator step deleting the instances of a context matching conditions, 
+		along with their related rows.
+		
+		The keys of the rows are read first, then each table is deleted from with 
+		`WHERE key IN (...)` statements in `plan.deletes` order, all in one transaction. 
+		The keys are read inside it, locking the rows on mysql, so rows related after the 
+		read can't be left behind or deleted from under a new reference.
+		
+		Args:
+			plan (ContextPlan): The plan of the context.
+			conditions (list of str): The sql conditions selecting the instances.
+			params (list): The values to bind to the conditions.
+			used (list of str): The api names of the fields the conditions refer to.
+			
+		Returns:
+			int: The amount of instances deleted, None if deleting broke a constraint, i.e. a 
+				related row is still referenced elsewhere, and was rolled back.
+				
+		Raises:
+			RuntimeError: If deleting failed for any other reason.
+		"""
+		view = plan.project([n for d in plan.deletes for n in d[2]], used)
+		try:
+			rows = yield TransactionRequest(self.__delete_rows(plan, view, view.sql(conditions, self.dbc.lock_rows), tuple(params)))
+		except ConstraintError:
+			return None
+		if len(rows) == 0:
+			return 0
+		self.versions.bump(plan.tables)
+		if self.objects != None:
+			self.objects.invalidate(self.__affected(plan.tables))
+		return len(set([r[view.indexes[plan.key_field.api_name.name]] for r in rows]))
+		
+	def __delete_rows (self, plan, view, sql, params):
+		"""Query generator reading the keys of the rows to delete and deleting them, run in 
+		one transaction by `__delete`.
+		
+		Returns:
+			list of tuple: The rows of keys read.
+		"""
+		rows = yield sql, params
+		for s in plan.del_sql_parts(rows, view.indexes):
+			yield s
+		return rows
 		
 	def context_query_single (self, context_name, id):
 		"""Queries a single instance of a context by id. 
@@ -299,13 +1053,18 @@ class APIController:
 		Raises:
 			TypeError: If the arg types are unexpected.
 		"""
+		return self.__run(self.__query_single(context_name, id))
+		
+	async def context_query_single_async (self, context_name, id):
+		"""Awaitable version of `context_query_single` running on the async provider.
+		"""
+		return await self.__run_async(self.__query_single(context_name, id))
+		
+	def __query_single (self, context_name, id):
 		caller = 'APIController.context_query_single'
 		force_type(context_name, 'str', caller=caller)
 		
-		context = None
-		for c in self.contexts:
-			if c.name == context_name:
-				context = c
+		context = self.registry.get(context_name)
 		
 		if context == None:
 			return "Bad model/context requested: '" + context_name + "'", 404
@@ -313,35 +1072,264 @@ class APIController:
 		if len(context.tables) < 1:
 			return "Bad model/context processing: '" + context_name + "'", 500
 		
-		key_field = None
-		for key in context.model:
-			field = context.model[key]
-			if not is_type(field, 'dict'):
-				if field.key == 'PRI':
-					key_field = field
+		plan = self.plans[context.name]
+		key_field = plan.key_field
 				
 		if key_field == None:
 			return "No primary key field found for '" + context_name + "'", 500
 			
-		sql_query = context.get_sql_parts()
-		if len(context.joins) != 0:
-			sql_query += ' \n\tAND '
-		if 'char' in key_field.typ:
-			sql_query += key_field.sql_name + '="%s";' % id
-		else:
-			sql_query += key_field.sql_name + '=%s;' % id
+		sql_query = plan.sql([key_field.sql_name + ' = %s'])
 		
-		result = self.dbc.query(sql_query)
+		if self.objects != None:
+			obj = self.objects.get(context.name, str(id))
+			if obj is NOT_FOUND:
+				return '', 404
+			if obj != None:
+				return obj, 200
+			generation = self.objects.generation(context.name)
+			epoch = self.objects.epoch(context.name)
+			
+		result = yield from self.__cached_query(('single', context.name, str(id)), plan, sql_query, (id,))
 
 		if len(result) == 0:
+			if self.objects != None:
+				self.objects.put_missing(context.name, str(id), generation, epoch)
 			return '', 404
 		elif len(result) == 1:
-			json_data = context.unpack_single(result[0])
+			json_data = plan.decoder.decode(result[0])
+			if self.objects != None:
+				self.objects.put(context.name, str(id), json_data, generation)
 			return json_data, 200
 		else:
 			return 'Found more than expected contexts', 500
 			
 	
+	def context_query_ids (self, context_name, ids):
+		"""Queries the instances of a context with any of the given ids.
+		
+		Ids are looked up in the object cache first, the rest with `WHERE pk IN (...)` 
+		queries of at most `MAX_IN` ids each.
+		
+		Args:
+			context_name (str): The name of the context being queried.
+			ids (list): The ids of the instances.
+			
+		Returns:
+			dict, int: The error message if a bad query, else the decoded instances by id 
+						as a string, ids that weren't found being left out. An http response 
+						error code based on query execution.
+		
+		Raises:
+			TypeError: If the arg types are unexpected.
+		"""
+		return self.__run(self.__query_ids(context_name, ids))
+		
+	async def context_query_ids_async (self, context_name, ids):
+		"""Awaitable version of `context_query_ids` running on the async provider.
+		"""
+		return await self.__run_async(self.__query_ids(context_name, ids))
+		
+	def __query_ids (self, context_name, ids):
+		caller = 'APIController.context_query_ids'
+		force_type(context_name, 'str', caller=caller)
+		force_type(ids, 'list', caller=caller)
+		
+		context = self.registry.get(context_name)
+		
+		if context == None:
+			return "Bad model/context requested: '" + context_name + "'", 404
+		
+		if len(context.tables) < 1:
+			return "Bad model/context processing: '" + context_name + "'", 500
+		
+		plan = self.plans[context.name]
+		key_field = plan.key_field
+				
+		if key_field == None:
+			return "No primary key field found for '" + context_name + "'", 500
+			
+		# The ids as requested by their value coerced to the key's type, as rows hold it, 
+		# so ids spelled differently, i.e. '03' and '3', are looked up once and both found
+		found = {}
+		missing = {}
+		uncoerced = []
+		for id in ids:
+			id = str(id)
+			if id in found:
+				continue
+			if self.objects != None:
+				obj = self.objects.get(context.name, id)
+				if obj is NOT_FOUND:
+					continue
+				if obj != None:
+					found[id] = obj
+					continue
+			try:
+				value = plan.coerce(key_field.api_name.name, id)
+			except ValueError:
+				if id not in uncoerced:
+					uncoerced.append(id)
+				continue
+			spellings = missing.setdefault(value, [])
+			if id not in spellings:
+				spellings.append(id)
+		# Ids not of the key's type, i.e. '3.0', are left to the database to convert, as 
+		# a single lookup would
+		for id in uncoerced:
+			data, retno = yield from self.__query_single(context.name, id)
+			if retno == 200:
+				found[id] = data
+		if len(missing) == 0:
+			return found, 200
+			
+		if self.objects != None:
+			generation = self.objects.generation(context.name)
+			epoch = self.objects.epoch(context.name)
+		key_index = plan.fields.index(key_field)
+		values = list(missing)
+		for i in range(0, len(values), MAX_IN):
+			batch = values[i:i + MAX_IN]
+			sql_query = plan.sql([key_field.sql_name + ' IN (' + ', '.join(['%s'] * len(batch)) + ')'])
+			result = yield from self.__cached_query(('ids', context.name, tuple(batch)), plan, sql_query, tuple(batch))
+			for row in result:
+				obj = plan.decoder.decode(row)
+				for id in missing.get(row[key_index], []):
+					found[id] = obj
+					if self.objects != None:
+						self.objects.put(context.name, id, obj, generation)
+		if self.objects != None:
+			for value in missing:
+				for id in missing[value]:
+					if id not in found:
+						self.objects.put_missing(context.name, id, generation, epoch)
+		return found, 200
+	
+	def __affected (self, tables):
+		"""Gets the names of the contexts reading any of the given tables.
+		"""
+		names = []
+		for name in list(self.plans):
+			plan = self.plans.get(name)
+			if plan != None and any([t in tables for t in plan.tables]):
+				names.append(name)
+		return names
+		
+	def __cached_query (self, key, plan, sql, params):
+		"""Query generator step reading the rows of a context query through the result cache.
+		
+		On a cache miss the query is shared with identical reads running at the same time. 
+		The versions of the queried tables are part of the shared key, so a read started 
+		after a write never joins a query started before it.
+		
+		Args:
+			key (tuple): The key of the query, made from the context name and normalized args.
+			plan (ContextPlan): The plan of the queried context.
+			sql (str): The sql query.
+			params (tuple): Values to bind to the %s placeholders in the query.
+			
+		Returns:
+			list of tuple: The result rows, from the cache when there is a current entry.
+		"""
+		stamp = self.versions.snapshot(plan.tables)
+		rows = None
+		if self.cache != None:
+			rows = self.cache.get(key)
+		if rows == None:
+			if self.flight != None:
+				rows = yield SharedQuery(key + (stamp,), sql, params)
+			else:
+				rows = yield sql, params
+			if self.cache != None:
+				self.cache.put(key, rows, plan.tables, stamp, estimate_size(rows))
+		return rows
+		
+	def __run (self, gen):
+		"""Drives a query generator against the database connection.
+		
+		The query logic for each request is written as a generator that yields the sql 
+		it needs executed along with the values to bind to its placeholders, and is sent 
+		back the resulting rows, finally returning its
+		(data, return code) result. This lets the same logic be run by this blocking
+		driver or by the async driver. A yielded `StreamRequest` is sent back an iterator 
+		of row chunks instead, and a yielded `SharedQuery` the rows of the identical query 
+		already running, if there is one. The queries of a yielded `TransactionRequest` 
+		are run in one transaction.
+		
+		Args:
+			gen (generator): The query generator to run to completion.
+			
+		Returns:
+			(any, int): The value returned by the generator.
+		"""
+		try:
+			op = next(gen)
+			while True:
+				if isinstance(op, StreamRequest):
+					op = gen.send(self.dbc.fetch_stream(op.sql, op.params, op.size))
+				elif isinstance(op, TransactionRequest):
+					try:
+						with self.dbc.transaction() as tx:
+							result = self.__run_work(op.work, tx)
+					except RuntimeError as e:
+						op = gen.throw(e)
+					else:
+						op = gen.send(result)
+				elif isinstance(op, SharedQuery):
+					op = gen.send(self.flight.do(op.key, self.dbc.query, op.sql, op.params))
+				else:
+					op = gen.send(self.dbc.query(op[0], op[1]))
+		except StopIteration as done:
+			return done.value
+			
+	async def __run_async (self, gen):
+		"""Drives a query generator against the async provider of the database connection.
+		
+		Args:
+			gen (generator): The query generator to run to completion.
+			
+		Returns:
+			(any, int): The value returned by the generator.
+		"""
+		try:
+			op = next(gen)
+			while True:
+				if isinstance(op, StreamRequest):
+					op = gen.send(self.dbc.fetch_stream_async(op.sql, op.params, op.size))
+				elif isinstance(op, TransactionRequest):
+					try:
+						async with self.dbc.transaction_async() as tx:
+							result = await self.__run_work_async(op.work, tx)
+					except RuntimeError as e:
+						op = gen.throw(e)
+					else:
+						op = gen.send(result)
+				elif isinstance(op, SharedQuery):
+					op = gen.send(await self.flight.do_async(op.key, self.dbc.query_async, op.sql, op.params))
+				else:
+					op = gen.send(await self.dbc.query_async(op[0], op[1]))
+		except StopIteration as done:
+			return done.value
+			
+	def __run_work (self, work, tx):
+		"""Drives the query generator of a `TransactionRequest` inside its transaction.
+		"""
+		try:
+			q = next(work)
+			while True:
+				q = work.send(tx.query(q[0], q[1]))
+		except StopIteration as done:
+			return done.value
+			
+	async def __run_work_async (self, work, tx):
+		"""Drives the query generator of a `TransactionRequest` inside its async transaction.
+		"""
+		try:
+			q = next(work)
+			while True:
+				q = work.send(await tx.query(q[0], q[1]))
+		except StopIteration as done:
+			return done.value
+			
 	def __comp_to_symbol (self, comp_val):
 		if comp_val == 'EQ':
 			return ' = '
@@ -357,5 +1345,9 @@ class APIController:
 			return ' <= '
 		elif comp_val == 'NE':
 			return ' <> '
+		elif comp_val == 'IN':
+			return ' IN '
+		elif comp_val == 'NIN':
+			return ' NOT IN '
 		else:
 			return None
\ No newline at end of file
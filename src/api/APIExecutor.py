@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""Module containing logic to run blocking API controller calls off the event loop.
+
+Offloads synchronous APIController work onto a bounded thread pool so that a slow
+query doesn't stall every other request being served by the same ASGI worker.
+
+Attributes:
+	ITER_END (object): Sentinel marking the end of an iterable pulled through the pool.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from shared.SharedServices import force_type
+from api.BusyError import BusyError
+
+ITER_END = object()
+
+
+class APIExecutor:
+	"""Class running blocking calls on a bounded thread pool for async callers.
+
+	Calls beyond `workers` wait in a queue of at most `max_pending` entries. Calls that
+	can't be queued are rejected straight away and calls that take longer than `timeout`
+	are abandoned by the caller, both reported with http style return codes so they
+	can be passed back like any other APIController result.
+
+	Attributes:
+		workers (int): The amount of threads executing calls.
+		max_pending (int): The most calls allowed to wait for a free thread.
+		timeout (float): Seconds a caller waits for its call before giving up. If 0, waits forever.
+
+	Raises:
+		TypeError: If any of the attributes are of unexpected types.
+	"""
+	def __init__ (self, workers=8, max_pending=64, timeout=30.0):
+		caller = 'APIExecutor.__init__'
+		force_type(workers, 'int', caller=caller)
+		force_type(max_pending, 'int', caller=caller)
+
+		self.workers = workers
+		self.max_pending = max_pending
+		self.timeout = float(timeout)
+
+		self.__pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='apinfly')
+		self.__lock = threading.Lock()
+		self.__queued = 0
+		self.__running = 0
+		self.__completed = 0
+		self.__rejected = 0
+		self.__timed_out = 0
+		self.__wait_total = 0.0
+		self.__wait_max = 0.0
+
+	async def run (self, fn, *args):
+		"""Runs a blocking call on the thread pool and awaits its result.
+
+		Args:
+			fn (function): The blocking callable, normally an APIController method.
+			*args: The arguments to call it with.
+
+		Returns:
+			any: The result of the call, or a (str, int) message and return code of 503 if the
+				queue is full or 504 if the call timed out.
+		"""
+		if not self.__admit():
+			return 'Server busy, try again later', 503
+
+		submitted = time.monotonic()
+		loop = asyncio.get_running_loop()
+		future = loop.run_in_executor(self.__pool, self.__call, submitted, fn, args)
+		try:
+			if self.timeout > 0:
+				return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+			return await future
+		except asyncio.TimeoutError:
+			with self.__lock:
+				self.__timed_out += 1
+			return 'Request timed out', 504
+
+	async def iterate (self, iterable):
+		"""Iterates a blocking iterable on the thread pool without blocking the event loop.
+
+		Each item is pulled on a worker thread, so only one is held at a time. If the
+		iteration is stopped early the iterable is closed, when it supports it. Every pull 
+		is queued and counted like a call of `run`. The first is rejected if the queue is 
+		full, the later ones are always queued so a stream that started isn't cut short.
+
+		Args:
+			iterable (iterable): The blocking iterable, i.e. a `RowStream`.
+
+		Yields:
+			any: The items of the iterable.
+			
+		Raises:
+			BusyError: If the queue is full when the iteration starts.
+		"""
+		if not self.__admit():
+			raise BusyError('[APIExecutor.iterate] Server busy, try again later')
+		loop = asyncio.get_running_loop()
+		it = iter(iterable)
+		done = False
+		try:
+			admitted = True
+			while True:
+				if not admitted:
+					self.__admit(force=True)
+				admitted = False
+				item = await loop.run_in_executor(self.__pool, self.__call, time.monotonic(), next, (it, ITER_END))
+				if item is ITER_END:
+					done = True
+					return
+				yield item
+		finally:
+			if not done and hasattr(it, 'close'):
+				self.__admit(force=True)
+				await loop.run_in_executor(self.__pool, self.__call, time.monotonic(), it.close, ())
+
+	def __admit (self, force=False):
+		"""Takes a place in the queue for a call, unless it is full.
+		
+		Args:
+			force (bool, optional): Whether to queue the call even if the queue is full.
+			
+		Returns:
+			bool: Whether the call was queued.
+		"""
+		with self.__lock:
+			if not force and self.__queued + self.__running >= self.workers + self.max_pending:
+				self.__rejected += 1
+				return False
+			self.__queued += 1
+		return True
+
+	def __call (self, submitted, fn, args):
+		waited = time.monotonic() - submitted
+		with self.__lock:
+			self.__queued -= 1
+			self.__running += 1
+			self.__wait_total += waited
+			if waited > self.__wait_max:
+				self.__wait_max = waited
+		try:
+			return fn(*args)
+		finally:
+			with self.__lock:
+				self.__running -= 1
+				self.__completed += 1
+
+	def stats (self):
+		"""Reports the current load on the executor.
+
+		Returns:
+			dict of [str, any]: Queue depth, running calls, counters and wait times in milliseconds.
+		"""
+		with self.__lock:
+			started = self.__completed + self.__running
+			d = {
+					'workers': self.workers,
+					'queued': self.__queued,
+					'max_pending': self.max_pending,
+					'running': self.__running,
+					'completed': self.__completed,
+					'rejected': self.__rejected,
+					'timed_out': self.__timed_out,
+					'wait_avg_ms': (self.__wait_total / started * 1000.0 if started > 0 else 0.0),
+					'wait_max_ms': self.__wait_max * 1000.0
+				}
+		return d
+
+	def shutdown (self):
+		"""Stops the thread pool once the calls already submitted have finished.
+		"""
+		self.__pool.shutdown(wait=True)
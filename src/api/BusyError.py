@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""Module containing the error raised when the executor can't take on more work.
+"""
+
+
+class BusyError(RuntimeError):
+	"""Error raised by `APIExecutor.iterate` when a stream can't be started because the
+	queue of the executor is full, to be answered like a rejected call with a 503.
+	"""
+	pass
@@ -0,0 +1,367 @@
+"""Module containing logic to precompile the query plan of an API context.
+
+Attributes:
+	TRUE_VALUES (list of str): Parameter values read as true for boolean fields.
+	FALSE_VALUES (list of str): Parameter values read as false for boolean fields.
+	COERCERS (dict of [str, function]): Functions converting request values, by parameter type.
+	MAX_PROJECTIONS (int): The most projections compiled and kept per plan.
+"""
+
+import copy
+import threading
+from shared.SharedServices import force_type, is_type
+from api.RowDecoder import RowDecoder
+from api.Relation import Relation, MAX_IN
+
+TRUE_VALUES = ['1', 'true', 'True', 'TRUE']
+FALSE_VALUES = ['0', 'false', 'False', 'FALSE']
+
+def param_type (field):
+	"""Derives the parameter type of a field from its database type.
+
+	Args:
+		field (db.DatabaseField.DatabaseField): The field to get the parameter type of.
+
+	Returns:
+		str: One of 'str', 'bool', 'int', 'float' or 'any'.
+	"""
+	if 'char' in field.typ or 'text' in field.typ:
+		return 'str'
+	elif 'tinyint' in field.typ:
+		return 'bool'
+	elif 'int' in field.typ:
+		return 'int'
+	elif 'float' in field.typ or 'real' in field.typ:
+		return 'float'
+	else:
+		return 'any'
+
+def coerce_bool (value):
+	"""Coerces a request parameter to a value for a boolean field.
+
+	Raises:
+		ValueError: If the value isn't a recognized boolean.
+	"""
+	if value in TRUE_VALUES:
+		return 1
+	if value in FALSE_VALUES:
+		return 0
+	raise ValueError("Not a boolean: '" + str(value) + "'")
+
+def coerce_any (value):
+	return value
+
+COERCERS = 	{
+				'str': str,
+				'bool': coerce_bool,
+				'int': int,
+				'float': float,
+				'any': coerce_any
+			}
+MAX_PROJECTIONS = 256
+
+def prune (structure, names):
+	"""Cuts a nested api structure down to some of its fields.
+	
+	Args:
+		structure (dict): The structure, i.e. from `APIContext.types_view`.
+		names (list of str): The api names of the fields to keep.
+		
+	Returns:
+		dict: The structure holding only the fields kept, and the relations leading to them.
+	"""
+	pruned = {}
+	for key in structure:
+		if is_type(structure[key], 'dict'):
+			branch = prune(structure[key], names)
+			if len(branch) > 0:
+				pruned[key] = branch
+		elif key in names:
+			pruned[key] = structure[key]
+	return pruned
+
+def leaves (structure):
+	"""Lists the api names of the fields in a nested api structure.
+	"""
+	names = []
+	for key in structure:
+		if is_type(structure[key], 'dict'):
+			names += leaves(structure[key])
+		else:
+			names.append(key)
+	return names
+
+
+class ContextPlan:
+	"""Class holding the precompiled query plan of an API context.
+
+	Built once per context so that handling a request is dictionary lookups and
+	filling in templates rather than walking the context model.
+
+	Attributes:
+		context (APIContext): The context the plan is compiled from.
+		fields (list of DatabaseField): The flattened fields, in the order they are selected.
+		by_api (dict of [str, DatabaseField]): The fields by their api name.
+		indexes (dict of [str, int]): The position of each field in a result row, by api name.
+		coercers (dict of [str, function]): Functions converting request values to each field's type, by api name.
+		key_field (DatabaseField): The primary key field of the context's table, None if it has none.
+		select_from (str): The SELECT and FROM clauses of the context query.
+		joins (list of str): The join conditions of the context query.
+		tables (list of str): The fully qualified names of the tables the context query reads.
+		decoder (RowDecoder): The compiled decoder for result rows of the context query.
+		schema (dict): The nested api structure of the context with the type of each field, 
+			see `APIContext.types_view`.
+		field_tables (list of int): The index in `context.tables` of the table of each field.
+		branches (dict of [str, list of str]): The api names of the fields under each relation, 
+			by the relation's api name.
+		root_names (list of str): The api names of the fields of the context's own table.
+		relations (list of Relation): The relations out of the context's own table.
+		relations_by_name (dict of [str, Relation]): Every relation of the context, at any 
+			depth, by its api name.
+		prunable (set of int): The indexes in `context.tables` of the tables whose join never 
+			drops a row: the foreign key leading to them is NOT NULL and refers to a primary 
+			key. Relations are read from declared foreign keys, which the providers enforce.
+		extra (list of DatabaseField): Fields selected after `fields` without being decoded, 
+			set by `project`.
+		deletes (list of (str, str, list of str)): The fully qualified name, key column and 
+			the api names of the keys of each table an instance is deleted from, a table 
+			reached through several relations being listed once. Tables are in topological 
+			order, each after every table referring to it, so rows can be deleted in it. 
+			Empty if the context's table has no primary key.
+	"""
+	def __init__ (self, context):
+		caller = 'ContextPlan.__init__'
+		force_type(context, 'api.APIContext.APIContext', caller=caller)
+
+		self.context = context
+		self.fields = context.flat_fields()
+
+		self.by_api = {}
+		self.indexes = {}
+		self.coercers = {}
+		for i in range(len(self.fields)):
+			f = self.fields[i]
+			self.by_api[f.api_name.name] = f
+			self.indexes[f.api_name.name] = i
+			self.coercers[f.api_name.name] = COERCERS[param_type(f)]
+
+		self.key_field = None
+		for key in context.model:
+			field = context.model[key]
+			if '_branch' not in key and field.key == 'PRI':
+				self.key_field = field
+
+		self.select_from = self.__select_from(self.fields, context.tables)
+		self.joins = list(context.joins)
+		self.tables = [t.fq_name for t in context.tables]
+		self.decoder = RowDecoder(context, self.fields)
+		self.schema = context.types_view()
+		
+		positions = {}
+		for i in range(len(context.tables)):
+			positions[context.tables[i].db_name] = i
+		self.field_tables = [positions[f.sql_name.split('.')[0]] for f in self.fields]
+		
+		self.branches = {}
+		self.__find_branches(self.schema)
+		
+		self.root_names = [self.fields[i].api_name.name for i in range(len(self.fields)) if self.field_tables[i] == 0]
+		self.relations_by_name = {}
+		self.relations = self.__find_relations(context.model, positions, [])
+		self.prunable = set()
+		for rel in self.relations_by_name.values():
+			if not rel.field.nullable and 'PRI' in rel.field.relation.key:
+				self.prunable.add(rel.index)
+		self.extra = []
+		
+		self.deletes = []
+		if self.key_field != None:
+			self.deletes = self.__find_deletes()
+		self.__projections = {}
+		self.__lock = threading.Lock()
+		
+	def __select_from (self, fields, tables):
+		sql = "SELECT \n\t"
+		sql += ', '.join([f.sql_name for f in fields])
+		sql += " \nFROM\n\t"
+		sql += ', '.join([t.fq_name + ' AS ' + t.db_name for t in tables])
+		return sql
+		
+	def __find_relations (self, model, positions, ancestors):
+		relations = []
+		for key in model:
+			if '_branch' in key or key + '_branch' not in model:
+				continue
+			branch = model[key + '_branch']
+			fields = [branch[k] for k in branch if '_branch' not in k and k + '_branch' not in branch]
+			index = positions[fields[0].sql_name.split('.')[0]]
+			rel = Relation(model[key], index, self.context.tables[index], fields, ancestors)
+			rel.children = self.__find_relations(branch, positions, ancestors + [rel.name])
+			self.relations_by_name[rel.name] = rel
+			relations.append(rel)
+		return relations
+		
+	def __find_deletes (self):
+		"""Groups the keys deleted per table and orders the tables, the ones referring to a 
+		table before it. Tables left in a cycle of references are placed last.
+		"""
+		groups = {(self.tables[0], self.key_field.name): [self.key_field.api_name.name]}
+		edges = {}
+		for rel in sorted(self.relations_by_name.values(), key=lambda r: r.index):
+			if rel.key_index == None:
+				return []
+			groups.setdefault((rel.table.fq_name, rel.key), []).append(rel.names[rel.key_index])
+			parent = self.tables[self.context.parents[rel.index]]
+			if parent != rel.table.fq_name:
+				edges.setdefault(parent, set()).add(rel.table.fq_name)
+				
+		tables = list(dict.fromkeys([g[0] for g in groups]))
+		incoming = dict([(t, 0) for t in tables])
+		for t in edges:
+			for u in edges[t]:
+				incoming[u] += 1
+		order = []
+		ready = [t for t in tables if incoming[t] == 0]
+		while len(ready) > 0:
+			t = ready.pop(0)
+			order.append(t)
+			for u in sorted(edges.get(t, []), key=tables.index):
+				incoming[u] -= 1
+				if incoming[u] == 0:
+					ready.append(u)
+		order += [t for t in tables if t not in order]
+		
+		return [(t, column, names) for t in order for (fq_name, column), names in groups.items() if fq_name == t]
+		
+	def __find_branches (self, structure):
+		for key in structure:
+			if is_type(structure[key], 'dict'):
+				self.branches[key] = leaves(structure[key])
+				self.__find_branches(structure[key])
+				
+	def project (self, names, used=[], extra=[]):
+		"""Gets the plan of a query returning only some of the context's fields.
+		
+		Only the tables holding the returned fields, or fields the query filters or orders 
+		on, are joined along with the tables linking them to the context's own table. 
+		The joins are inner joins, so tables whose join could drop rows, see `prunable`, 
+		are always joined and a projection returns the same rows as the full query. 
+		Projections are compiled once and kept.
+		
+		Args:
+			names (list of str): The api names of the fields to return.
+			used (list of str, optional): The api names of fields the query refers to 
+				without returning them.
+			extra (list of DatabaseField, optional): Fields to select after the returned 
+				fields without decoding them, i.e. foreign keys or the keys of a keyset page. 
+				Their tables are joined only if their api names are in `names` or `used`.
+				
+		Returns:
+			ContextPlan: The plan of the projection. Its `by_api` and `coercers` still hold 
+				every field of the context, for checking request parameters.
+		"""
+		key = (tuple(sorted(set(names))), tuple(sorted(set(used))), tuple([f.sql_name for f in extra]))
+		view = self.__projections.get(key)
+		if view != None:
+			return view
+			
+		needed = set([0])
+		for i in range(1, len(self.context.tables)):
+			if i not in self.prunable:
+				t = i
+				while t != None and t not in needed:
+					needed.add(t)
+					t = self.context.parents[t]
+		for i in range(len(self.fields)):
+			name = self.fields[i].api_name.name
+			if name in names or name in used:
+				t = self.field_tables[i]
+				while t != None and t not in needed:
+					needed.add(t)
+					t = self.context.parents[t]
+		tables = sorted(needed)
+		
+		view = copy.copy(self)
+		view.fields = [f for f in self.fields if f.api_name.name in names]
+		view.indexes = {}
+		for i in range(len(view.fields)):
+			view.indexes[view.fields[i].api_name.name] = i
+		view.extra = list(extra)
+		view.select_from = self.__select_from(view.fields + view.extra, [self.context.tables[t] for t in tables])
+		view.joins = [self.joins[t - 1] for t in tables if t > 0]
+		view.tables = [self.tables[t] for t in tables]
+		view.decoder = RowDecoder(self.context, view.fields)
+		view.schema = prune(self.schema, names)
+		
+		with self.__lock:
+			if len(self.__projections) >= MAX_PROJECTIONS:
+				self.__projections.clear()
+			self.__projections[key] = view
+		return view
+
+	def position (self, api_name):
+		"""Gets the position of a field in a result row of the plan.
+		
+		Args:
+			api_name (str): The api name of the field.
+			
+		Returns:
+			int: The index of the field in a row, among `fields` or else `extra`. None if 
+				the plan doesn't select it.
+		"""
+		if api_name in self.indexes:
+			return self.indexes[api_name]
+		for i in range(len(self.extra)):
+			if self.extra[i].api_name.name == api_name:
+				return len(self.fields) + i
+		return None
+
+	def coerce (self, api_name, value):
+		"""Converts a request value to the type of a field.
+
+		Args:
+			api_name (str): The api name of the field.
+			value (str): The value from the request.
+
+		Returns:
+			any: The converted value.
+
+		Raises:
+			ValueError: If the value can't be converted to the field's type.
+		"""
+		return self.coercers[api_name](value)
+
+	def del_sql_parts (self, rows, indexes):
+		"""Makes the statements deleting instances of the context along with their related rows.
+		
+		Args:
+			rows (list of tuple): Rows holding the keys of the instances, as named in `deletes`.
+			indexes (dict of [str, int]): The position of each key in the rows, by api name.
+			
+		Returns:
+			list of (str, tuple): The deletion statements, in `deletes` order, and their values. 
+				The keys of a table reached through several relations are deleted together.
+		"""
+		sql = []
+		for fq_name, column, names in self.deletes:
+			keys = list(dict.fromkeys([r[indexes[n]] for n in names for r in rows if r[indexes[n]] != None]))
+			for j in range(0, len(keys), MAX_IN):
+				batch = keys[j:j + MAX_IN]
+				sql.append(('DELETE FROM ' + fq_name + ' WHERE ' + column + ' IN (' + ', '.join(['%s'] * len(batch)) + ');', tuple(batch)))
+		return sql
+
+	def sql (self, conditions=[], suffix=''):
+		"""Fills in the context query template.
+
+		Args:
+			conditions (list of str, optional): Extra conditions to AND onto the joins.
+			suffix (str, optional): Clauses to place after the WHERE clause, i.e. ORDER BY.
+
+		Returns:
+			str: The complete sql query.
+		"""
+		sql = self.select_from
+		clauses = self.joins + conditions
+		if len(clauses) > 0:
+			sql += " \nWHERE\n\t" + ' AND '.join(clauses)
+		return sql + suffix + ';'
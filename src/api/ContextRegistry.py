@@ -0,0 +1,119 @@
+"""Module containing logic to index API contexts by name.
+"""
+
+import threading
+from shared.SharedServices import force_type
+
+
+class ContextRegistry:
+	"""Class indexing API contexts by their name and aliases.
+
+	Lookups are a single dictionary access no matter how many contexts are registered.
+	Contexts can be added and removed while the api is serving requests.
+
+	Attributes:
+		contexts (list of APIContext): The contexts to register initially.
+
+	Raises:
+		TypeError: If a non APIContext is registered.
+		ValueError: If a context name or alias is already taken by another context.
+	"""
+	def __init__ (self, contexts=[]):
+		caller = 'ContextRegistry.__init__'
+		force_type(contexts, 'list', caller=caller)
+
+		self.__by_name = {}
+		self.__contexts = {}
+		self.__lock = threading.Lock()
+
+		for c in contexts:
+			self.add(c)
+
+	def __len__ (self):
+		return len(self.__contexts)
+
+	def __iter__ (self):
+		return iter(list(self.__contexts.values()))
+
+	def __contains__ (self, name):
+		return name in self.__by_name
+
+	def get (self, name):
+		"""Looks up a context by its name or one of its aliases.
+
+		Args:
+			name (str): The name or alias of the context.
+
+		Returns:
+			APIContext: The context, None if no context goes by the name.
+		"""
+		return self.__by_name.get(name)
+
+	def add (self, context):
+		"""Registers a context under its name and aliases.
+
+		Args:
+			context (APIContext): The context to register.
+
+		Raises:
+			TypeError: If a non APIContext is passed.
+			ValueError: If the name or an alias is already taken by another context.
+		"""
+		caller = 'ContextRegistry.add'
+		force_type(context, 'api.APIContext.APIContext', caller=caller)
+
+		names = [context.api_name.name] + context.api_name.aliases
+		with self.__lock:
+			for n in names:
+				taken = self.__by_name.get(n)
+				if taken is not None and taken is not context:
+					raise ValueError('[' + caller + "] The name '" + n + "' is already taken by context '" + taken.name + "'")
+			self.__contexts[context.name] = context
+			for n in names:
+				self.__by_name[n] = context
+
+	def add_alias (self, name, alias):
+		"""Registers an extra alias for an already registered context.
+
+		Args:
+			name (str): The name or an existing alias of the context.
+			alias (str): The new alias.
+
+		Raises:
+			ValueError: If no context goes by the name or the alias is already taken.
+		"""
+		caller = 'ContextRegistry.add_alias'
+		force_type(alias, 'str', caller=caller)
+
+		with self.__lock:
+			context = self.__by_name.get(name)
+			if context is None:
+				raise ValueError('[' + caller + "] No context named '" + name + "'")
+			taken = self.__by_name.get(alias)
+			if taken is not None and taken is not context:
+				raise ValueError('[' + caller + "] The name '" + alias + "' is already taken by context '" + taken.name + "'")
+			if alias not in context.api_name.aliases:
+				context.api_name.aliases.append(alias)
+			self.__by_name[alias] = context
+
+	def remove (self, name):
+		"""Unregisters a context along with all of its aliases.
+
+		Args:
+			name (str): The name or an alias of the context.
+
+		Returns:
+			APIContext: The removed context.
+
+		Raises:
+			ValueError: If no context goes by the name.
+		"""
+		with self.__lock:
+			context = self.__by_name.get(name)
+			if context is None:
+				raise ValueError("[ContextRegistry.remove] No context named '" + name + "'")
+			for n in [context.api_name.name] + context.api_name.aliases:
+				if self.__by_name.get(n) is context:
+					del self.__by_name[n]
+			del self.__contexts[context.name]
+		return context
@@ -0,0 +1,119 @@
+"""Module containing logic to load related rows by key for the duration of a request.
+"""
+
+from api.Relation import MAX_IN
+
+
+class DataLoader:
+	"""Class loading the related rows of an API context by key, memoizing them for one request.
+
+	Keys are collected across all of the relations loaded together and de-duplicated, then
+	looked up with one IN query per related table, batched by `MAX_IN`. Relations of the
+	same table selecting the same columns share their queries and their loaded rows. A row
+	is decoded once per relation, so a parent shared by many rows is a single object.
+
+	Loading is a query generator, in the way of `APIController`: the loader yields
+	`(sql, params)` tuples and is sent the fetched rows back, so it runs the same on a sync
+	or an async connection.
+
+	Attributes:
+		rows (dict): The loaded rows by key, per table and column selection. Keys that
+			weren't found are held as None so they aren't looked up again.
+		objects (dict of [str, dict]): The decoded rows by key, per relation name.
+		queries (int): The amount of queries issued.
+	"""
+	def __init__ (self):
+		self.rows = {}
+		self.objects = {}
+		self.queries = 0
+
+	def load (self, wanted):
+		"""Query generator loading the rows of relations for the keys not loaded yet.
+
+		Args:
+			wanted (list of (Relation, iterable)): The relations with the keys to load for each.
+
+		Returns:
+			None: Once the rows are loaded, get them with `get`.
+		"""
+		groups = {}
+		for rel, keys in wanted:
+			sig = self.__signature(rel)
+			if sig not in groups:
+				groups[sig] = (rel, {})
+			missing = groups[sig][1]
+			loaded = self.rows.setdefault(sig, {})
+			for k in keys:
+				if k != None and k not in loaded:
+					missing[k] = True
+
+		for sig in groups:
+			rel, missing = groups[sig]
+			keys = list(missing)
+			loaded = self.rows[sig]
+			for i in range(0, len(keys), MAX_IN):
+				batch = keys[i:i + MAX_IN]
+				found = yield rel.sql(len(batch)), tuple(batch)
+				self.queries += 1
+				for r in found:
+					loaded[r[rel.key_index]] = r
+			for k in keys:
+				if k not in loaded:
+					loaded[k] = None
+
+	def get (self, rel, key):
+		"""Gets a loaded row of a relation, decoded.
+
+		Args:
+			rel (Relation): The relation.
+			key: The key of the row.
+
+		Returns:
+			dict: The decoded row, the same object on every call. None if the key is None
+				or no row has it.
+		"""
+		if key == None:
+			return None
+		decoded = self.objects.setdefault(rel.name, {})
+		if key not in decoded:
+			row = self.rows.get(self.__signature(rel), {}).get(key)
+			decoded[key] = rel.decode(row) if row != None else None
+		return decoded[key]
+
+	def expand (self, objects, relations, expand):
+		"""Query generator replacing the foreign keys in decoded rows with the rows they refer to.
+
+		Relations are loaded a level at a time, the keys of all relations on a level being
+		loaded together. Objects are expanded in place, relations not listed in `expand`
+		are left as bare foreign keys.
+
+		Args:
+			objects (list of dict): The decoded rows, holding the foreign keys of `relations`.
+			relations (list of Relation): The relations out of the rows.
+			expand (set of str): The api names of the relations to load.
+
+		Returns:
+			list of dict: The objects.
+		"""
+		level = [(r, objects) for r in relations if r.name in expand]
+		while len(level) > 0:
+			yield from self.load([(rel, [o[rel.name] for o in owners if not isinstance(o[rel.name], dict)]) for rel, owners in level])
+			below = []
+			for rel, owners in level:
+				related = {}
+				for o in owners:
+					if not isinstance(o[rel.name], dict):
+						o[rel.name] = self.get(rel, o[rel.name])
+					if o[rel.name] != None:
+						related[id(o[rel.name])] = o[rel.name]
+				for c in rel.children:
+					if c.name in expand:
+						below.append((c, list(related.values())))
+			level = below
+		return objects
+
+	def __signature (self, rel):
+		"""Identifies the query loading a relation, the same for relations of the same
+		table selecting the same columns.
+		"""
+		return (rel.table.fq_name, rel.key, tuple([f.name for f in rel.fields]), tuple([c.field.name for c in rel.children]))
@@ -0,0 +1,113 @@
+"""Module containing logic to batch single id lookups from concurrent requests.
+"""
+
+import asyncio
+import threading
+from shared.SharedServices import force_type
+
+
+class MicroBatcher:
+	"""Class gathering the id lookups of concurrent requests into one query per context.
+
+	The first lookup of a context opens a batch that is run after `window` seconds, or as
+	soon as it holds `max_keys` ids. Each batch is fetched with a single call, normally to
+	`APIController.context_query_ids`, and the result of each id is handed back to the
+	requests waiting on it. Requests for the same id in one batch share its lookup.
+
+	Attributes:
+		fetch (function): Coroutine function called with the context name and the list of
+			ids of a batch, returning the (data, return code) of the lookup with data being
+			the decoded instances by id as a string.
+		window (float): Seconds a batch waits for more ids before it is run.
+		max_keys (int): The most ids in a batch.
+
+	Raises:
+		TypeError: If any of the attributes are of unexpected types.
+	"""
+	def __init__ (self, fetch, window=0.002, max_keys=100):
+		caller = 'MicroBatcher.__init__'
+		force_type(max_keys, 'int', caller=caller)
+
+		self.fetch = fetch
+		self.window = float(window)
+		self.max_keys = max_keys
+
+		self.__pending = {}
+		self.__lock = threading.Lock()
+		self.__batches = 0
+		self.__lookups = 0
+		self.__ids = 0
+
+	async def get (self, context_name, id):
+		"""Looks up a single instance of a context by id as part of a batch.
+
+		Args:
+			context_name (str): The name of the context being queried.
+			id (str): The id of the instance.
+
+		Returns:
+			(any, int): The decoded instance and a return code of 200, an empty string and
+				404 if there is no such instance, or the error of the batch lookup.
+		"""
+		loop = asyncio.get_running_loop()
+		id = str(id)
+		batch = self.__pending.get(context_name)
+		if batch == None:
+			batch = {}
+			self.__pending[context_name] = batch
+			loop.call_later(self.window, self.__flush, context_name, batch)
+		future = batch.get(id)
+		if future == None:
+			future = loop.create_future()
+			batch[id] = future
+		with self.__lock:
+			self.__lookups += 1
+		if len(batch) >= self.max_keys:
+			self.__flush(context_name, batch)
+		return await asyncio.shield(future)
+
+	def stats (self):
+		"""Reports on the lookups batched.
+
+		Returns:
+			dict of [str, int]: The batches run, the lookups made, the distinct ids looked up
+				and the batches waiting to run.
+		"""
+		with self.__lock:
+			d = {
+					'batches': self.__batches,
+					'lookups': self.__lookups,
+					'ids': self.__ids,
+					'pending': len(self.__pending)
+				}
+		return d
+
+	def __flush (self, context_name, batch):
+		"""Closes a batch and starts running it, unless it was already.
+		"""
+		if self.__pending.get(context_name) is not batch:
+			return
+		del self.__pending[context_name]
+		with self.__lock:
+			self.__batches += 1
+			self.__ids += len(batch)
+		asyncio.ensure_future(self.__run(context_name, batch))
+
+	async def __run (self, context_name, batch):
+		try:
+			data, retno = await self.fetch(context_name, list(batch))
+		except Exception as e:
+			for future in batch.values():
+				if not future.done():
+					future.set_exception(e)
+			return
+		for id in batch:
+			future = batch[id]
+			if future.done():
+				continue
+			if retno != 200:
+				future.set_result((data, retno))
+			elif id in data:
+				future.set_result((data[id], 200))
+			else:
+				future.set_result(('', 404))
@@ -0,0 +1,193 @@
+"""Module containing logic to cache single decoded objects by primary key.
+
+Attributes:
+	NOT_FOUND (object): Returned by lookups of ids recently found not to exist.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from shared.SharedServices import force_type
+
+NOT_FOUND = object()
+
+
+class ObjectCache:
+	"""Class caching the decoded objects of contexts by their primary key.
+
+	Objects are evicted least recently used first once there are `max_entries`, and after 
+	`ttl` seconds if set. Ids that were looked up and not found are kept in a smaller, 
+	shorter lived negative cache so repeated lookups of missing ids don't reach the 
+	database either.
+
+	Invalidation works per context: each context has a generation, and entries stored under 
+	an older generation are ignored. Objects are stamped with the generation read before 
+	they were queried, so an object read while its context was being invalidated is never 
+	stored as current. Missing ids are also stamped with the epoch of their context's 
+	missing ids, which moves on whenever rows are inserted, so an id found missing before 
+	its row was inserted is never stored as missing after.
+
+	Attributes:
+		max_entries (int): The most objects held.
+		ttl (float): Seconds an object is kept. If 0, objects are kept until invalidated or evicted.
+		negative_entries (int): The most missing ids held.
+		negative_ttl (float): Seconds a missing id is kept.
+
+	Raises:
+		TypeError: If any of the attributes are of unexpected types.
+	"""
+	def __init__ (self, max_entries=10000, ttl=0.0, negative_entries=1024, negative_ttl=5.0):
+		caller = 'ObjectCache.__init__'
+		force_type(max_entries, 'int', caller=caller)
+		force_type(negative_entries, 'int', caller=caller)
+
+		self.max_entries = max_entries
+		self.ttl = ttl
+		self.negative_entries = negative_entries
+		self.negative_ttl = negative_ttl
+
+		self.__objects = OrderedDict()
+		self.__missing = OrderedDict()
+		self.__generations = {}
+		self.__epochs = {}
+		self.__lock = threading.Lock()
+		self.__hits = 0
+		self.__negative_hits = 0
+		self.__misses = 0
+
+	def generation (self, context_name):
+		"""Gets the current generation of a context, to stamp objects about to be queried.
+
+		Args:
+			context_name (str): The name of the context.
+
+		Returns:
+			int: The generation.
+		"""
+		return self.__generations.get(context_name, 0)
+
+	def epoch (self, context_name):
+		"""Gets the current epoch of the missing ids of a context, to stamp ids about to be queried.
+
+		Args:
+			context_name (str): The name of the context.
+
+		Returns:
+			int: The epoch.
+		"""
+		return self.__epochs.get(context_name, 0)
+
+	def get (self, context_name, pk):
+		"""Looks up an object.
+
+		Args:
+			context_name (str): The name of the context.
+			pk (str): The primary key of the object.
+
+		Returns:
+			dict: The object, `NOT_FOUND` if the id is known not to exist or None if unknown.
+		"""
+		key = (context_name, pk)
+		now = time.monotonic()
+		with self.__lock:
+			current = self.__generations.get(context_name, 0)
+			entry = self.__objects.get(key)
+			if entry != None:
+				if entry[1] == current and (entry[2] == None or now <= entry[2]):
+					self.__objects.move_to_end(key)
+					self.__hits += 1
+					return entry[0]
+				del self.__objects[key]
+			entry = self.__missing.get(key)
+			if entry != None:
+				if entry[0] == current and now <= entry[1]:
+					self.__negative_hits += 1
+					return NOT_FOUND
+				del self.__missing[key]
+			self.__misses += 1
+			return None
+
+	def put (self, context_name, pk, obj, generation):
+		"""Caches an object.
+
+		Args:
+			context_name (str): The name of the context.
+			pk (str): The primary key of the object.
+			obj (dict): The decoded object.
+			generation (int): The generation of the context read before the object was queried.
+		"""
+		key = (context_name, pk)
+		expires = None
+		if self.ttl > 0:
+			expires = time.monotonic() + self.ttl
+		with self.__lock:
+			if generation != self.__generations.get(context_name, 0):
+				return
+			self.__missing.pop(key, None)
+			self.__objects[key] = (obj, generation, expires)
+			self.__objects.move_to_end(key)
+			while len(self.__objects) > self.max_entries:
+				self.__objects.popitem(last=False)
+
+	def put_missing (self, context_name, pk, generation, epoch):
+		"""Records an id that was not found.
+
+		Args:
+			context_name (str): The name of the context.
+			pk (str): The primary key that was looked up.
+			generation (int): The generation of the context read before the id was queried.
+			epoch (int): The epoch of the missing ids of the context read before the id was queried.
+		"""
+		key = (context_name, pk)
+		with self.__lock:
+			if generation != self.__generations.get(context_name, 0):
+				return
+			if epoch != self.__epochs.get(context_name, 0):
+				return
+			self.__missing[key] = (generation, time.monotonic() + self.negative_ttl)
+			self.__missing.move_to_end(key)
+			while len(self.__missing) > self.negative_entries:
+				self.__missing.popitem(last=False)
+
+	def invalidate (self, context_names):
+		"""Drops every object and missing id of some contexts.
+
+		Args:
+			context_names (list of str): The names of the contexts.
+		"""
+		with self.__lock:
+			for name in context_names:
+				self.__generations[name] = self.__generations.get(name, 0) + 1
+
+	def forget_missing (self, context_names):
+		"""Drops the missing ids of some contexts, i.e. after rows were inserted into their tables.
+
+		The epoch of their missing ids moves on, so lookups that started before the insert 
+		can't record their ids as missing.
+
+		Args:
+			context_names (list of str): The names of the contexts.
+		"""
+		with self.__lock:
+			for name in context_names:
+				self.__epochs[name] = self.__epochs.get(name, 0) + 1
+			for key in list(self.__missing):
+				if key[0] in context_names:
+					del self.__missing[key]
+
+	def stats (self):
+		"""Reports on the use of the cache.
+
+		Returns:
+			dict of [str, int]: The objects and missing ids held, and the lookup counters.
+		"""
+		with self.__lock:
+			d = {
+					'entries': len(self.__objects),
+					'max_entries': self.max_entries,
+					'missing': len(self.__missing),
+					'hits': self.__hits,
+					'negative_hits': self.__negative_hits,
+					'misses': self.__misses
+				}
+		return d
@@ -0,0 +1,84 @@
+"""Module containing logic to load the related rows of an API context separately.
+
+Attributes:
+	MAX_IN (int): The most keys bound into a single IN list, `APIContext.MAX_BIND` so that 
+		a list never goes over the bind limit of any provider.
+"""
+
+from shared.SharedServices import force_type
+from api.APIContext import MAX_BIND
+
+MAX_IN = MAX_BIND
+
+
+class Relation:
+	"""Class describing a foreign key relation of an API context, as followed by `APIContext.branch_rel`.
+
+	Holds what is needed to load the rows of the related table on their own, by key, rather
+	than joining them into the context query.
+
+	Attributes:
+		field (DatabaseField): The foreign key field, as placed in the context model.
+		name (str): The api name of the relation, the name of the foreign key field.
+		index (int): The index of the related table in the context's tables.
+		table (DatabaseTable): The related table, as placed in the context.
+		key (str): The name of the column of the related table the foreign key refers to.
+		fields (list of DatabaseField): The fields of the related table, in selection order.
+		children (list of Relation): The relations out of the related table.
+		ancestors (list of str): The names of the relations leading to this one, outermost first.
+	"""
+	def __init__ (self, field, index, table, fields, ancestors=[]):
+		caller = 'Relation.__init__'
+		force_type(field, 'db.DatabaseField.DatabaseField', caller=caller)
+		force_type(index, 'int', caller=caller)
+		force_type(table, 'db.DatabaseTable.DatabaseTable', caller=caller)
+		force_type(fields, 'list', caller=caller)
+
+		self.field = field
+		self.name = field.api_name.name
+		self.index = index
+		self.table = table
+		self.key = field.relation.name
+		self.fields = fields
+		self.children = []
+		self.ancestors = list(ancestors)
+
+		self.names = [f.api_name.name for f in fields]
+		self.key_index = None
+		for i in range(len(fields)):
+			if fields[i].name == self.key:
+				self.key_index = i
+
+	def sql (self, count):
+		"""Makes the query loading related rows by key.
+
+		The fields of the related table are selected first, followed by the foreign keys
+		of its own relations in the order of `children`.
+
+		Args:
+			count (int): The amount of keys to look up.
+
+		Returns:
+			str: The sql query, with a %s placeholder per key.
+		"""
+		cols = [f.sql_name for f in self.fields] + [c.field.sql_name for c in self.children]
+		sql = "SELECT \n\t" + ', '.join(cols)
+		sql += " \nFROM\n\t" + self.table.fq_name + ' AS ' + self.table.db_name
+		sql += " \nWHERE\n\t" + self.table.db_name + '.' + self.key + ' IN (' + ', '.join(['%s'] * count) + ');'
+		return sql
+
+	def decode (self, row):
+		"""Decodes a row loaded with `sql` into an object holding bare foreign keys.
+
+		Args:
+			row (tuple): The row.
+
+		Returns:
+			dict: The decoded row.
+		"""
+		obj = dict(zip(self.names, row))
+		i = len(self.fields)
+		for c in self.children:
+			obj[c.name] = row[i]
+			i += 1
+		return obj
@@ -0,0 +1,193 @@
+"""Module containing logic to cache query results in process.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from shared.SharedServices import force_type
+
+def estimate_size (rows):
+	"""Estimates the memory held by a list of result rows.
+
+	Args:
+		rows (list of tuple): The rows.
+
+	Returns:
+		int: The estimated size in bytes.
+	"""
+	size = sys.getsizeof(rows)
+	for row in rows:
+		size += sys.getsizeof(row)
+		for v in row:
+			size += sys.getsizeof(v)
+	return size
+
+
+class ResultCache:
+	"""Class caching query results, invalidated by the versions of the tables they read.
+
+	Each entry records the tables it was read from along with their versions at the time 
+	of reading. Once any of those tables is written the versions no longer match and the 
+	entry is dropped on its next lookup. Entries are also dropped after `ttl` seconds, to 
+	pick up writes made outside of the api, and the least recently used entries are 
+	evicted when the cache grows past `max_bytes`.
+
+	Attributes:
+		versions (TableVersions): The table versions entries are checked against.
+		max_bytes (int): The most memory, as estimated, held by all entries together.
+		ttl (float): Seconds an entry is kept. If 0, entries are kept until invalidated or evicted.
+
+	Raises:
+		TypeError: If any of the attributes are of unexpected types.
+	"""
+	def __init__ (self, versions, max_bytes=64 * 1024 * 1024, ttl=60.0):
+		caller = 'ResultCache.__init__'
+		force_type(versions, 'api.TableVersions.TableVersions', caller=caller)
+		force_type(max_bytes, 'int', caller=caller)
+		if not isinstance(ttl, (int, float)):
+			raise TypeError('[' + caller + '] ttl must be a number')
+
+		self.versions = versions
+		self.max_bytes = max_bytes
+		self.ttl = ttl
+
+		self.__entries = OrderedDict()
+		self.__bytes = 0
+		self.__lock = threading.Lock()
+		self.__hits = 0
+		self.__misses = 0
+		self.__evictions = 0
+		self.__invalidations = 0
+
+	def get (self, key):
+		"""Looks up a cached result.
+
+		Args:
+			key (tuple): The key the result was cached under.
+
+		Returns:
+			any: The cached value, None if there is no current entry for the key.
+		"""
+		with self.__lock:
+			entry = self.__entries.get(key)
+			if entry == None:
+				self.__misses += 1
+				return None
+			value, tables, stamp, expires, size = entry
+			if (expires != None and time.monotonic() > expires) or self.versions.snapshot(tables) != stamp:
+				self.__drop(key)
+				self.__invalidations += 1
+				self.__misses += 1
+				return None
+			self.__entries.move_to_end(key)
+			self.__hits += 1
+			return value
+
+	def put (self, key, value, tables, stamp, size):
+		"""Caches a result.
+
+		Args:
+			key (tuple): The key to cache the result under.
+			value (any): The result.
+			tables (list of str): The fully qualified names of the tables the result was read from.
+			stamp (tuple of int): The versions of the tables taken before they were read, 
+				see `TableVersions.snapshot`.
+			size (int): The estimated size of the value in bytes.
+		"""
+		if size > self.max_bytes:
+			return
+		expires = None
+		if self.ttl > 0:
+			expires = time.monotonic() + self.ttl
+		with self.__lock:
+			if key in self.__entries:
+				self.__drop(key)
+			self.__entries[key] = (value, tables, stamp, expires, size)
+			self.__bytes += size
+			while self.__bytes > self.max_bytes:
+				self.__drop(next(iter(self.__entries)))
+				self.__evictions += 1
+
+	def collect (self, chunks, key, tables, stamp):
+		"""Wraps a stream of row chunks so its rows are cached once the stream is exhausted.
+
+		Rows are only gathered while they fit in a sixteenth of `max_bytes`, larger results 
+		are streamed without being cached so streaming keeps its bounded memory use.
+
+		Args:
+			chunks (iterator or async iterator of list of tuple): The chunks of rows.
+			key (tuple): The key to cache the rows under.
+			tables (list of str): The fully qualified names of the tables the rows are read from.
+			stamp (tuple of int): The versions of the tables taken before they were read.
+
+		Returns:
+			iterator or async iterator of list of tuple: The same chunks.
+		"""
+		if hasattr(chunks, '__aiter__'):
+			return self.__collect_async(chunks, key, tables, stamp)
+		return self.__collect(chunks, key, tables, stamp)
+
+	def __collect (self, chunks, key, tables, stamp):
+		rows = []
+		size = 0
+		try:
+			for chunk in chunks:
+				if rows != None:
+					rows.extend(chunk)
+					size += estimate_size(chunk)
+					if size > self.max_bytes // 16:
+						rows = None
+				yield chunk
+		finally:
+			if hasattr(chunks, 'close'):
+				chunks.close()
+		if rows != None:
+			self.put(key, rows, tables, stamp, size)
+
+	async def __collect_async (self, chunks, key, tables, stamp):
+		rows = []
+		size = 0
+		try:
+			async for chunk in chunks:
+				if rows != None:
+					rows.extend(chunk)
+					size += estimate_size(chunk)
+					if size > self.max_bytes // 16:
+						rows = None
+				yield chunk
+		finally:
+			if hasattr(chunks, 'aclose'):
+				await chunks.aclose()
+		if rows != None:
+			self.put(key, rows, tables, stamp, size)
+
+	def clear (self):
+		"""Drops every entry.
+		"""
+		with self.__lock:
+			self.__entries.clear()
+			self.__bytes = 0
+
+	def __drop (self, key):
+		self.__bytes -= self.__entries.pop(key)[4]
+
+	def stats (self):
+		"""Reports on the use of the cache.
+
+		Returns:
+			dict of [str, any]: The entries and bytes held, and the lookup and eviction counters.
+		"""
+		with self.__lock:
+			lookups = self.__hits + self.__misses
+			d = {
+					'entries': len(self.__entries),
+					'bytes': self.__bytes,
+					'max_bytes': self.max_bytes,
+					'hits': self.__hits,
+					'misses': self.__misses,
+					'hit_ratio': (self.__hits / lookups if lookups > 0 else 0.0),
+					'evictions': self.__evictions,
+					'invalidations': self.__invalidations
+				}
+		return d
@@ -0,0 +1,59 @@
+"""Module containing logic to decode result rows of an API context into nested dicts.
+"""
+
+from shared.SharedServices import force_type, is_type
+
+
+class RowDecoder:
+	"""Class decoding result rows of an API context into its nested api structure.
+
+	The structure of the context is walked once to find the row position of every output
+	key. From those positions a single function building the nested dict straight from a
+	row tuple is generated, so decoding a row costs one dict display per nesting level.
+
+	Attributes:
+		context (APIContext): The context whose rows are decoded.
+		fields (list of DatabaseField, optional): The fields in the order they appear in a row.
+			Defaults to the flattened fields of the context.
+		names (list of str, optional): The api names of the fields to decode. Relations left 
+			without any are dropped from the output. Defaults to all of the fields.
+		source (str): The generated source of the decoding function.
+		decode (function): Decodes a single row tuple into its nested dict.
+	"""
+	def __init__ (self, context, fields=None, names=None):
+		caller = 'RowDecoder.__init__'
+		force_type(context, 'api.APIContext.APIContext', caller=caller)
+
+		self.context = context
+		if fields == None:
+			fields = context.flat_fields()
+
+		indexes = {}
+		for i in range(len(fields)):
+			if names == None or fields[i].api_name.name in names:
+				indexes[fields[i].api_name.name] = i
+
+		self.source = 'lambda r: ' + self.__render(context.types_view(), indexes)
+		self.decode = eval(compile(self.source, '<RowDecoder ' + context.name + '>', 'eval'), {})
+
+	def __render (self, structure, indexes):
+		parts = []
+		for key in structure:
+			if is_type(structure[key], 'dict'):
+				branch = self.__render(structure[key], indexes)
+				if branch != '{}':
+					parts.append(repr(key) + ': ' + branch)
+			elif key in indexes:
+				parts.append(repr(key) + ': r[' + str(indexes[key]) + ']')
+		return '{' + ', '.join(parts) + '}'
+
+	def decode_all (self, rows):
+		"""Decodes a whole result set.
+
+		Args:
+			rows (list of tuple): The result rows of a query on the context.
+
+		Returns:
+			list of dict: The decoded rows.
+		"""
+		return list(map(self.decode, rows))
@@ -0,0 +1,82 @@
+"""Module containing logic to decode streamed query results a chunk at a time.
+"""
+
+
+class RowStream:
+	"""Class decoding chunks of result rows as they are streamed from the database.
+
+	Wraps either a blocking iterator of row chunks, from `DatabaseConnection.fetch_stream`,
+	an async one, from `DatabaseConnection.fetch_stream_async`, or a list holding the rows
+	of a page that was already read, so that only one chunk of rows is decoded at once.
+	Iterate it the same way as the underlying chunks, a list can be iterated either way.
+
+	Attributes:
+		chunks (iterable or async iterable of list of tuple): The chunks of result rows.
+		plan (ContextPlan): The plan of the context the rows were queried from.
+		next_cursor (str, optional): The continuation token of a keyset page, None if
+			there are no more results or the results aren't keyset paged.
+		decoded (bool): Whether the chunks are decoded into dicts or left as row tuples.
+		objects (bool): Whether the chunks already hold decoded objects rather than rows, 
+			i.e. with relations loaded separately. These are passed through as they are.
+		missing (list of str): The ids of a `{pk}_in` filter no row was found for, None if 
+			the rows weren't filtered by id.
+	"""
+	def __init__ (self, chunks, plan, next_cursor=None):
+		self.chunks = chunks
+		self.plan = plan
+		self.next_cursor = next_cursor
+		self.decoded = True
+		self.objects = False
+		self.missing = None
+
+	@property
+	def fields (self):
+		"""list of DatabaseField: The fields in the order they appear in a row."""
+		return self.plan.fields
+
+	@property
+	def buffered (self):
+		"""bool: Whether the rows are already in memory rather than read as they are iterated."""
+		return isinstance(self.chunks, list)
+
+	def raw (self):
+		"""Gets a view of the stream yielding undecoded chunks, for writers that work on row tuples.
+
+		Returns:
+			RowStream: The stream of row tuples.
+		"""
+		stream = RowStream(self.chunks, self.plan, self.next_cursor)
+		stream.decoded = False
+		stream.objects = self.objects
+		stream.missing = self.missing
+		return stream
+
+	def __iter__ (self):
+		try:
+			for chunk in self.chunks:
+				yield self.__decode(chunk)
+		finally:
+			if hasattr(self.chunks, 'close'):
+				self.chunks.close()
+
+	async def __aiter__ (self):
+		if not hasattr(self.chunks, '__aiter__'):
+			for chunk in self.chunks:
+				yield self.__decode(chunk)
+			return
+		try:
+			async for chunk in self.chunks:
+				yield self.__decode(chunk)
+		finally:
+			if hasattr(self.chunks, 'aclose'):
+				await self.chunks.aclose()
+
+	def __decode (self, chunk):
+		if self.objects:
+			return chunk
+		if self.decoded:
+			return self.plan.decoder.decode_all(chunk)
+		if len(self.plan.extra) > 0:
+			width = len(self.plan.fields)
+			return [r[:width] for r in chunk]
+		return chunk
@@ -0,0 +1,120 @@
+"""Module containing logic to coalesce identical concurrent calls into one.
+"""
+
+import asyncio
+import threading
+
+
+class Flight:
+	"""Class holding the outcome of a call shared by blocking callers.
+
+	Attributes:
+		done (threading.Event): Set once the call has finished.
+		result (any): The value returned by the call.
+		error (Exception): The exception raised by the call, None if it succeeded.
+	"""
+	def __init__ (self):
+		self.done = threading.Event()
+		self.result = None
+		self.error = None
+
+
+class SingleFlight:
+	"""Class letting identical calls made at the same time share one execution.
+
+	The first caller for a key runs the call, callers arriving with the same key while it 
+	is running wait for it and are handed the same result, or the same exception. Once the 
+	call finishes the key is free again, so results are never reused past the call itself.
+	Blocking callers and async callers are coalesced separately.
+	"""
+	def __init__ (self):
+		self.__flights = {}
+		self.__tasks = {}
+		self.__lock = threading.Lock()
+		self.__led = 0
+		self.__shared = 0
+
+	def do (self, key, fn, *args):
+		"""Runs a blocking call, or waits for the identical call already running.
+
+		Args:
+			key (hashable): Identifies the call, calls with equal keys must be interchangeable.
+			fn (function): The function to call.
+			*args: The arguments to call it with.
+
+		Returns:
+			any: The value returned by the call.
+
+		Raises:
+			Exception: Whatever the call raised.
+		"""
+		with self.__lock:
+			flight = self.__flights.get(key)
+			if flight != None:
+				self.__shared += 1
+				leader = False
+			else:
+				flight = Flight()
+				self.__flights[key] = flight
+				self.__led += 1
+				leader = True
+
+		if not leader:
+			flight.done.wait()
+		else:
+			try:
+				flight.result = fn(*args)
+			except Exception as e:
+				flight.error = e
+			finally:
+				with self.__lock:
+					del self.__flights[key]
+				flight.done.set()
+
+		if flight.error != None:
+			raise flight.error
+		return flight.result
+
+	async def do_async (self, key, fn, *args):
+		"""Awaits a coroutine function, or the identical call already running.
+
+		The call runs in its own task, so a caller being cancelled doesn't cancel it for 
+		the other callers waiting on it.
+
+		Args:
+			key (hashable): Identifies the call, calls with equal keys must be interchangeable.
+			fn (coroutine function): The function to call.
+			*args: The arguments to call it with.
+
+		Returns:
+			any: The value returned by the call.
+
+		Raises:
+			Exception: Whatever the call raised.
+		"""
+		task = self.__tasks.get(key)
+		if task != None:
+			with self.__lock:
+				self.__shared += 1
+		else:
+			task = asyncio.ensure_future(fn(*args))
+			self.__tasks[key] = task
+			task.add_done_callback(lambda t: self.__tasks.pop(key, None))
+			with self.__lock:
+				self.__led += 1
+		return await asyncio.shield(task)
+
+	def stats (self):
+		"""Reports on the calls coalesced.
+
+		Returns:
+			dict of [str, int]: The calls run, the calls that joined a running call and the 
+				calls currently running.
+		"""
+		with self.__lock:
+			d = {
+					'led': self.__led,
+					'shared': self.__shared,
+					'in_flight': len(self.__flights) + len(self.__tasks)
+				}
+		return d
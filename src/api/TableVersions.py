@@ -0,0 +1,50 @@
+"""Module containing logic to track when the data of database tables changes.
+"""
+
+import threading
+
+
+class TableVersions:
+	"""Class counting the writes made through the api to each database table.
+
+	Anything derived from a table can be stamped with the table's version when it is 
+	read, and is stale once the version has moved on.
+
+	Attributes:
+		versions (dict of [str, int]): The version of each written table, by fully qualified name.
+	"""
+	def __init__ (self):
+		self.versions = {}
+		self.__lock = threading.Lock()
+
+	def get (self, table):
+		"""Gets the version of a table.
+
+		Args:
+			table (str): The fully qualified name of the table.
+
+		Returns:
+			int: The version of the table, 0 if it was never written.
+		"""
+		return self.versions.get(table, 0)
+
+	def snapshot (self, tables):
+		"""Gets the versions of several tables at once.
+
+		Args:
+			tables (list of str): The fully qualified names of the tables.
+
+		Returns:
+			tuple of int: The version of each table, in the order given.
+		"""
+		return tuple([self.versions.get(t, 0) for t in tables])
+
+	def bump (self, tables):
+		"""Marks tables as written, moving each on to a new version.
+
+		Args:
+			tables (list of str): The fully qualified names of the written tables.
+		"""
+		with self.__lock:
+			for t in tables:
+				self.versions[t] = self.versions.get(t, 0) + 1
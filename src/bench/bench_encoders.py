@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Benchmark comparing the available JSON encoders on response shaped data.
+
+Builds result sets shaped like the decoded output of a wide context (one table, many
+fields) and a nested context (a chain of related tables) using the value types the
+database drivers return, then times each encoder usable in this environment.
+
+Example:
+	python bench/bench_encoders.py --rows 5000 --repeat 5
+"""
+
+import argparse
+import datetime
+import decimal
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.JSONEncoder import available_encoders, get_encoder
+
+def value_for (i, j):
+	"""Gets a sample value of a type a database driver may return.
+	"""
+	kind = j % 6
+	if kind == 0:
+		return i * 31 + j
+	elif kind == 1:
+		return 'value-' + str(i) + '-' + str(j)
+	elif kind == 2:
+		return decimal.Decimal(i) / decimal.Decimal(7)
+	elif kind == 3:
+		return datetime.datetime(2020, 1, 1) + datetime.timedelta(seconds=i * 97 + j)
+	elif kind == 4:
+		return float(i) / 3.0
+	else:
+		return bytes('blob-' + str(i), 'utf-8')
+
+def wide_rows (rows, width):
+	"""Builds rows of a single table context with `width` fields.
+	"""
+	result = []
+	for i in range(rows):
+		d = {}
+		for j in range(width):
+			d['field_' + str(j)] = value_for(i, j)
+		result.append(d)
+	return result
+
+def nested_rows (rows, depth, width):
+	"""Builds rows of a context with `depth` levels of relations of `width` fields each.
+	"""
+	result = []
+	for i in range(rows):
+		d = {}
+		node = d
+		prefix = ''
+		for level in range(depth):
+			for j in range(width):
+				node[prefix + 'field_' + str(j)] = value_for(i, level * width + j)
+			if level < depth - 1:
+				prefix += 'rel_'
+				node[prefix + 'id'] = {}
+				node = node[prefix + 'id']
+		result.append(d)
+	return result
+
+def bench (encoder, data, repeat):
+	"""Times encoding `data`, returning the best time and the encoded size.
+	"""
+	best = None
+	size = 0
+	for r in range(repeat):
+		start = time.perf_counter()
+		out = encoder.encode(data)
+		took = time.perf_counter() - start
+		size = len(out)
+		if best == None or took < best:
+			best = took
+	return best, size
+
+def main ():
+	parser = argparse.ArgumentParser(description='Compare JSON encoders on wide and nested contexts.')
+	parser.add_argument('--rows', type=int, default=5000)
+	parser.add_argument('--repeat', type=int, default=5)
+	args = parser.parse_args()
+
+	cases = [
+				('wide (60 fields)', wide_rows(args.rows, 60)),
+				('nested (5 levels x 8 fields)', nested_rows(args.rows, 5, 8))
+			]
+	print('%-30s %-10s %12s %12s %12s' % ('case', 'encoder', 'best ms', 'MB/s', 'bytes'))
+	for case_name, data in cases:
+		for name in available_encoders():
+			took, size = bench(get_encoder(name), data, args.repeat)
+			print('%-30s %-10s %12.2f %12.1f %12d' % (case_name, name, took * 1000.0, size / took / 1e6, size))
+
+if __name__ == '__main__':
+	main()
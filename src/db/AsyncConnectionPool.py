@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""Module implementing a bounded connection pool for asyncio database providers.
+
+Mirrors `db.ConnectionPool.ConnectionPool` for providers whose connections are
+opened, pinged and closed with coroutines, so that async queries can be served
+without handing work off to threads.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from shared.SharedServices import force_type
+from db.ConnectionPool import PooledConnection
+
+
+class AsyncConnectionPool:
+	"""Class implementing a bounded connection pool for use on an event loop.
+
+	Attributes:
+		opener (function): Coroutine function returning a new raw connection. Should raise on failure.
+		pinger (function): Coroutine function taking a raw connection, returning True if it is alive.
+		closer (function): Coroutine function taking a raw connection and closing it.
+		min_size (int): The amount of connections to keep open even when idle.
+		max_size (int): The most connections that may be open at once.
+		idle_timeout (float): Seconds an idle connection above `min_size` is kept before eviction.
+		max_lifetime (float): Seconds a connection is used before it is recycled.
+		checkout_timeout (float): Seconds to wait for a free connection before giving up.
+
+	Raises:
+		TypeError: If any of the attributes are of unexpected types.
+		ValueError: If the sizes are not sensible.
+	"""
+	def __init__ (self, opener, pinger, closer, min_size=1, max_size=10, idle_timeout=300.0, max_lifetime=3600.0, checkout_timeout=30.0):
+		caller = 'AsyncConnectionPool.__init__'
+		force_type(min_size, 'int', caller=caller)
+		force_type(max_size, 'int', caller=caller)
+		if min_size < 0 or max_size < 1 or min_size > max_size:
+			raise ValueError('[' + caller + '] Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1')
+
+		self.opener = opener
+		self.pinger = pinger
+		self.closer = closer
+		self.min_size = min_size
+		self.max_size = max_size
+		self.idle_timeout = float(idle_timeout)
+		self.max_lifetime = float(max_lifetime)
+		self.checkout_timeout = float(checkout_timeout)
+
+		self.__idle = deque()
+		self.__size = 0
+		self.__cond = None
+
+	@property
+	def size (self):
+		"""int: The amount of connections currently open, idle or checked out."""
+		return self.__size
+
+	@property
+	def idle (self):
+		"""int: The amount of connections currently waiting in the pool."""
+		return len(self.__idle)
+
+	def __condition (self):
+		# Created lazily so the pool can be built before an event loop is running.
+		if self.__cond is None:
+			self.__cond = asyncio.Condition()
+		return self.__cond
+
+	async def warm (self):
+		"""Opens connections until the pool holds at least `min_size` of them.
+		"""
+		cond = self.__condition()
+		while self.__size < self.min_size:
+			self.__size += 1
+			try:
+				conn = PooledConnection(await self.opener())
+			except Exception:
+				self.__size -= 1
+				raise
+			async with cond:
+				self.__idle.append(conn)
+				cond.notify()
+
+	async def acquire (self, timeout=None):
+		"""Checks a live connection out of the pool.
+
+		Args:
+			timeout (float, optional): Seconds to wait, defaults to `checkout_timeout`.
+
+		Returns:
+			PooledConnection: The checked out connection.
+
+		Raises:
+			RuntimeError: If no connection became available within the timeout.
+		"""
+		if timeout is None:
+			timeout = self.checkout_timeout
+		deadline = time.monotonic() + timeout
+		cond = self.__condition()
+
+		while True:
+			conn = None
+			async with cond:
+				await self.__evict_idle()
+				while len(self.__idle) == 0 and self.__size >= self.max_size:
+					remaining = deadline - time.monotonic()
+					if remaining <= 0:
+						raise RuntimeError('[AsyncConnectionPool.acquire] Timed out waiting for a free connection')
+					try:
+						await asyncio.wait_for(cond.wait(), remaining)
+					except asyncio.TimeoutError:
+						pass
+				if len(self.__idle) > 0:
+					conn = self.__idle.pop()
+				else:
+					self.__size += 1
+
+			if conn is None:
+				try:
+					return PooledConnection(await self.opener())
+				except Exception:
+					await self.__discard(None)
+					raise
+
+			if time.monotonic() - conn.created > self.max_lifetime or not await self.__ping(conn):
+				await self.__discard(conn)
+				continue
+			return conn
+
+	async def release (self, conn, discard=False):
+		"""Returns a checked out connection to the pool.
+
+		Args:
+			conn (PooledConnection): The connection to return.
+			discard (bool, optional): Close the connection instead of reusing it, i.e. after an error.
+		"""
+		if discard or time.monotonic() - conn.created > self.max_lifetime:
+			await self.__discard(conn)
+			return
+		conn.last_used = time.monotonic()
+		cond = self.__condition()
+		async with cond:
+			self.__idle.append(conn)
+			cond.notify()
+
+	@asynccontextmanager
+	async def connection (self, timeout=None):
+		"""Async context manager checking a connection out and returning it when done.
+
+		The connection is discarded rather than reused if the block raises.
+
+		Yields:
+			PooledConnection: The checked out connection.
+		"""
+		conn = await self.acquire(timeout)
+		try:
+			yield conn
+		except BaseException:
+			await self.release(conn, discard=True)
+			raise
+		await self.release(conn)
+
+	async def close (self):
+		"""Closes all idle connections in the pool.
+		"""
+		idle = list(self.__idle)
+		self.__idle.clear()
+		for conn in idle:
+			await self.__discard(conn)
+
+	async def __ping (self, conn):
+		try:
+			return bool(await self.pinger(conn.raw))
+		except Exception:
+			return False
+
+	async def __discard (self, conn):
+		if conn is not None:
+			try:
+				await self.closer(conn.raw)
+			except Exception:
+				pass
+		self.__size -= 1
+		cond = self.__condition()
+		async with cond:
+			cond.notify()
+
+	async def __evict_idle (self):
+		"""Drops idle connections above `min_size` that have sat unused too long.
+
+		Expects the pool condition to be held.
+		"""
+		now = time.monotonic()
+		while len(self.__idle) > 0 and self.__size > self.min_size:
+			oldest = self.__idle[0]
+			if now - oldest.last_used <= self.idle_timeout:
+				break
+			self.__idle.popleft()
+			self.__size -= 1
+			try:
+				await self.closer(oldest.raw)
+			except Exception:
+				pass
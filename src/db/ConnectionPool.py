@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""Module implementing a bounded, thread-safe database connection pool.
+
+Keeps a set of open provider connections around for reuse so that queries don't
+pay a full connect and authentication handshake each time. Connections are
+recycled after a maximum lifetime, evicted after sitting idle and pinged before
+being handed out.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from shared.SharedServices import force_type
+
+
+class PooledConnection:
+	"""Class wrapping a raw provider connection with its pool bookkeeping.
+
+	Attributes:
+		raw: The underlying provider connection object.
+		created (float): Monotonic time the connection was opened.
+		last_used (float): Monotonic time the connection was last returned to the pool.
+		statements (db.StatementCache.StatementCache): The prepared statements of the 
+			connection, if the provider caches them. None otherwise.
+	"""
+	def __init__ (self, raw):
+		self.raw = raw
+		self.created = time.monotonic()
+		self.last_used = self.created
+		self.statements = None
+
+
+class ConnectionPool:
+	"""Class implementing a bounded, thread-safe connection pool.
+
+	Attributes:
+		opener (function): Callable returning a new raw connection. Should raise on failure.
+		pinger (function): Callable taking a raw connection, returning True if it is alive.
+		closer (function): Callable taking a raw connection and closing it.
+		min_size (int): The amount of connections to keep open even when idle.
+		max_size (int): The most connections that may be open at once.
+		idle_timeout (float): Seconds an idle connection above `min_size` is kept before eviction.
+		max_lifetime (float): Seconds a connection is used before it is recycled.
+		checkout_timeout (float): Seconds to wait for a free connection before giving up.
+
+	Raises:
+		TypeError: If any of the attributes are of unexpected types.
+		ValueError: If the sizes are not sensible.
+	"""
+	def __init__ (self, opener, pinger, closer, min_size=1, max_size=10, idle_timeout=300.0, max_lifetime=3600.0, checkout_timeout=30.0):
+		caller = 'ConnectionPool.__init__'
+		force_type(min_size, 'int', caller=caller)
+		force_type(max_size, 'int', caller=caller)
+		if min_size < 0 or max_size < 1 or min_size > max_size:
+			raise ValueError('[' + caller + '] Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1')
+
+		self.opener = opener
+		self.pinger = pinger
+		self.closer = closer
+		self.min_size = min_size
+		self.max_size = max_size
+		self.idle_timeout = float(idle_timeout)
+		self.max_lifetime = float(max_lifetime)
+		self.checkout_timeout = float(checkout_timeout)
+
+		self.__idle = deque()
+		self.__size = 0
+		self.__cond = threading.Condition()
+
+	@property
+	def size (self):
+		"""int: The amount of connections currently open, idle or checked out."""
+		return self.__size
+
+	@property
+	def idle (self):
+		"""int: The amount of connections currently waiting in the pool."""
+		return len(self.__idle)
+
+	def warm (self):
+		"""Opens connections until the pool holds at least `min_size` of them.
+		"""
+		while True:
+			with self.__cond:
+				if self.__size >= self.min_size:
+					return
+				self.__size += 1
+			try:
+				conn = PooledConnection(self.opener())
+			except Exception:
+				with self.__cond:
+					self.__size -= 1
+					self.__cond.notify()
+				raise
+			with self.__cond:
+				self.__idle.append(conn)
+				self.__cond.notify()
+
+	def acquire (self, timeout=None):
+		"""Checks a live connection out of the pool.
+
+		Reuses the most recently returned idle connection if it is still within its
+		lifetime and answers a ping, otherwise opens a new one while under `max_size`.
+		Blocks until a connection is released when the pool is exhausted.
+
+		Args:
+			timeout (float, optional): Seconds to wait, defaults to `checkout_timeout`.
+
+		Returns:
+			PooledConnection: The checked out connection.
+
+		Raises:
+			RuntimeError: If no connection became available within the timeout.
+		"""
+		if timeout is None:
+			timeout = self.checkout_timeout
+		deadline = time.monotonic() + timeout
+
+		while True:
+			conn = None
+			with self.__cond:
+				self.__evict_idle()
+				while len(self.__idle) == 0 and self.__size >= self.max_size:
+					remaining = deadline - time.monotonic()
+					if remaining <= 0:
+						raise RuntimeError('[ConnectionPool.acquire] Timed out waiting for a free connection')
+					self.__cond.wait(remaining)
+				if len(self.__idle) > 0:
+					conn = self.__idle.pop()
+				else:
+					self.__size += 1
+
+			if conn is None:
+				try:
+					return PooledConnection(self.opener())
+				except Exception:
+					self.__discard(None)
+					raise
+
+			if time.monotonic() - conn.created > self.max_lifetime or not self.__ping(conn):
+				self.__discard(conn)
+				continue
+			return conn
+
+	def release (self, conn, discard=False):
+		"""Returns a checked out connection to the pool.
+
+		Args:
+			conn (PooledConnection): The connection to return.
+			discard (bool, optional): Close the connection instead of reusing it, i.e. after an error.
+		"""
+		if discard or time.monotonic() - conn.created > self.max_lifetime:
+			self.__discard(conn)
+			return
+		conn.last_used = time.monotonic()
+		with self.__cond:
+			self.__idle.append(conn)
+			self.__cond.notify()
+
+	@contextmanager
+	def connection (self, timeout=None):
+		"""Context manager checking a connection out and returning it when done.
+
+		The connection is discarded rather than reused if the block raises.
+
+		Yields:
+			PooledConnection: The checked out connection.
+		"""
+		conn = self.acquire(timeout)
+		try:
+			yield conn
+		except BaseException:
+			self.release(conn, discard=True)
+			raise
+		self.release(conn)
+
+	def close (self):
+		"""Closes all idle connections in the pool.
+		"""
+		with self.__cond:
+			idle = list(self.__idle)
+			self.__idle.clear()
+		for conn in idle:
+			self.__discard(conn)
+
+	def __ping (self, conn):
+		try:
+			return bool(self.pinger(conn.raw))
+		except Exception:
+			return False
+
+	def __discard (self, conn):
+		if conn is not None:
+			try:
+				self.closer(conn.raw)
+			except Exception:
+				pass
+		with self.__cond:
+			self.__size -= 1
+			self.__cond.notify()
+
+	def __evict_idle (self):
+		"""Drops idle connections above `min_size` that have sat unused too long.
+
+		Expects the pool lock to be held. The oldest idle connections sit at the
+		left of the deque since checkouts take from the right.
+		"""
+		now = time.monotonic()
+		while len(self.__idle) > 0 and self.__size > self.min_size:
+			oldest = self.__idle[0]
+			if now - oldest.last_used <= self.idle_timeout:
+				break
+			self.__idle.popleft()
+			self.__size -= 1
+			try:
+				self.closer(oldest.raw)
+			except Exception:
+				pass
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""Module containing the error raised when a statement breaks an integrity constraint.
+"""
+
+
+class ConstraintError(RuntimeError):
+	"""Error raised by the providers when a statement is rejected by an integrity constraint,
+	i.e. a foreign key still referring to a deleted row or a duplicate primary key, rather
+	than failing for a fault of the query or of the database.
+	"""
+	pass
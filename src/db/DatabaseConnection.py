@@ -3,10 +3,22 @@
 
 Condenses common database functions like connecting, closing and querying for 
 all different providers into one common interface. 
+
+Attributes:
+	POOL_DEFAULTS (dict of str: any): Connection pool settings used when not given in the options.
 """
 
 from shared.SharedServices import force_type
+from db.ConnectionPool import ConnectionPool
 from db.providers.MySQL import MySQL
+from db.providers.SQLite import SQLite
+
+POOL_DEFAULTS = {
+					'pool_min': 1,
+					'pool_max': 10,
+					'pool_idle': 300.0,
+					'pool_lifetime': 3600.0
+				}
 
 class DatabaseConnection:
 	"""Provides connection and querying functions for any database.
@@ -17,6 +29,10 @@ class DatabaseConnection:
 	Attributes:
 		dbc (db.DatabaseConnectionOption.DatabaseConnectionOption): The connection
 			options specifying what and how to connect to the database.
+		pool (db.ConnectionPool.ConnectionPool): The pool of provider connections shared 
+			by all queries made through this connection.
+		async_provider (optional): The provider for the asyncio query path, if the `async`
+			option was set. None otherwise.
 	"""
 	def __init__ (self, dbc):
 		caller = 'DatabaseConnection.__init__'
@@ -26,9 +42,53 @@ class DatabaseConnection:
 		
 		if self.dbc.provider == 'mysql':
 			self.provider = MySQL(self.dbc)
+		elif self.dbc.provider == 'sqlite':
+			self.provider = SQLite(self.dbc)
 			
 		self.__force_valid()
 		
+		self.pool = ConnectionPool(self.provider.open_connection, self.provider.ping, self.provider.close_connection,
+									min_size=self.__option('pool_min'),
+									max_size=self.__option('pool_max'),
+									idle_timeout=self.__option('pool_idle'),
+									max_lifetime=self.__option('pool_lifetime'))
+		self.provider.pool = self.pool
+		self.pool.warm()
+		
+		self.async_provider = None
+		if self.dbc.options.get('async'):
+			pool_options = 	{
+								'min_size': self.__option('pool_min'),
+								'max_size': self.__option('pool_max'),
+								'idle_timeout': self.__option('pool_idle'),
+								'max_lifetime': self.__option('pool_lifetime')
+							}
+			if self.dbc.provider == 'mysql':
+				from db.providers.AsyncMySQL import AsyncMySQL
+				self.async_provider = AsyncMySQL(self.dbc, **pool_options)
+			elif self.dbc.provider == 'sqlite':
+				from db.providers.AsyncSQLite import AsyncSQLite
+				self.async_provider = AsyncSQLite(self.dbc, **pool_options)
+				
+	@property
+	def is_async (self):
+		"""bool: Whether queries can be awaited through the asyncio query path."""
+		return self.async_provider is not None
+		
+	@property
+	def lock_rows (self):
+		"""str: The clause appended to a SELECT locking the rows it reads until the end of 
+		its transaction. Empty for sqlite, whose transactions lock the whole database."""
+		if self.dbc.provider == 'mysql':
+			return ' FOR UPDATE'
+		return ''
+		
+	def __option (self, name):
+		value = self.dbc.options.get(name)
+		if value == None:
+			return POOL_DEFAULTS[name]
+		return value
+		
 	def __force_valid (self):
 		"""Ensures that the connection is valid.
 		
@@ -43,13 +103,85 @@ class DatabaseConnection:
 			msg = '[' + caller + '] Unable to establish connection with specified DatabaseConnectionOption'
 			raise ValueError(msg)
 			
-	def query (self, sql):
+	def query (self, sql, params=None):
 		"""Queries the provider and returns sql rows as a list.
 		
+		Args:
+			sql (str): The sql query to execute.
+			params (tuple, optional): Values to bind to the %s placeholders in the query.
+		
+		Returns:
+			list of tuple: The rows resulting from the query.
+		"""
+		return self.provider.query(sql, params)
+		
+	def fetch_stream (self, sql, params=None, size=500):
+		"""Queries the provider, streaming the rows back in chunks.
+		
+		Rows are read from the database as the chunks are consumed, so at most one 
+		chunk is held in memory. A pooled connection is held until the chunks are 
+		exhausted or the generator is closed.
+		
+		Args:
+			sql (str): The sql query to execute.
+			params (tuple, optional): Values to bind to the %s placeholders in the query.
+			size (int, optional): The most rows to yield at once.
+		
+		Returns:
+			generator of list of tuple: The chunks of rows resulting from the query.
+		"""
+		return self.provider.fetch_stream(sql, params, size)
+		
+	async def query_async (self, sql, params=None):
+		"""Queries the async provider and returns sql rows as a list.
+		
+		Args:
+			sql (str): The sql query to execute.
+			params (tuple, optional): Values to bind to the %s placeholders in the query.
+		
 		Returns:
 			list of tuple: The rows resulting from the query.
 		"""
-		return self.provider.query(sql)
+		return await self.async_provider.query(sql, params)
+		
+	def fetch_stream_async (self, sql, params=None, size=500):
+		"""Queries the async provider, streaming the rows back in chunks.
+		
+		Args:
+			sql (str): The sql query to execute.
+			params (tuple, optional): Values to bind to the %s placeholders in the query.
+			size (int, optional): The most rows to yield at once.
+		
+		Returns:
+			async generator of list of tuple: The chunks of rows resulting from the query.
+		"""
+		return self.async_provider.fetch_stream(sql, params, size)
+		
+	def transaction (self):
+		"""Opens a transaction on one pooled connection of the provider.
+		
+		Example:
+			>>> with dbc.transaction() as tx:
+			...     tx.query(sql)
+		
+		Returns:
+			context manager: Yields a transaction with a `query` method, committing on 
+				exit and rolling back on error.
+		"""
+		return self.provider.transaction()
+		
+	def transaction_async (self):
+		"""Opens a transaction on one connection of the async provider.
+		
+		Example:
+			>>> async with dbc.transaction_async() as tx:
+			...     await tx.query(sql)
+		
+		Returns:
+			async context manager: Yields a transaction with an async `query` method, 
+				committing on exit and rolling back on error.
+		"""
+		return self.async_provider.transaction()
 		
 		
 	def connect (self):
@@ -60,6 +192,17 @@ class DatabaseConnection:
 		"""
 		return self.provider.connect()
 		
+	def close (self):
+		"""Closes all idle pooled connections to the database.
+		"""
+		self.pool.close()
+		
+	async def close_async (self):
+		"""Closes all idle connections of the async provider, if there is one.
+		"""
+		if self.async_provider is not None:
+			await self.async_provider.pool.close()
+		
 	def get_schema (self):
 		"""Gets the schema of the database in the connection.
 		
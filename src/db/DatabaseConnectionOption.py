@@ -12,24 +12,43 @@ Attributes:
 from shared.SharedServices import force_type
 from db.ProtectionOption import ProtectionOption
 
-ALL_PROVIDERS = ['mysql']
+ALL_PROVIDERS = ['mysql', 'sqlite']
 REQUIRED_FOR = 	{
-					'mysql': [ 'host', 'username', 'password' ]
+					'mysql': [ 'host', 'username', 'password' ],
+					'sqlite': [ 'path' ]
 				}
 OPTIONAL_FOR = 	{
-					'mysql': [ 'port', 'protection' ]
+					'mysql': [ 'port', 'protection', 'pool_min', 'pool_max', 'pool_idle', 'pool_lifetime', 'async', 'statement_cache' ],
+					'sqlite': [ 'protection', 'pool_min', 'pool_max', 'pool_idle', 'pool_lifetime', 'async' ]
 				}
 DESC_REQUIRED = {
 					'mysql': 	[
 									'The hostname for the mysql server',
 									'The username to login to the mysql server with',
 									'The password to login to the mysql server with'
+								],
+					'sqlite':	[
+									'The file path or file: uri of the sqlite database'
 								]
 				}
 DESC_OPTIONAL = {
 					'mysql':	[
 									'The port for the mysql server - defaults to 3306',
-									'Any ProtectionOption to apply to databases, tables or fields'
+									'Any ProtectionOption to apply to databases, tables or fields',
+									'The amount of pooled connections kept open while idle - defaults to 1',
+									'The most pooled connections open at once - defaults to 10',
+									'Seconds an idle pooled connection is kept before eviction - defaults to 300',
+									'Seconds a pooled connection is used before being recycled - defaults to 3600',
+									'Whether to also open an asyncio connection pool - requires aiomysql, defaults to False',
+									'The most prepared statements cached per pooled connection - defaults to 64'
+								],
+					'sqlite':	[
+									'Any ProtectionOption to apply to databases, tables or fields',
+									'The amount of pooled connections kept open while idle - defaults to 1',
+									'The most pooled connections open at once - defaults to 10',
+									'Seconds an idle pooled connection is kept before eviction - defaults to 300',
+									'Seconds a pooled connection is used before being recycled - defaults to 3600',
+									'Whether to also open an asyncio connection pool - defaults to False'
 								]
 				}
 				
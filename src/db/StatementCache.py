@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Module implementing a per-connection cache of prepared statements.
+
+Generated sql binds its values separately from the statement text, so requests that
+differ only in their values share one statement shape. Keeping the prepared handle of
+each shape around lets the server skip reparsing and replanning it on reuse.
+"""
+
+from collections import OrderedDict
+from shared.SharedServices import force_type
+
+
+class StatementCache:
+	"""Class caching prepared statement handles by statement text for one connection.
+
+	The least recently used statement is closed and dropped once `max_size` is exceeded,
+	keeping the connection under the server limit on prepared statements.
+
+	Attributes:
+		preparer (function): Callable returning a new prepared statement handle for a connection.
+		max_size (int): The most prepared statements to keep open.
+		hits (int): The amount of lookups that reused a prepared statement.
+		misses (int): The amount of lookups that had to prepare a statement.
+
+	Raises:
+		TypeError: If any of the attributes are of unexpected types.
+	"""
+	def __init__ (self, preparer, max_size=64):
+		caller = 'StatementCache.__init__'
+		force_type(max_size, 'int', caller=caller)
+
+		self.preparer = preparer
+		self.max_size = max_size
+		self.hits = 0
+		self.misses = 0
+		self.__statements = OrderedDict()
+
+	def __len__ (self):
+		return len(self.__statements)
+
+	def get (self, sql):
+		"""Gets the prepared statement handle for a statement text, preparing it if needed.
+
+		Args:
+			sql (str): The statement text with placeholders.
+
+		Returns:
+			any: The prepared statement handle, i.e. a prepared cursor.
+		"""
+		stmt = self.__statements.get(sql)
+		if stmt is not None:
+			self.__statements.move_to_end(sql)
+			self.hits += 1
+			return stmt
+
+		self.misses += 1
+		stmt = self.preparer()
+		self.__statements[sql] = stmt
+		if len(self.__statements) > self.max_size:
+			old_sql, old = self.__statements.popitem(last=False)
+			self.__close(old)
+		return stmt
+
+	def discard (self, sql):
+		"""Drops the prepared statement for a statement text, i.e. after it errored.
+		"""
+		stmt = self.__statements.pop(sql, None)
+		if stmt is not None:
+			self.__close(stmt)
+
+	def clear (self):
+		"""Closes and drops all cached prepared statements.
+		"""
+		while len(self.__statements) > 0:
+			sql, stmt = self.__statements.popitem()
+			self.__close(stmt)
+
+	def __close (self, stmt):
+		try:
+			stmt.close()
+		except Exception:
+			pass
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Module implementing the async provider interface over mysql.
+
+Allows a mysql database to be queried from an event loop without handing work off to
+threads. Requires the optional `aiomysql` package.
+"""
+
+from contextlib import asynccontextmanager
+from db.AsyncConnectionPool import AsyncConnectionPool
+from db.ConstraintError import ConstraintError
+from shared.SharedServices import force_type
+
+try:
+	import aiomysql
+except ImportError:
+	aiomysql = None
+
+
+class AsyncMySQLTransaction:
+	"""Class for querying within a transaction on a single mysql connection.
+
+	Attributes:
+		provider (AsyncMySQL): The provider the transaction was opened by.
+		conn (aiomysql.Connection): The connection the transaction runs on.
+	"""
+	def __init__ (self, provider, conn):
+		self.provider = provider
+		self.conn = conn
+
+	async def query (self, query, params=None):
+		"""Executes a query inside the transaction.
+
+		Returns:
+			list of tuple: The results of the query in a list of rows.
+		"""
+		return await self.provider.execute(self.conn, query, params, commit=False)
+
+
+class AsyncMySQL:
+	"""Class implementing the async provider interface over mysql.
+
+	Attributes:
+		options (db.DatabaseConnectionOption.DatabaseConnectionOption): The connection options
+			used to connect to the mysql database with.
+		pool (db.AsyncConnectionPool.AsyncConnectionPool): The pool of open connections.
+
+	Raises:
+		TypeError: If the options attribute is not a valid DatabaseConnectionOption.
+		ImportError: If the aiomysql package is not installed.
+	"""
+	def __init__ (self, options, **pool_options):
+		caller = 'AsyncMySQL.__init__'
+		force_type(options, 'db.DatabaseConnectionOption.DatabaseConnectionOption', caller=caller)
+		if aiomysql is None:
+			raise ImportError('[' + caller + '] The aiomysql package is required for async mysql connections')
+
+		self.options = options
+		self.pool = AsyncConnectionPool(self.__open, self.__ping, self.__close, **pool_options)
+
+	async def __open (self):
+		if self.options.options['port'] != None:
+			port = self.options.options['port']
+		else:
+			port = 3306
+		return await aiomysql.connect(host=self.options.options['host'],
+										port=port,
+										user=self.options.options['username'],
+										password=self.options.options['password'])
+
+	async def __ping (self, conn):
+		try:
+			await conn.ping(reconnect=False)
+		except aiomysql.Error:
+			return False
+		return True
+
+	async def __close (self, conn):
+		await conn.ensure_closed()
+
+	async def execute (self, conn, query, params, commit=True):
+		"""Executes a query on a raw connection and collects the rows.
+
+		Raises:
+			ConstraintError: Raised if the query was rejected by an integrity constraint.
+			RuntimeError: Raised if the query could not be successfully executed.
+		"""
+		try:
+			async with conn.cursor() as cursor:
+				await cursor.execute(query, params)
+				result = list(await cursor.fetchall()) if cursor.description is not None else []
+			if commit:
+				await conn.commit()
+		except aiomysql.IntegrityError as e:
+			raise ConstraintError('[AsyncMySQL] Constraint failed with provider \'' + self.options.provider + '\' with query "' + query + '": ' + str(e))
+		except aiomysql.Error as e:
+			raise RuntimeError('[AsyncMySQL] Could not query with provider \'' + self.options.provider + '\' with query "' + query + '": ' + str(e))
+
+		return result
+
+	async def query (self, query, params=None):
+		"""Executes a query on the mysql database.
+
+		Args:
+			query (str): The sql query string to attempt to execute.
+			params (tuple, optional): Values to bind to the %s placeholders in the query.
+
+		Returns:
+			list of tuple: The results of the query in a list of rows.
+
+		Raises:
+			RuntimeError: Raised if the query could not be successfully executed.
+		"""
+		caller = 'AsyncMySQL.query'
+		force_type(query, 'str', caller=caller)
+
+		async with self.pool.connection() as conn:
+			return await self.execute(conn.raw, query, params)
+
+	async def fetch_stream (self, query, params=None, size=500):
+		"""Executes a query on an unbuffered cursor and yields its rows a chunk at a time.
+
+		Args:
+			query (str): The sql query string to attempt to execute.
+			params (tuple, optional): Values to bind to the %s placeholders in the query.
+			size (int, optional): The most rows to yield at once.
+
+		Yields:
+			list of tuple: The next chunk of rows.
+
+		Raises:
+			RuntimeError: Raised if the query could not be successfully executed.
+		"""
+		# Closing an unbuffered cursor reads off its remaining rows, so a stream closed 
+		# early discards its connection instead, as the blocking provider does
+		conn = await self.pool.acquire()
+		done = False
+		try:
+			cursor = await conn.raw.cursor(aiomysql.SSCursor)
+			await cursor.execute(query, params)
+			while True:
+				rows = await cursor.fetchmany(size)
+				if len(rows) == 0:
+					break
+				yield list(rows)
+			await cursor.close()
+			done = True
+		except aiomysql.Error as e:
+			raise RuntimeError('[AsyncMySQL] Could not query with provider \'' + self.options.provider + '\' with query "' + query + '": ' + str(e))
+		finally:
+			await self.pool.release(conn, discard=not done)
+
+	@asynccontextmanager
+	async def transaction (self):
+		"""Async context manager running queries in one transaction on one connection.
+
+		Commits when the block exits and rolls back if it raises.
+
+		Yields:
+			AsyncMySQLTransaction: The transaction to query through.
+		"""
+		async with self.pool.connection() as conn:
+			await conn.raw.begin()
+			try:
+				yield AsyncMySQLTransaction(self, conn.raw)
+			except BaseException:
+				await conn.raw.rollback()
+				raise
+			await conn.raw.commit()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Module implementing the async provider interface over sqlite.
+
+An in-process stand-in for an asyncio database driver. Statements are executed on the
+calling event loop, which is cheap for local sqlite databases and lets the async query
+path be developed and tested without a database server.
+"""
+
+from contextlib import asynccontextmanager
+from sqlite3 import Error, IntegrityError
+from db.ConstraintError import ConstraintError
+from db.AsyncConnectionPool import AsyncConnectionPool
+from db.providers.SQLite import open_sqlite, to_qmark
+from shared.SharedServices import force_type
+
+
+class AsyncSQLiteTransaction:
+	"""Class for querying within a transaction on a single sqlite connection.
+
+	Attributes:
+		provider (AsyncSQLite): The provider the transaction was opened by.
+		conn (sqlite3.Connection): The connection the transaction runs on.
+	"""
+	def __init__ (self, provider, conn):
+		self.provider = provider
+		self.conn = conn
+
+	async def query (self, query, params=None):
+		"""Executes a query inside the transaction.
+
+		Returns:
+			list of tuple: The results of the query in a list of rows.
+		"""
+		return self.provider.execute(self.conn, query, params, commit=False)
+
+
+class AsyncSQLite:
+	"""Class implementing the async provider interface over sqlite.
+
+	Attributes:
+		options (db.DatabaseConnectionOption.DatabaseConnectionOption): The connection options
+			used to connect to the sqlite database with.
+		pool (db.AsyncConnectionPool.AsyncConnectionPool): The pool of open connections.
+
+	Raises:
+		TypeError: If the options attribute is not a valid DatabaseConnectionOption.
+	"""
+	def __init__ (self, options, **pool_options):
+		caller = 'AsyncSQLite.__init__'
+		force_type(options, 'db.DatabaseConnectionOption.DatabaseConnectionOption', caller=caller)
+
+		self.options = options
+		self.pool = AsyncConnectionPool(self.__open, self.__ping, self.__close, **pool_options)
+
+	async def __open (self):
+		return open_sqlite(self.options.options['path'])
+
+	async def __ping (self, conn):
+		try:
+			conn.execute('SELECT 1')
+		except Error:
+			return False
+		return True
+
+	async def __close (self, conn):
+		conn.close()
+
+	def execute (self, conn, query, params, commit=True):
+		"""Executes a query on a raw connection and collects the rows.
+
+		Raises:
+			ConstraintError: Raised if the query was rejected by an integrity constraint.
+			RuntimeError: Raised if the query could not be successfully executed.
+		"""
+		try:
+			cursor = conn.execute(to_qmark(query), params or ())
+			result = cursor.fetchall() if cursor.description is not None else []
+			cursor.close()
+			if commit:
+				conn.commit()
+		except IntegrityError as e:
+			raise ConstraintError('[AsyncSQLite] Constraint failed with provider \'' + self.options.provider + '\' with query "' + query + '": ' + str(e))
+		except Error as e:
+			raise RuntimeError('[AsyncSQLite] Could not query with provider \'' + self.options.provider + '\' with query "' + query + '": ' + str(e))
+
+		return result
+
+	async def query (self, query, params=None):
+		"""Executes a query on the sqlite database.
+
+		Args:
+			query (str): The sql query string to attempt to execute.
+			params (tuple, optional): Values to bind to the %s placeholders in the query.
+
+		Returns:
+			list of tuple: The results of the query in a list of rows.
+
+		Raises:
+			RuntimeError: Raised if the query could not be successfully executed.
+		"""
+		caller = 'AsyncSQLite.query'
+		force_type(query, 'str', caller=caller)
+
+		async with self.pool.connection() as conn:
+			return self.execute(conn.raw, query, params)
+
+	async def fetch_stream (self, query, params=None, size=500):
+		"""Executes a query and yields its rows a chunk at a time.
+
+		Args:
+			query (str): The sql query string to attempt to execute.
+			params (tuple, optional): Values to bind to the %s placeholders in the query.
+			size (int, optional): The most rows to yield at once.
+
+		Yields:
+			list of tuple: The next chunk of rows.
+
+		Raises:
+			RuntimeError: Raised if the query could not be successfully executed.
+		"""
+		conn = await self.pool.acquire()
+		cursor = None
+		failed = False
+		try:
+			cursor = conn.raw.execute(to_qmark(query), params or ())
+			while True:
+				rows = cursor.fetchmany(size)
+				if len(rows) == 0:
+					break
+				yield rows
+		except Error as e:
+			failed = True
+			raise RuntimeError('[AsyncSQLite] Could not query with provider \'' + self.options.provider + '\' with query "' + query + '": ' + str(e))
+		finally:
+			# A stream closed early leaves nothing pending once its cursor is closed, so 
+			# the connection is reused
+			if cursor is not None:
+				cursor.close()
+			await self.pool.release(conn, discard=failed)
+
+	@asynccontextmanager
+	async def transaction (self):
+		"""Async context manager running queries in one transaction on one connection.
+
+		Commits when the block exits and rolls back if it raises.
+
+		Yields:
+			AsyncSQLiteTransaction: The transaction to query through.
+		"""
+		async with self.pool.connection() as conn:
+			conn.raw.execute('BEGIN IMMEDIATE')
+			try:
+				yield AsyncSQLiteTransaction(self, conn.raw)
+			except BaseException:
+				conn.raw.rollback()
+				raise
+			conn.raw.commit()
@@ -6,17 +6,63 @@ generate a model of the schema of a valid mysql database.
 
 Attributes:
 	SCHEMA_EXCEPTIONS (list of str): A list of system tables to exclude when generating schema model.
+	STATEMENT_CACHE_SIZE (int): Default amount of prepared statements kept per pooled connection.
 """
 
 import mysql.connector
-from mysql.connector import Error
+from contextlib import contextmanager
+from mysql.connector import Error, IntegrityError
+from db.ConstraintError import ConstraintError
 from db.Database import Database
 from db.DatabaseTable import DatabaseTable
 from db.DatabaseField import DatabaseField
 from db.ProtectionOption import ProtectionOption
+from db.StatementCache import StatementCache
 from shared.SharedServices import force_type
 
 SCHEMA_EXCEPTIONS = ['information_schema', 'mysql', 'performance_schema', 'sys']
+STATEMENT_CACHE_SIZE = 64
+
+def column_field (field_row, table, database, protection):
+	"""Builds the model of a column from its row of `SHOW columns`.
+	
+	Args:
+		field_row (tuple): The Field, Type, Null, Key and Default of the column, Type as bytes.
+		table (db.DatabaseTable.DatabaseTable): The table of the column.
+		database (db.Database.Database): The database of the table.
+		protection (db.ProtectionOption.ProtectionOption): The protection of the column.
+		
+	Returns:
+		DatabaseField: The field.
+	"""
+	field_name = field_row[0]
+	field_type = str(field_row[1].decode('utf-8'))
+	field_nullable = (field_row[2] == 'YES')
+	field_key = field_row[3]
+	field_default = (False if field_row[4] == 'None' else True)
+	return DatabaseField(field_name, table, database, field_type, field_nullable, field_key, field_default, protection=protection)
+
+class MySQLTransaction:
+	"""Class for querying within a transaction on a single mysql connection.
+	
+	Attributes:
+		provider (MySQL): The provider the transaction was opened by.
+		conn (mysql.connector.connection.MySQLConnection): The connection the transaction runs on.
+		statements (db.StatementCache.StatementCache): The prepared statements of the connection.
+	"""
+	def __init__ (self, provider, conn, statements):
+		self.provider = provider
+		self.conn = conn
+		self.statements = statements
+		
+	def query (self, query, params=None):
+		"""Executes a query inside the transaction.
+		
+		Returns:
+			list of tuple: The results of the query in a list of rows.
+		"""
+		return self.provider.execute(self.conn, query, params, self.statements, commit=False)
+
 
 class MySQL:
 	"""Class implementing mysql connection functionality.
@@ -33,6 +79,45 @@ class MySQL:
 		force_type(options, 'db.DatabaseConnectionOption.DatabaseConnectionOption', caller=caller)
 		
 		self.options = options
+		self.pool = None
+		
+	def open_connection (self):
+		"""Opens a new raw connection to the mysql database for use in a pool.
+		
+		Returns:
+			mysql.connector.connection.MySQLConnection: The open connection.
+			
+		Raises:
+			mysql.connector.Error: If the connection could not be established.
+		"""
+		if self.options.options['port'] != None:
+			port = self.options.options['port']
+		else:
+			port = 3306
+		return mysql.connector.connect(host=self.options.options['host'], 
+										port=port, 
+										username=self.options.options['username'], 
+										password=self.options.options['password'])
+										
+	def ping (self, conn):
+		"""Cheaply checks that a raw connection is still alive.
+		
+		Args:
+			conn (mysql.connector.connection.MySQLConnection): The connection to check.
+			
+		Returns:
+			bool: True if the server answered, False if not.
+		"""
+		try:
+			conn.ping(reconnect=False)
+		except Error:
+			return False
+		return True
+		
+	def close_connection (self, conn):
+		"""Closes a raw connection opened with `open_connection`.
+		"""
+		conn.close()
 		
 	def connect (self):
 		"""Attempts to connect to the mysql database using the provider options.
@@ -42,14 +127,7 @@ class MySQL:
 		"""
 		self.conn = None
 		try:
-			if self.options.options['port'] != None:
-				port = self.options.options['port']
-			else:
-				port = 3306
-			self.conn = mysql.connector.connect(host=self.options.options['host'], 
-												port=port, 
-												username=self.options.options['username'], 
-												password=self.options.options['password'])
+			self.conn = self.open_connection()
 		except Error as e:
 			print(e)
 			return False
@@ -76,14 +154,17 @@ class MySQL:
 		
 		return valid
 		
-	def query (self, query):
+	def query (self, query, params=None):
 		"""Executes a query on the mysql database.
 		
 		Attempts to execute a query on the specified database. If successful, it will collect and return 
-		the result of that query as rows. 
+		the result of that query as rows. Uses a connection from the pool when one is attached, 
+		otherwise connects and closes around the query. Queries with params are run as server side 
+		prepared statements, cached per pooled connection by their statement text.
 		
 		Args:
 			query (str): The sql query string to attempt to execute.
+			params (tuple, optional): Values to bind to the %s placeholders in the query.
 		
 		Returns:
 			list of tuple: The results of the query in a list of rows. 
@@ -91,25 +172,125 @@ class MySQL:
 		Raises:
 			RuntimeError: Raised if the query could not be successfully executed.
 		"""
-		caller = 'MySQL.__init__'
+		caller = 'MySQL.query'
 		force_type(query, 'str', caller=caller)
 		
-		result = []
+		if self.pool is not None:
+			conn = self.pool.acquire()
+			try:
+				result = self.execute(conn.raw, query, params, self.__statements(conn))
+			except ConstraintError:
+				self.pool.release(conn)
+				raise
+			except RuntimeError:
+				self.pool.release(conn, discard=True)
+				raise
+			self.pool.release(conn)
+			return result
+		
 		try:
 			if self.connect():
-				cursor = self.conn.cursor()
-				cursor.execute(query)
-				rows = cursor.fetchall()
-				for row in rows:
-					result.append(row)
-				self.conn.commit()
+				return self.execute(self.conn, query, params, None)
 			else:
 				return None
+		finally:
+			if self.conn is not None:
+				self.close()
+				
+	def fetch_stream (self, query, params=None, size=500):
+		"""Executes a query on an unbuffered cursor and yields its rows a chunk at a time.
+		
+		The connection is held until the rows are exhausted. If the generator is closed 
+		early the connection still has unread rows, so it is discarded rather than reused.
+		
+		Args:
+			query (str): The sql query string to attempt to execute.
+			params (tuple, optional): Values to bind to the %s placeholders in the query.
+			size (int, optional): The most rows to yield at once.
+		
+		Yields:
+			list of tuple: The next chunk of rows.
+		
+		Raises:
+			RuntimeError: Raised if the query could not be successfully executed.
+		"""
+		caller = 'MySQL.fetch_stream'
+		force_type(query, 'str', caller=caller)
+		
+		conn = self.pool.acquire()
+		done = False
+		try:
+			cursor = conn.raw.cursor(buffered=False)
+			cursor.execute(query, params)
+			while True:
+				rows = cursor.fetchmany(size)
+				if len(rows) == 0:
+					break
+				yield rows
+			cursor.close()
+			conn.raw.commit()
+			done = True
 		except Error as e:
-			print(e)
-			raise RuntimeError('[MySQL] Could not query with provider \'' + self.options.provider + '\' with query "' + query + '"')
+			raise RuntimeError('[MySQL] Could not query with provider \'' + self.options.provider + '\' with query "' + query + '": ' + str(e))
 		finally:
-			self.close()
+			self.pool.release(conn, discard=not done)
+				
+	def __statements (self, conn):
+		"""Gets the prepared statement cache of a pooled connection, creating it on first use.
+		"""
+		if conn.statements is None:
+			size = self.options.options.get('statement_cache')
+			if size == None:
+				size = STATEMENT_CACHE_SIZE
+			raw = conn.raw
+			conn.statements = StatementCache(lambda: raw.cursor(prepared=True), max_size=size)
+		return conn.statements
+				
+	@contextmanager
+	def transaction (self):
+		"""Context manager running queries in one transaction on one pooled connection.
+		
+		Commits when the block exits and rolls back if it raises.
+		
+		Yields:
+			MySQLTransaction: The transaction to query through.
+		"""
+		with self.pool.connection() as conn:
+			conn.raw.start_transaction()
+			try:
+				yield MySQLTransaction(self, conn.raw, self.__statements(conn))
+			except BaseException:
+				conn.raw.rollback()
+				raise
+			conn.raw.commit()
+				
+	def execute (self, conn, query, params, statements, commit=True):
+		"""Executes a query on a raw connection and collects the rows.
+		
+		Raises:
+			ConstraintError: Raised if the query was rejected by an integrity constraint.
+			RuntimeError: Raised if the query could not be successfully executed.
+		"""
+		result = []
+		try:
+			if params is not None and statements is not None:
+				cursor = statements.get(query)
+				cursor.execute(query, params)
+			else:
+				cursor = conn.cursor()
+				cursor.execute(query, params)
+			if cursor.with_rows:
+				rows = cursor.fetchall()
+				for row in rows:
+					result.append(row)
+			if commit:
+				conn.commit()
+			if params is None or statements is None:
+				cursor.close()
+		except IntegrityError as e:
+			raise ConstraintError('[MySQL] Constraint failed with provider \'' + self.options.provider + '\' with query "' + query + '": ' + str(e))
+		except Error as e:
+			raise RuntimeError('[MySQL] Could not query with provider \'' + self.options.provider + '\' with query "' + query + '": ' + str(e))
 				
 		return result
 		
@@ -156,20 +337,13 @@ class MySQL:
 				field_available_query = 'SHOW columns FROM ' + t.fq_name + ';'
 				field_rows = self.query(field_available_query)
 				for field_row in field_rows:
-					field_name = field_row[0]
-					field_type = str(field_row[1].decode('utf-8'))
-					field_nullable = (True if field_row[2] == 'NO' else False)
-					field_key = field_row[3]
-					field_default = (False if field_row[4] == 'None' else True)
-					
-					fq_name = d.name + '.' + t.name + '.' + field_name
+					fq_name = d.name + '.' + t.name + '.' + field_row[0]
 					p = ProtectionOption(fq_name)
 					for protection in self.options.options['protection']:
 						if protection.name == fq_name:
 							p = protection
 					if not p.exclude:
-						f = DatabaseField(field_name, t, d, field_type, field_nullable, field_key, field_default, protection=p)
-						t.children.append(f)
+						t.children.append(column_field(field_row, t, d, p))
 						
 		references_query = '''SELECT 
 								`TABLE_SCHEMA`, `TABLE_NAME`, `COLUMN_NAME`,
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""Module implementing sqlite connection functionality.
+
+Allows for connection to and querying of a sqlite database. Also provides functionality to
+generate a model of the schema of a valid sqlite database. Mainly intended as an in-process
+stand-in for a database server when developing and testing an API.
+
+Attributes:
+	SQLITE_DB_NAME (str): The name sqlite gives the main database of a connection.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from sqlite3 import Error, IntegrityError
+from db.ConstraintError import ConstraintError
+from db.Database import Database
+from db.DatabaseTable import DatabaseTable
+from db.DatabaseField import DatabaseField
+from db.ProtectionOption import ProtectionOption
+from shared.SharedServices import force_type
+
+SQLITE_DB_NAME = 'main'
+
+def open_sqlite (path):
+	"""Opens a raw sqlite connection with the settings used by the providers.
+
+	Args:
+		path (str): The file path, or a `file:` uri, of the sqlite database.
+
+	Returns:
+		sqlite3.Connection: The open connection.
+	"""
+	conn = sqlite3.connect(path, uri=path.startswith('file:'), check_same_thread=False)
+	conn.execute('PRAGMA foreign_keys = ON')
+	return conn
+
+def to_qmark (query):
+	"""Converts the %s placeholders of generated sql to the ? placeholders of sqlite.
+
+	Args:
+		query (str): The sql query with %s placeholders.
+
+	Returns:
+		str: The query with ? placeholders.
+	"""
+	return query.replace('%s', '?')
+
+class SQLiteTransaction:
+	"""Class for querying within a transaction on a single sqlite connection.
+
+	Attributes:
+		provider (SQLite): The provider the transaction was opened by.
+		conn (sqlite3.Connection): The connection the transaction runs on.
+	"""
+	def __init__ (self, provider, conn):
+		self.provider = provider
+		self.conn = conn
+
+	def query (self, query, params=None):
+		"""Executes a query inside the transaction.
+
+		Returns:
+			list of tuple: The results of the query in a list of rows.
+		"""
+		return self.provider.execute(self.conn, query, params, commit=False)
+
+
+class SQLite:
+	"""Class implementing sqlite connection functionality.
+
+	Attributes:
+		options (db.DatabaseConnectionOption.DatabaseConnectionOption): The connection options
+			used to connect to the sqlite database with.
+
+	Raises:
+		TypeError: If the options attribute is not a valid DatabaseConnectionOption.
+	"""
+	def __init__ (self, options):
+		caller = 'SQLite.__init__'
+		force_type(options, 'db.DatabaseConnectionOption.DatabaseConnectionOption', caller=caller)
+
+		self.options = options
+		self.pool = None
+
+	def open_connection (self):
+		"""Opens a new raw connection to the sqlite database for use in a pool.
+
+		Returns:
+			sqlite3.Connection: The open connection.
+		"""
+		return open_sqlite(self.options.options['path'])
+
+	def ping (self, conn):
+		"""Checks that a raw connection is still usable.
+
+		Returns:
+			bool: True if the connection answered, False if not.
+		"""
+		try:
+			conn.execute('SELECT 1')
+		except Error:
+			return False
+		return True
+
+	def close_connection (self, conn):
+		"""Closes a raw connection opened with `open_connection`.
+		"""
+		conn.close()
+
+	def connect (self):
+		"""Attempts to connect to the sqlite database using the provider options.
+
+		Returns:
+			bool: True if the connection was established successfully, False if not.
+		"""
+		self.conn = None
+		try:
+			self.conn = self.open_connection()
+		except Error:
+			return False
+		return True
+
+	def close (self):
+		"""Closes the connection to the sqlite database if it is already active.
+		"""
+		self.conn.close()
+		self.conn = None
+
+	def is_valid (self):
+		"""Checks to see if the connection is valid.
+
+		Returns:
+			(bool): True if the connection can be established, False if not.
+		"""
+		valid = self.connect()
+		if self.conn is not None:
+			self.close()
+
+		return valid
+
+	def query (self, query, params=None):
+		"""Executes a query on the sqlite database.
+
+		Args:
+			query (str): The sql query string to attempt to execute.
+			params (tuple, optional): Values to bind to the %s placeholders in the query.
+
+		Returns:
+			list of tuple: The results of the query in a list of rows.
+
+		Raises:
+			RuntimeError: Raised if the query could not be successfully executed.
+		"""
+		caller = 'SQLite.query'
+		force_type(query, 'str', caller=caller)
+
+		if self.pool is not None:
+			conn = self.pool.acquire()
+			try:
+				result = self.execute(conn.raw, query, params)
+			except RuntimeError:
+				self.pool.release(conn, discard=True)
+				raise
+			self.pool.release(conn)
+			return result
+
+		try:
+			if self.connect():
+				return self.execute(self.conn, query, params)
+			else:
+				return None
+		finally:
+			if self.conn is not None:
+				self.close()
+
+	def fetch_stream (self, query, params=None, size=500):
+		"""Executes a query and yields its rows a chunk at a time.
+
+		Args:
+			query (str): The sql query string to attempt to execute.
+			params (tuple, optional): Values to bind to the %s placeholders in the query.
+			size (int, optional): The most rows to yield at once.
+
+		Yields:
+			list of tuple: The next chunk of rows.
+
+		Raises:
+			RuntimeError: Raised if the query could not be successfully executed.
+		"""
+		caller = 'SQLite.fetch_stream'
+		force_type(query, 'str', caller=caller)
+
+		conn = self.pool.acquire()
+		cursor = None
+		failed = False
+		try:
+			cursor = conn.raw.execute(to_qmark(query), params or ())
+			while True:
+				rows = cursor.fetchmany(size)
+				if len(rows) == 0:
+					break
+				yield rows
+		except Error as e:
+			failed = True
+			raise RuntimeError('[SQLite] Could not query with provider \'' + self.options.provider + '\' with query "' + query + '": ' + str(e))
+		finally:
+			if cursor is not None:
+				cursor.close()
+			self.pool.release(conn, discard=failed)
+
+	@contextmanager
+	def transaction (self):
+		"""Context manager running queries in one transaction on one pooled connection.
+
+		Commits when the block exits and rolls back if it raises.
+
+		Yields:
+			SQLiteTransaction: The transaction to query through.
+		"""
+		with self.pool.connection() as conn:
+			conn.raw.execute('BEGIN IMMEDIATE')
+			try:
+				yield SQLiteTransaction(self, conn.raw)
+			except BaseException:
+				conn.raw.rollback()
+				raise
+			conn.raw.commit()
+
+	def execute (self, conn, query, params, commit=True):
+		"""Executes a query on a raw connection and collects the rows.
+
+		Raises:
+			ConstraintError: Raised if the query was rejected by an integrity constraint.
+			RuntimeError: Raised if the query could not be successfully executed.
+		"""
+		try:
+			cursor = conn.execute(to_qmark(query), params or ())
+			result = cursor.fetchall() if cursor.description is not None else []
+			if commit:
+				conn.commit()
+			cursor.close()
+		except IntegrityError as e:
+			conn.rollback()
+			raise ConstraintError('[SQLite] Constraint failed with provider \'' + self.options.provider + '\' with query "' + query + '": ' + str(e))
+		except Error as e:
+			conn.rollback()
+			raise RuntimeError('[SQLite] Could not query with provider \'' + self.options.provider + '\' with query "' + query + '": ' + str(e))
+
+		return result
+
+	def get_schema (self):
+		"""Gets the schema of the database in the connection.
+
+		Returns:
+			list of Database: The schema of the underlying database.
+		"""
+		if not self.is_valid():
+			raise RuntimeError('[SQLite] Unable to generate schema, database not valid')
+
+		p = ProtectionOption(SQLITE_DB_NAME)
+		for protection in self.options.options['protection']:
+			if protection.name == SQLITE_DB_NAME:
+				p = protection
+		if p.exclude:
+			return []
+		d = Database(SQLITE_DB_NAME, [], protection=p)
+
+		table_rows = self.query("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name;")
+		for table_row in table_rows:
+			table_name = table_row[0]
+			p = ProtectionOption(d.name + '.' + table_name)
+			for protection in self.options.options['protection']:
+				if protection.name == d.name + '.' + table_name:
+					p = protection
+			if not p.exclude:
+				t = DatabaseTable(table_name, d, [], protection=p)
+				d.children.append(t)
+
+		for t in d.children:
+			field_rows = self.query('PRAGMA table_info("' + t.name + '");')
+			for field_row in field_rows:
+				field_name = field_row[1]
+				field_type = field_row[2].lower()
+				field_nullable = (field_row[3] == 0)
+				field_key = ('PRI' if field_row[5] > 0 else '')
+				field_default = (field_row[4] != None)
+
+				fq_name = d.name + '.' + t.name + '.' + field_name
+				p = ProtectionOption(fq_name)
+				for protection in self.options.options['protection']:
+					if protection.name == fq_name:
+						p = protection
+				if not p.exclude:
+					f = DatabaseField(field_name, t, d, field_type, field_nullable, field_key, field_default, protection=p)
+					t.children.append(f)
+
+		for t in d.children:
+			ref_rows = self.query('PRAGMA foreign_key_list("' + t.name + '");')
+			for ref_row in ref_rows:
+				infield = None
+				outfield = None
+				for f in t.children:
+					if f.name == ref_row[3]:
+						infield = f
+				for other in d.children:
+					if other.name == ref_row[2]:
+						for f in other.children:
+							if f.name == ref_row[4] or (ref_row[4] == None and 'PRI' in f.key):
+								outfield = f
+
+				if infield != None and outfield != None:
+					infield.relation = outfield
+					infield.key += ',FOR'
+
+		return [d]
@@ -0,0 +1,157 @@
+"""Module containing falcon middleware compressing response bodies.
+
+Attributes:
+	WBITS (dict of [str, int]): The zlib window bits producing each content encoding.
+"""
+
+import zlib
+from shared.SharedServices import force_type
+
+WBITS = 	{
+				'gzip': 16 + zlib.MAX_WBITS,
+				'deflate': zlib.MAX_WBITS
+			}
+
+def parse_accept_encoding (header):
+	"""Parses an Accept-Encoding header into the quality of each coding.
+
+	Args:
+		header (str): The value of the header.
+
+	Returns:
+		dict of [str, float]: The quality of each coding named in the header, by lowercase name.
+	"""
+	qualities = {}
+	for part in header.split(','):
+		pieces = part.strip().split(';')
+		coding = pieces[0].strip().lower()
+		if coding == '':
+			continue
+		q = 1.0
+		for p in pieces[1:]:
+			p = p.strip()
+			if p.startswith('q='):
+				try:
+					q = float(p[2:])
+				except ValueError:
+					q = 0.0
+		qualities[coding] = q
+	return qualities
+
+
+class CompressionMiddleware:
+	"""Class compressing falcon response bodies with the codings a client accepts.
+
+	Bodies smaller than `min_size` are sent as they are, compressing them costs more than
+	it saves. Streamed bodies are read until `min_size` bytes have come in to make the same
+	decision, then compressed incrementally, flushing after each part so clients still
+	receive the stream as it is produced.
+
+	Attributes:
+		min_size (int): The smallest body in bytes that gets compressed.
+		level (int): The zlib compression level, 1 being fastest and 9 smallest.
+		encodings (list of str): The supported codings, in order of preference on equal quality.
+
+	Raises:
+		TypeError: If any of the attributes are of unexpected types.
+		ValueError: If an encoding isn't supported.
+	"""
+	def __init__ (self, min_size=1024, level=6, encodings=['gzip', 'deflate']):
+		caller = 'CompressionMiddleware.__init__'
+		force_type(min_size, 'int', caller=caller)
+		force_type(level, 'int', caller=caller)
+		force_type(encodings, 'list', caller=caller)
+		for e in encodings:
+			if e not in WBITS:
+				raise ValueError('[' + caller + "] Encoding '" + str(e) + "' not valid")
+
+		self.min_size = min_size
+		self.level = level
+		self.encodings = list(encodings)
+
+	def negotiate (self, header):
+		"""Picks the coding to compress a response with.
+
+		Args:
+			header (str): The Accept-Encoding header of the request, None if it has none.
+
+		Returns:
+			str: The name of the coding, None if the body should be sent uncompressed.
+		"""
+		if header == None:
+			return None
+		qualities = parse_accept_encoding(header)
+		best = None
+		best_q = 0.0
+		for e in self.encodings:
+			q = qualities.get(e, qualities.get('*', 0.0))
+			if q > best_q:
+				best = e
+				best_q = q
+		return best
+
+	async def process_response (self, req, resp, resource, req_succeeded):
+		"""Falcon hook compressing the body of a response once its resource has responded.
+
+		Args:
+			req (falcon.asgi.request.Request): The falcon request.
+			resp (falcon.asgi.response.Response): The falcon response.
+			resource (object): The resource that responded, None if no route matched.
+			req_succeeded (bool): Whether the request was processed without an exception.
+		"""
+		if resp.get_header('Content-Encoding') != None:
+			return
+		# Set on every response, a 304 has to name the headers its full response varies on
+		resp.append_header('Vary', 'Accept-Encoding')
+		if req.method == 'HEAD' or resp.status_code in (204, 304) or resp.status_code < 200:
+			return
+		encoding = self.negotiate(req.get_header('Accept-Encoding'))
+		if encoding == None:
+			return
+
+		if resp.stream is not None:
+			if not hasattr(resp.stream, '__aiter__'):
+				return
+			stream = resp.stream.__aiter__()
+			head = []
+			size = 0
+			ended = False
+			while size < self.min_size:
+				try:
+					part = await stream.__anext__()
+				except StopAsyncIteration:
+					ended = True
+					break
+				head.append(part)
+				size += len(part)
+			if ended:
+				resp.stream = None
+				resp.data = b''.join(head)
+				return
+			resp.stream = self.__compress_stream(head, stream, encoding)
+			self.__encoded(resp, encoding)
+			return
+
+		body = await resp.render_body()
+		if body == None or len(body) < self.min_size:
+			return
+		compressor = zlib.compressobj(self.level, zlib.DEFLATED, WBITS[encoding])
+		resp.text = None
+		resp.data = compressor.compress(body) + compressor.flush()
+		self.__encoded(resp, encoding)
+
+	def __encoded (self, resp, encoding):
+		"""Marks a response as compressed. Entity tags get the coding appended as the 
+		compressed body is a different representation.
+		"""
+		resp.set_header('Content-Encoding', encoding)
+		tag = resp.get_header('ETag')
+		if tag != None and tag.endswith('"'):
+			resp.set_header('ETag', tag[:-1] + '-' + encoding + '"')
+
+	async def __compress_stream (self, head, stream, encoding):
+		compressor = zlib.compressobj(self.level, zlib.DEFLATED, WBITS[encoding])
+		yield compressor.compress(b''.join(head)) + compressor.flush(zlib.Z_SYNC_FLUSH)
+		async for part in stream:
+			yield compressor.compress(part) + compressor.flush(zlib.Z_SYNC_FLUSH)
+		yield compressor.flush()
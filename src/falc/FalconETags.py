@@ -0,0 +1,98 @@
+"""Module containing logic for entity tags and conditional GET requests.
+
+Attributes:
+	MODES (list of str): The ways entity tags can be made, see `FalconAPI`.
+	EPOCH (str): Random per process value mixed into version based tags, so tags made 
+		before a restart, when the table versions start over, never match.
+"""
+
+import hashlib
+import os
+
+MODES = ['body', 'versions']
+EPOCH = os.urandom(8).hex()
+
+def body_etag (body):
+	"""Makes a strong entity tag from a hash of a response body.
+
+	Args:
+		body (bytes): The serialized body.
+
+	Returns:
+		str: The quoted entity tag.
+	"""
+	return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def version_etag (parts):
+	"""Makes a strong entity tag from the table versions a response was read at.
+
+	Args:
+		parts (tuple): Everything identifying the response, i.e. the context name, the 
+			request parameters and the versions of the tables the context reads.
+
+	Returns:
+		str: The quoted entity tag.
+	"""
+	return '"v' + hashlib.blake2b(repr((EPOCH,) + parts).encode('utf-8'), digest_size=16).hexdigest() + '"'
+
+def matches (req, tag):
+	"""Checks whether a request's If-None-Match header matches an entity tag.
+
+	Tags the compression middleware suffixed with their content coding match the tag 
+	they were made from.
+
+	Args:
+		req (falcon.asgi.request.Request): The falcon request.
+		tag (str): The quoted entity tag of the current response.
+
+	Returns:
+		bool: True if the client's copy is current.
+	"""
+	header = req.get_header('If-None-Match')
+	if header == None:
+		return False
+	for t in header.split(','):
+		t = t.strip()
+		if t == '*':
+			return True
+		if t.startswith('W/'):
+			t = t[2:]
+		for suffix in ['-gzip"', '-deflate"']:
+			if t.endswith(suffix):
+				t = t[:-len(suffix)] + '"'
+		if t == tag:
+			return True
+	return False
+
+def not_modified (resp, tag):
+	"""Turns a response into a 304 Not Modified without a body.
+
+	Args:
+		resp (falcon.asgi.response.Response): The falcon response.
+		tag (str): The quoted entity tag of the current response.
+	"""
+	resp.status = '304 Not Modified'
+	resp.set_header('ETag', tag)
+	resp.data = None
+	resp.text = None
+	resp.stream = None
+
+def tag_response (req, resp, tag=None):
+	"""Sets the entity tag of a successful response, answering 304 if the client's copy is current.
+
+	Args:
+		req (falcon.asgi.request.Request): The falcon request.
+		resp (falcon.asgi.response.Response): The falcon response, with its body set.
+		tag (str, optional): The entity tag. Defaults to a hash of the body, which then 
+			has to be set as `data`.
+	"""
+	if resp.status_code != 200:
+		return
+	if tag == None:
+		if resp.data == None:
+			return
+		tag = body_etag(resp.data)
+	if matches(req, tag):
+		not_modified(resp, tag)
+	else:
+		resp.set_header('ETag', tag)
@@ -5,7 +5,11 @@ import falcon
 import falcon.asgi
 import json
 import threading
-from shared.SharedServices import force_type
+from shared.SharedServices import force_type, is_type
+from api.RowStream import RowStream
+from api.BusyError import BusyError
+from falc.FalconETags import MODES, version_etag, matches, not_modified, tag_response
+from falc.FalconStream import MEDIA_TYPES, negotiate_format, prepend, first_chunk, json_array, ndjson_lines, csv_lines, columnar
 
 
 def qstr_to_args (query_str):
@@ -43,13 +47,91 @@ def num_to_status (retno):
 		return falcon.HTTP_201
 	elif retno == 204:
 		return falcon.HTTP_204
+	elif retno == 207:
+		return falcon.HTTP_207
 	elif retno == 400:
 		return falcon.HTTP_400
 	elif retno == 404:
 		return falcon.HTTP_404
+	elif retno == 409:
+		return falcon.HTTP_409
+	elif retno == 503:
+		return falcon.HTTP_503
+	elif retno == 504:
+		return falcon.HTTP_504
 	else:
 		return falcon.HTTP_500
 		
+def write_response (resp, data, retno, encoder):
+	"""Writes an APIController result to a falcon response as JSON.
+	
+	Error messages are wrapped as `{"error": message}`. Empty results and 204 
+	responses are sent without a body.
+	
+	Args:
+		resp (falcon.asgi.response.Response): The falcon response.
+		data (any): The data or error message from the APIController.
+		retno (int): The return number from the APIController.
+		encoder: The JSON encoder to serialize the data with.
+	"""
+	resp.status = num_to_status(retno)
+	if retno == 204 or (is_type(data, 'str') and data == ''):
+		return
+	if retno >= 400 and is_type(data, 'str'):
+		data = { 'error': data }
+	resp.content_type = falcon.MEDIA_JSON
+	resp.data = encoder.encode(data)
+	
+async def call_controller (apic, executor, method, *args):
+	"""Calls an APIController method without blocking the event loop.
+	
+	Awaits the async version of the method when the database connection has an 
+	async provider, otherwise runs the blocking method on the executor.
+	
+	Args:
+		apic (api.APIController): The controller to call.
+		executor (api.APIExecutor.APIExecutor): The executor to run blocking calls on.
+		method (str): The name of the controller method, i.e. 'context_query_single'.
+		*args: The arguments to call the method with.
+		
+	Returns:
+		(any, int): The data and return number from the controller.
+	"""
+	if apic.dbc.is_async:
+		return await getattr(apic, method + '_async')(*args)
+	return await executor.run(getattr(apic, method), *args)
+		
+def iterate_stream (apic, executor, chunks):
+	"""Iterates chunks streamed from the controller without blocking the event loop.
+	
+	Args:
+		apic (api.APIController): The controller the chunks came from.
+		executor (api.APIExecutor.APIExecutor): The executor to pull blocking chunks on.
+		chunks (iterable or async iterable): The chunks, i.e. a `RowStream` or its raw rows.
+		
+	Returns:
+		async iterator: The chunks.
+	"""
+	if apic.dbc.is_async:
+		return chunks.__aiter__()
+	return executor.iterate(chunks)
+		
+def version_tag (apic, model, request):
+	"""Makes the version based entity tag of a GET request.
+	
+	Args:
+		apic (api.APIController): The controller serving the request.
+		model (str): The name of the model being queried.
+		request (any): Whatever identifies the request within the model, i.e. its id or args.
+		
+	Returns:
+		str: The quoted entity tag, None if the model doesn't exist.
+	"""
+	versions = apic.context_versions(model)
+	if versions == None:
+		return None
+	return version_etag((versions[0], request, versions[1]))
+		
 def max_body(limit):
 	async def hook(req, resp, resource, params):
 		length = req.content_length
@@ -64,22 +146,42 @@ def max_body(limit):
 			)
 
 	return hook		
+	
+async def limit_body (req, resp, resource, params):
+	"""Falcon hook rejecting bodies larger than the `post_limit` of the resource.
+	"""
+	await max_body(resource.post_limit)(req, resp, resource, params)
 
 
 class RESTResource:
-	def __init__ (self, apic):
+	def __init__ (self, apic, executor, encoder, etags='body', batcher=None):
 		"""Class to handle REST requests for models by id.
 		
 		Attributes:
 			apic (api.APIController): The APIController to extend the database into falcon.
+			executor (api.APIExecutor.APIExecutor): The executor to run controller calls on.
+			encoder: The JSON encoder to serialize responses with, see `shared.JSONEncoder`.
+			etags (str, optional): How entity tags are made for GET responses, 'body' from a 
+				hash of the body or 'versions' from the versions of the tables read. If None, 
+				no entity tags are sent.
+			batcher (api.MicroBatcher.MicroBatcher, optional): Gathers the lookups by id of 
+				concurrent requests into one query per model. If None, each request is its own query.
 			
 		Raises:
 			TypeError: If a non APIController is passed as the apic. 
+			ValueError: If the etags mode isn't valid.
 		"""
 		caller = 'RESTResource.__init__'
 		force_type(apic, 'api.APIController.APIController', caller=caller)
+		force_type(executor, 'api.APIExecutor.APIExecutor', caller=caller)
 		
 		self.apic = apic
+		self.executor = executor
+		self.encoder = encoder
+		if etags != None and etags not in MODES:
+			raise ValueError('[' + caller + "] Entity tag mode '" + str(etags) + "' not valid")
+		self.etags = etags
+		self.batcher = batcher
 		
 	async def on_get(self, req, resp, model, id):
 		"""Method to handle REST get requests to get a single instance of a model.
@@ -91,62 +193,119 @@ class RESTResource:
 			id (str): The id of the model instance. 
 		"""
 		if req.query_string != '':
-			resp.status = falcon.HTTP_400
-			resp.text = 'Bad parameters'
+			write_response(resp, 'Bad parameters', 400, self.encoder)
 		else:
-			result = self.apic.context_query_single(model, id)
-			data = result[0]
-			retno = result[1]
-			
-			resp.status = num_to_status(retno)
-			resp.text = str(data)
+			tag = None
+			if self.etags == 'versions':
+				tag = version_tag(self.apic, model, id)
+				if tag != None and matches(req, tag):
+					not_modified(resp, tag)
+					return
+			if self.batcher != None:
+				result = await self.batcher.get(model, id)
+			else:
+				result = await call_controller(self.apic, self.executor, 'context_query_single', model, id)
+			write_response(resp, result[0], result[1], self.encoder)
+			if self.etags != None:
+				tag_response(req, resp, tag)
 			
 	async def on_delete (self, req, resp, model, id):
 		if req.query_string != '':
-			resp.status = falcon.HTTP_400
-			resp.text = 'Bad parameters'
+			write_response(resp, 'Bad parameters', 400, self.encoder)
 		else:
-			result = self.apic.context_del_single(model, id)
-			data = result[0]
-			retno = result[1]
-			
-			resp.status = num_to_status(retno)
-			resp.text = str(data)
+			result = await call_controller(self.apic, self.executor, 'context_del_single', model, id)
+			write_response(resp, result[0], result[1], self.encoder)
 				
 
 class GetManyResource:
-	def __init__ (self, apic):
+	def __init__ (self, apic, executor, encoder, etags='body', post_limit=64 * 1024):
 		"""Class to handle the route to retrieve many instances of a model.
 		
 		Attributes:
 			apic (api.APIController): The APIController to extend the database into falcon.
+			executor (api.APIExecutor.APIExecutor): The executor to run controller calls on.
+			encoder: The JSON encoder to serialize responses with, see `shared.JSONEncoder`.
+			etags (str, optional): How entity tags are made for GET responses, 'body' from a 
+				hash of the body or 'versions' from the versions of the tables read. If None, 
+				no entity tags are sent.
+			post_limit (int, optional): The largest body in bytes accepted by post requests.
 			
 		Raises:
 			TypeError: If a non APIController is passed as the apic. 
+			ValueError: If the etags mode isn't valid.
 		"""
 		caller = 'GetManyResource.__init__'
 		force_type(apic, 'api.APIController.APIController', caller=caller)
+		force_type(executor, 'api.APIExecutor.APIExecutor', caller=caller)
 		
 		self.apic = apic
+		self.executor = executor
+		self.encoder = encoder
+		if etags != None and etags not in MODES:
+			raise ValueError('[' + caller + "] Entity tag mode '" + str(etags) + "' not valid")
+		self.etags = etags
+		self.post_limit = post_limit
 	
-	@falcon.before(max_body(64 * 1024))
+	@falcon.before(limit_body)
 	async def on_post(self, req, resp, model):
-		body = await req.stream.read()
-		body = body.decode('utf-8')
-		body_dict = json.loads(body)
-		print(body_dict)
+		"""Method to handle post requests creating instances of a model.
 		
+		The body is either a single JSON object, or many of them as a JSON array or as 
+		newline delimited JSON, which are created together in one transaction.
+		
+		Attributes:
+			req (falcon.asgi.request.Request): The falcon request. 
+			resp (falcon.asgi.response.Response): The falcon response.
+			model (str): The name of the model being posted to.
+		"""
+		body = await req.stream.read(self.post_limit + 1)
+		if len(body) > self.post_limit:
+			# Bodies without a Content-Length are only measured once read
+			msg = 'The body must not exceed ' + str(self.post_limit) + ' bytes in length.'
+			raise falcon.HTTPPayloadTooLarge(title='Request body is too large', description=msg)
+		try:
+			body = body.decode('utf-8')
+			content_type = req.content_type
+			if content_type != None and content_type.split(';')[0].strip() == MEDIA_TYPES['ndjson']:
+				data = [json.loads(line) for line in body.splitlines() if line.strip() != '']
+			else:
+				data = json.loads(body)
+		except ValueError:
+			write_response(resp, 'Bad body, expected JSON or newline delimited JSON', 400, self.encoder)
+			return
 			
-		result = self.apic.context_post_single(model, body_dict)
-		data = result[0]
-		retno = result[1]
-			
-		resp.status = num_to_status(retno)
-		resp.text = str(data)
+		if is_type(data, 'list'):
+			result = await call_controller(self.apic, self.executor, 'context_post_many', model, data)
+		elif is_type(data, 'dict'):
+			result = await call_controller(self.apic, self.executor, 'context_post_single', model, data)
+		else:
+			result = 'Bad body, expected an object or an array of objects', 400
+		write_response(resp, result[0], result[1], self.encoder)
+		
+	async def on_delete (self, req, resp, model):
+		"""Method to handle delete requests removing every instance of a model matching filters.
+		
+		Attributes:
+			req (falcon.asgi.request.Request): The falcon request. 
+			resp (falcon.asgi.response.Response): The falcon response.
+			model (str): The name of the model being deleted from.
+		"""
+		if req.query_string != '':
+			args = qstr_to_args(req.query_string)
+		else:
+			args = {}
+		result = await call_controller(self.apic, self.executor, 'context_del_many', model, args)
+		write_response(resp, result[0], result[1], self.encoder)
 		
 	async def on_get(self, req, resp, model):
 		"""Method to handle get requests for multi-result requests.
 		
+		Results are sent as a JSON array, newline delimited JSON, CSV or columnar JSON, 
+		picked by the `format` parameter or else the Accept header. Errors are always sent 
+		as JSON. The continuation token of a keyset page is sent in the `X-Next-Cursor` 
+		header for the line oriented formats, as are the ids of a `{pk}_in` filter that 
+		weren't found in the `X-Missing-Ids` header.
+		
 		Attributes:
 			req (falcon.asgi.request.Request): The falcon request. 
 			resp (falcon.asgi.response.Response): The falcon response.
@@ -156,10 +315,143 @@ class GetManyResource:
 			args = qstr_to_args(req.query_string)
 		else:
 			args = {}
+			
+		# The format may be picked by the Accept header, caches must key on it
+		resp.append_header('Vary', 'Accept')
+		fmt = negotiate_format(req, args)
+		if fmt == None:
+			write_response(resp, "Bad parameter: 'format' must be one of " + ', '.join(MEDIA_TYPES), 400, self.encoder)
+			return
+			
+		tag = None
+		if self.etags == 'versions':
+			tag = version_tag(self.apic, model, (fmt, tuple(sorted(args.items()))))
+			if tag != None and matches(req, tag):
+				not_modified(resp, tag)
+				return
+		
+		result = await call_controller(self.apic, self.executor, 'context_stream_multiple', model, args)
+		stream = result[0]
+		if not isinstance(stream, RowStream):
+			write_response(resp, stream, result[1], self.encoder)
+			return
+			
+		if fmt == 'csv' or fmt == 'columnar':
+			if stream.objects:
+				write_response(resp, "Bad parameter: 'format' " + fmt + " can't be combined with 'expand'", 400, self.encoder)
+				return
+			stream = stream.raw()
+		if stream.missing != None and fmt == 'json':
+			# Results filtered by id are read up front as a single chunk
+			body = { 'results': [row for chunk in stream for row in chunk] }
+			if 'cursor' in args:
+				body['next'] = stream.next_cursor
+			body['missing'] = stream.missing
+			write_response(resp, body, result[1], self.encoder)
+			if self.etags != None:
+				tag_response(req, resp, tag)
+			return
+			
+		chunks = iterate_stream(self.apic, self.executor, stream)
+		try:
+			first = await first_chunk(chunks)
+		except BusyError:
+			write_response(resp, 'Server busy, try again later', 503, self.encoder)
+			return
+		if first == None:
+			await chunks.aclose()
+			if stream.missing == None:
+				write_response(resp, '', 404, self.encoder)
+				return
+			first = []
+			chunks = None
+		chunks = prepend(first, chunks)
 		
-		result = self.apic.context_query_multiple(model, args)
-		data = result[0]
-		retno = result[1]
+		if fmt == 'columnar':
+			body = await columnar(stream, chunks)
+			if 'cursor' in args:
+				body['next'] = stream.next_cursor
+			if stream.missing != None:
+				body['missing'] = stream.missing
+			write_response(resp, body, result[1], self.encoder)
+			resp.content_type = MEDIA_TYPES[fmt]
+			if self.etags != None:
+				tag_response(req, resp, tag)
+			return
+		if fmt == 'json' and 'cursor' in args:
+			# A keyset page is read up front as a single chunk
+			write_response(resp, { 'results': first, 'next': stream.next_cursor }, result[1], self.encoder)
+			if self.etags != None:
+				tag_response(req, resp, tag)
+			return
+			
+		resp.status = num_to_status(result[1])
+		resp.content_type = MEDIA_TYPES[fmt]
+		if stream.next_cursor != None:
+			resp.set_header('X-Next-Cursor', stream.next_cursor)
+		if stream.missing != None:
+			resp.set_header('X-Missing-Ids', ','.join(stream.missing))
+		if fmt == 'csv':
+			body = csv_lines([f.api_name.name for f in stream.fields], chunks)
+		elif fmt == 'ndjson':
+			body = ndjson_lines(chunks, self.encoder)
+		else:
+			body = json_array(chunks, self.encoder)
+			
+		if self.etags == 'body' and stream.buffered:
+			# Pages are already in memory, so their body can be hashed
+			resp.data = b''.join([part async for part in body])
+			tag_response(req, resp)
+		else:
+			resp.stream = body
+			if tag != None:
+				tag_response(req, resp, tag)
 		
-		resp.status = num_to_status(retno)
-		resp.text = str(data)
\ No newline at end of file
+
+class StatsResource:
+	def __init__ (self, executor, cache=None, flight=None, objects=None, batcher=None):
+		"""Class to report on the load of the api.
+		
+		Attributes:
+			executor (api.APIExecutor.APIExecutor): The executor running controller calls.
+			cache (api.ResultCache.ResultCache, optional): The query result cache of the 
+				controller, None if results aren't cached.
+			flight (api.SingleFlight.SingleFlight, optional): Coalesces the identical reads 
+				of the controller, None if reads aren't coalesced.
+			objects (api.ObjectCache.ObjectCache, optional): The single object cache of the 
+				controller, None if objects aren't cached.
+			batcher (api.MicroBatcher.MicroBatcher, optional): Gathers concurrent lookups by 
+				id, None if they aren't batched.
+			
+		Raises:
+			TypeError: If a non APIExecutor is passed as the executor. 
+		"""
+		caller = 'StatsResource.__init__'
+		force_type(executor, 'api.APIExecutor.APIExecutor', caller=caller)
+		
+		self.executor = executor
+		self.cache = cache
+		self.flight = flight
+		self.objects = objects
+		self.batcher = batcher
+		
+	async def on_get(self, req, resp):
+		"""Method to handle get requests for the api load statistics.
+		
+		Attributes:
+			req (falcon.asgi.request.Request): The falcon request. 
+			resp (falcon.asgi.response.Response): The falcon response.
+		"""
+		stats = {
+					'executor': self.executor.stats()
+				}
+		if self.cache != None:
+			stats['cache'] = self.cache.stats()
+		if self.flight != None:
+			stats['coalescing'] = self.flight.stats()
+		if self.objects != None:
+			stats['objects'] = self.objects.stats()
+		if self.batcher != None:
+			stats['batching'] = self.batcher.stats()
+		resp.status = falcon.HTTP_200
+		resp.text = json.dumps(stats)
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""Module containing writers streaming result chunks into falcon response bodies.
+
+Attributes:
+	MEDIA_TYPES (dict of [str, str]): The media type of each response format, by format name.
+"""
+
+import csv
+import io
+import falcon
+from shared.JSONEncoder import default_handler
+
+MEDIA_TYPES = 	{
+					'json': falcon.MEDIA_JSON,
+					'ndjson': 'application/x-ndjson',
+					'csv': 'text/csv',
+					'columnar': 'application/vnd.apinfly.columnar+json'
+				}
+
+def negotiate_format (req, args):
+	"""Picks the response format of a request.
+
+	A `format` parameter takes precedence over the Accept header and is removed from
+	the args. Clients accepting none of the formats are sent JSON.
+
+	Args:
+		req (falcon.asgi.request.Request): The falcon request.
+		args (dict): The parameters from the request.
+
+	Returns:
+		str: The name of the format, None if the `format` parameter isn't a valid format.
+	"""
+	if 'format' in args:
+		fmt = args.pop('format')
+		if fmt not in MEDIA_TYPES:
+			return None
+		return fmt
+
+	preferred = req.client_prefers(list(MEDIA_TYPES.values()))
+	for fmt in MEDIA_TYPES:
+		if MEDIA_TYPES[fmt] == preferred:
+			return fmt
+	return 'json'
+
+async def prepend (first, chunks=None):
+	"""Puts a chunk that was already pulled back in front of its stream.
+
+	Args:
+		first (list): The chunk to yield first.
+		chunks (async iterator of list, optional): The remaining chunks.
+
+	Yields:
+		list: The chunks.
+	"""
+	yield first
+	if chunks is not None:
+		async for chunk in chunks:
+			yield chunk
+
+async def first_chunk (chunks):
+	"""Pulls the first chunk of a stream.
+
+	Args:
+		chunks (async iterator): The stream of chunks.
+
+	Returns:
+		any: The first chunk, None if the stream is empty.
+	"""
+	async for chunk in chunks:
+		return chunk
+	return None
+
+async def json_array (chunks, encoder):
+	"""Writes chunks of decoded rows as a single JSON array, one chunk at a time.
+
+	Each chunk is encoded on its own and its brackets swapped for the separators of
+	the enclosing array, so memory use is bound by the chunk size.
+
+	Args:
+		chunks (async iterator of list of dict): The chunks of decoded rows.
+		encoder: The JSON encoder to serialize the rows with, see `shared.JSONEncoder`.
+
+	Yields:
+		bytes: The next part of the response body.
+	"""
+	sep = b'['
+	async for chunk in chunks:
+		if len(chunk) > 0:
+			yield sep + encoder.encode(chunk)[1:-1]
+			sep = b','
+	if sep == b'[':
+		yield b'[]'
+	else:
+		yield b']'
+
+async def ndjson_lines (chunks, encoder):
+	"""Writes chunks of decoded rows as newline delimited JSON, one row per line.
+
+	Args:
+		chunks (async iterator of list of dict): The chunks of decoded rows.
+		encoder: The JSON encoder to serialize the rows with, see `shared.JSONEncoder`.
+
+	Yields:
+		bytes: The lines of the next chunk.
+	"""
+	async for chunk in chunks:
+		yield b''.join([encoder.encode(row) + b'\n' for row in chunk])
+
+def csv_value (value):
+	"""Converts a row value to a CSV cell, NULL as an empty cell.
+	"""
+	if value == None:
+		return ''
+	if isinstance(value, (bytes, bytearray)):
+		return default_handler(value)
+	return value
+
+async def csv_lines (columns, chunks):
+	"""Writes chunks of rows as CSV, a header line followed by one line per row.
+
+	Args:
+		columns (list of str): The flattened names of the columns.
+		chunks (async iterator of list of tuple): The chunks of row values, in column order.
+
+	Yields:
+		bytes: The header line, then the lines of each chunk.
+	"""
+	buf = io.StringIO()
+	writer = csv.writer(buf, lineterminator='\r\n')
+	writer.writerow(columns)
+	yield buf.getvalue().encode('utf-8')
+
+	async for chunk in chunks:
+		buf.seek(0)
+		buf.truncate()
+		for row in chunk:
+			writer.writerow([csv_value(v) for v in row])
+		yield buf.getvalue().encode('utf-8')
+
+async def columnar (stream, chunks):
+	"""Gathers chunks of row tuples into one array per field.
+
+	The columns are filled straight from the row tuples, no per row dicts are built.
+	Relation branches are flattened, the nesting is described by the schema instead.
+
+	Args:
+		stream (api.RowStream.RowStream): The stream the chunks are from.
+		chunks (async iterator of list of tuple): The chunks of row tuples.
+
+	Returns:
+		dict: The `schema` of the context, the `count` of rows and the `columns` by their
+			flattened field names.
+	"""
+	names = [f.api_name.name for f in stream.fields]
+	columns = [[] for n in names]
+	count = 0
+	async for chunk in chunks:
+		count += len(chunk)
+		i = 0
+		for col in zip(*chunk):
+			columns[i].extend(col)
+			i += 1
+	return 	{
+				'schema': stream.plan.schema,
+				'count': count,
+				'columns': dict(zip(names, columns))
+			}
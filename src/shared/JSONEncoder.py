@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Module implementing pluggable JSON encoders for API responses.
+
+Encoders turn response data into JSON bytes, ready to be written to the response body
+without a further str to bytes conversion. The stdlib `json` encoder is always available,
+faster backends are used when their package is installed.
+
+Attributes:
+	ENCODERS (dict of [str, class]): The registered encoder classes by name.
+	PREFERRED (list of str): Encoder names in order of preference when none is requested.
+"""
+
+import base64
+import datetime
+import decimal
+import json
+
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
+def default_handler (obj):
+	"""Converts values the JSON encoders don't support natively.
+
+	Decimals are written as strings so no precision is lost, dates and times as ISO 8601
+	strings and binary values as utf-8 text, or base64 if they aren't valid utf-8.
+
+	Args:
+		obj: The value to convert.
+
+	Returns:
+		str: The JSON compatible representation of the value.
+
+	Raises:
+		TypeError: If the value is of an unsupported type.
+	"""
+	if isinstance(obj, decimal.Decimal):
+		return str(obj)
+	if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+		return obj.isoformat()
+	if isinstance(obj, datetime.timedelta):
+		return str(obj)
+	if isinstance(obj, (bytes, bytearray)):
+		try:
+			return obj.decode('utf-8')
+		except UnicodeDecodeError:
+			return base64.b64encode(obj).decode('ascii')
+	raise TypeError("[default_handler] Object of type '" + type(obj).__name__ + "' is not JSON serializable")
+
+
+class StdlibJSONEncoder:
+	"""Class encoding JSON with the stdlib `json` module.
+	"""
+	name = 'json'
+
+	def __init__ (self):
+		self.__encoder = json.JSONEncoder(default=default_handler, ensure_ascii=False, separators=(',', ':'))
+
+	def encode (self, obj):
+		"""Encodes data to JSON.
+
+		Args:
+			obj: The data to encode.
+
+		Returns:
+			bytes: The utf-8 encoded JSON.
+		"""
+		return self.__encoder.encode(obj).encode('utf-8')
+
+
+class OrjsonEncoder:
+	"""Class encoding JSON with the optional `orjson` package.
+
+	Raises:
+		ImportError: If the orjson package is not installed.
+	"""
+	name = 'orjson'
+
+	def __init__ (self):
+		if orjson is None:
+			raise ImportError('[OrjsonEncoder.__init__] The orjson package is required for the orjson encoder')
+
+	def encode (self, obj):
+		"""Encodes data to JSON.
+
+		Args:
+			obj: The data to encode.
+
+		Returns:
+			bytes: The utf-8 encoded JSON.
+		"""
+		return orjson.dumps(obj, default=default_handler, option=orjson.OPT_NON_STR_KEYS)
+
+
+ENCODERS = 	{
+				'json': StdlibJSONEncoder,
+				'orjson': OrjsonEncoder
+			}
+PREFERRED = ['orjson', 'json']
+
+def register_encoder (name, cls):
+	"""Registers a JSON encoder class so it can be selected by name.
+
+	Args:
+		name (str): The name to register the encoder under.
+		cls (class): The encoder class. Instances need an `encode(obj)` method returning bytes.
+	"""
+	ENCODERS[name] = cls
+
+def available_encoders ():
+	"""Lists the registered encoders that can be used in this environment.
+
+	Returns:
+		list of str: The names of the usable encoders.
+	"""
+	names = []
+	for name in ENCODERS:
+		try:
+			ENCODERS[name]()
+		except ImportError:
+			continue
+		names.append(name)
+	return names
+
+def get_encoder (name=None):
+	"""Creates a JSON encoder.
+
+	Args:
+		name (str, optional): The name of the encoder. Defaults to the fastest available.
+
+	Returns:
+		object: The encoder instance.
+
+	Raises:
+		ValueError: If the named encoder is not registered.
+		ImportError: If the named encoder's package is not installed.
+	"""
+	if name != None:
+		if name not in ENCODERS:
+			raise ValueError("[get_encoder] Encoder '" + name + "' not valid")
+		return ENCODERS[name]()
+
+	for n in PREFERRED:
+		try:
+			return ENCODERS[n]()
+		except ImportError:
+			continue
+	return StdlibJSONEncoder()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Module building the sqlite database and controller the tests run against.
+
+Orders refer to a customer, which may be NULL, and a shipping customer, which may not.
+Customers refer to their region. Order 1 is placed and shipped by two customers of the
+same region, order 3 has no customer and is never returned by the api. Items have
+names that may be NULL.
+
+Attributes:
+	SCHEMA (str): The statements creating and filling the tables.
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.DatabaseConnectionOption import DatabaseConnectionOption
+from db.DatabaseConnection import DatabaseConnection
+from api.APIContext import APIContext
+from api.APIController import APIController
+
+SCHEMA = '''
+CREATE TABLE region (id INT PRIMARY KEY, name VARCHAR(20));
+CREATE TABLE customer (id INT PRIMARY KEY, name VARCHAR(20), region_id INT NOT NULL REFERENCES region(id));
+CREATE TABLE orders (id INT PRIMARY KEY, total REAL, customer_id INT REFERENCES customer(id), ship_id INT NOT NULL REFERENCES customer(id));
+INSERT INTO region VALUES (1, 'north'), (2, 'south');
+INSERT INTO customer VALUES (1, 'ann', 1), (2, 'bob', 1), (3, 'cid', 2), (4, 'dee', 2), (5, 'eve', 2);
+INSERT INTO orders VALUES (1, 10.0, 1, 2), (2, 20.0, 3, 3), (3, 30.0, NULL, 4);
+INSERT INTO orders VALUES (4, 40.0, 4, 4), (5, 50.0, 5, 4), (6, 60.0, 4, 5), (7, 70.0, 5, 5), (8, 80.0, 4, 4);
+CREATE TABLE item (id INT PRIMARY KEY, name VARCHAR(20));
+INSERT INTO item VALUES (1, 'b'), (2, NULL), (3, 'a'), (4, NULL), (5, 'c');
+'''
+
+
+class SQLiteFixture:
+	"""Class holding a throwaway sqlite database and a controller serving it.
+
+	Attributes:
+		path (str): The path of the database file.
+		apic (APIController): The controller.
+	"""
+	def __init__ (self, page_lim=0, asyn=False, **controller_options):
+		self.__dir = tempfile.mkdtemp()
+		self.path = os.path.join(self.__dir, 'test.db')
+		conn = sqlite3.connect(self.path)
+		conn.executescript(SCHEMA)
+		conn.commit()
+		conn.close()
+
+		options = {'path': self.path}
+		if asyn:
+			options['async'] = True
+		dbc = DatabaseConnection(DatabaseConnectionOption('sqlite', **options))
+		schema = dbc.get_schema()
+		contexts = [APIContext(schema, t) for d in schema for t in d.children]
+		self.apic = APIController(dbc, contexts, page_lim, **controller_options)
+
+	def rows (self, sql):
+		"""Reads rows straight from the database, bypassing the api.
+		"""
+		return self.apic.dbc.query(sql)
+
+	def close (self):
+		self.apic.dbc.close()
+		shutil.rmtree(self.__dir, ignore_errors=True)
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""Tests of the async query path, checking it answers the same as the blocking one.
+"""
+
+import asyncio
+import unittest
+from sqlite_fixture import SQLiteFixture
+from db.AsyncConnectionPool import AsyncConnectionPool
+from db.ConstraintError import ConstraintError
+
+
+class FakeConnections:
+	"""Opens numbered fake connections, which are alive unless listed in `dead`.
+	"""
+	def __init__ (self):
+		self.opened = 0
+		self.closed = []
+		self.dead = set()
+
+	async def open (self):
+		self.opened += 1
+		return self.opened
+
+	async def ping (self, raw):
+		return raw not in self.dead
+
+	async def close (self, raw):
+		self.closed.append(raw)
+
+	def pool (self, **options):
+		return AsyncConnectionPool(self.open, self.ping, self.close, **options)
+
+
+class AsyncPoolTest (unittest.TestCase):
+	def setUp (self):
+		self.fake = FakeConnections()
+
+	def test_sizes_checked (self):
+		self.assertRaises(ValueError, self.fake.pool, min_size=2, max_size=1)
+
+	def test_connection_reused (self):
+		pool = self.fake.pool(min_size=1, max_size=2)
+		async def use ():
+			await pool.warm()
+			async with pool.connection() as conn:
+				first = conn.raw
+			async with pool.connection() as conn:
+				return first, conn.raw
+		self.assertEqual(asyncio.run(use()), (1, 1))
+		self.assertEqual((self.fake.opened, pool.size, pool.idle), (1, 1, 1))
+
+	def test_dead_connection_replaced (self):
+		pool = self.fake.pool(min_size=0, max_size=2)
+		async def use ():
+			async with pool.connection() as conn:
+				self.fake.dead.add(conn.raw)
+			async with pool.connection() as conn:
+				return conn.raw
+		self.assertEqual(asyncio.run(use()), 2)
+		self.assertEqual((self.fake.closed, pool.size), ([1], 1))
+
+	def test_error_discards_connection (self):
+		pool = self.fake.pool(min_size=0, max_size=2)
+		async def use ():
+			async with pool.connection() as conn:
+				raise KeyError()
+		self.assertRaises(KeyError, asyncio.run, use())
+		self.assertEqual((self.fake.closed, pool.size, pool.idle), ([1], 0, 0))
+
+	def test_exhausted_pool_waits (self):
+		pool = self.fake.pool(min_size=0, max_size=1)
+		async def use ():
+			conn = await pool.acquire()
+			try:
+				await pool.acquire(0.01)
+				self.fail('acquired past max_size')
+			except RuntimeError:
+				pass
+			waiter = asyncio.ensure_future(pool.acquire(1.0))
+			await asyncio.sleep(0.01)
+			self.assertFalse(waiter.done())
+			await pool.release(conn)
+			return (await waiter).raw
+		self.assertEqual(asyncio.run(use()), 1)
+		self.assertEqual(self.fake.opened, 1)
+
+
+class AsyncProviderTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture(asyn=True)
+		self.dbc = self.fixture.apic.dbc
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def run_async (self, coro):
+		async def run ():
+			try:
+				return await coro
+			finally:
+				await self.dbc.close_async()
+		return asyncio.run(run())
+
+	def test_query (self):
+		self.assertTrue(self.dbc.is_async)
+		rows = self.run_async(self.dbc.query_async('SELECT id FROM orders WHERE total > %s ORDER BY id', (45,)))
+		self.assertEqual(rows, [(5,), (6,), (7,), (8,)])
+
+	def test_query_error (self):
+		self.assertRaises(RuntimeError, self.run_async, self.dbc.query_async('SELECT nope FROM orders'))
+
+	def test_fetch_stream (self):
+		async def read ():
+			return [chunk async for chunk in self.dbc.fetch_stream_async('SELECT id FROM orders ORDER BY id', None, 3)]
+		self.assertEqual([len(c) for c in self.run_async(read())], [3, 3, 2])
+
+	def test_closed_stream_frees_connection (self):
+		pool = self.dbc.async_provider.pool
+		async def read ():
+			chunks = self.dbc.fetch_stream_async('SELECT id FROM orders', None, 3)
+			await chunks.__anext__()
+			busy = pool.idle
+			await chunks.aclose()
+			return busy, pool.idle, pool.size
+		busy, idle, size = self.run_async(read())
+		self.assertEqual((busy, idle), (size - 1, size))
+
+	def test_transaction_commits (self):
+		async def write ():
+			async with self.dbc.transaction_async() as tx:
+				await tx.query('INSERT INTO region VALUES (%s, %s)', (3, 'west'))
+				await tx.query('INSERT INTO region VALUES (%s, %s)', (4, 'east'))
+		self.run_async(write())
+		self.assertEqual(len(self.fixture.rows('SELECT * FROM region')), 4)
+
+	def test_transaction_rolls_back (self):
+		async def write ():
+			async with self.dbc.transaction_async() as tx:
+				await tx.query('INSERT INTO region VALUES (%s, %s)', (3, 'west'))
+				await tx.query('INSERT INTO region VALUES (%s, %s)', (1, 'dup'))
+		self.assertRaises(ConstraintError, self.run_async, write())
+		self.assertEqual(len(self.fixture.rows('SELECT * FROM region')), 2)
+
+
+class AsyncControllerTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture(asyn=True, stream_chunk=3, cache_bytes=1 << 20, object_cache=100)
+		self.apic = self.fixture.apic
+		self.sync = SQLiteFixture()
+
+	def tearDown (self):
+		self.fixture.close()
+		self.sync.close()
+
+	def both (self, method, *args):
+		"""Calls a controller method on the async path and on the blocking path of a 
+		separate, identical database.
+		"""
+		async def run ():
+			try:
+				return await getattr(self.apic, method + '_async')(*args)
+			finally:
+				await self.apic.dbc.close_async()
+		return asyncio.run(run()), getattr(self.sync.apic, method)(*args)
+
+	def test_reads_match (self):
+		calls = [
+					('context_query_multiple', 'main_orders', {}),
+					('context_query_multiple', 'main_orders', {'fields': 'id', 'total': '40', 'total_comp': 'GT'}),
+					('context_query_multiple', 'main_orders', {'cursor': '', 'page_size': '3', 'order_by': 'total', 'order_dir': 'DESC'}),
+					('context_query_multiple', 'main_orders', {'expand': 'customer_id', 'id_in': '4,1,99'}),
+					('context_query_multiple', 'main_orders', {'total': '1000'}),
+					('context_query_single', 'main_orders', 1),
+					('context_query_single', 'main_orders', 99),
+					('context_query_ids', 'main_customer', ['1', '3', '99'])
+				]
+		for call in calls:
+			got, expected = self.both(*call)
+			self.assertEqual(got, expected, call)
+
+	def test_stream_matches (self):
+		async def read ():
+			try:
+				stream, retno = await self.apic.context_stream_multiple_async('main_orders', {})
+				self.assertFalse(stream.buffered)
+				return [chunk async for chunk in stream]
+			finally:
+				await self.apic.dbc.close_async()
+		chunks = asyncio.run(read())
+		data, retno = self.sync.apic.context_query_multiple('main_orders', {})
+		self.assertEqual([len(c) for c in chunks], [3, 3, 1])
+		self.assertEqual([row for chunk in chunks for row in chunk], data)
+
+	def test_writes_match (self):
+		calls = [
+					('context_post_single', 'main_region', {'id': 3, 'name': 'west'}),
+					('context_post_single', 'main_region', {'id': 1, 'name': 'dup'}),
+					('context_post_many', 'main_region', [{'id': 4, 'name': 'a'}, {'id': 5}]),
+					('context_post_many', 'main_region', [{'id': 6, 'name': 'b'}, {'id': 2, 'name': 'dup'}]),
+					('context_del_single', 'main_orders', 1),
+					('context_del_single', 'main_orders', 99),
+					('context_del_many', 'main_item', {'name': 'a'}),
+					('context_del_many', 'main_item', {'q': ''})
+				]
+		for call in calls:
+			got, expected = self.both(*call)
+			self.assertEqual(got, expected, call)
+		for table in ['region', 'orders', 'item']:
+			sql = 'SELECT * FROM ' + table + ' ORDER BY id'
+			self.assertEqual(self.fixture.rows(sql), self.sync.rows(sql), table)
+
+	def test_writes_invalidate (self):
+		async def run ():
+			try:
+				before = await self.apic.context_query_single_async('main_region', 3)
+				await self.apic.context_post_single_async('main_region', {'id': 3, 'name': 'west'})
+				after = await self.apic.context_query_single_async('main_region', 3)
+				return before, after
+			finally:
+				await self.apic.dbc.close_async()
+		before, after = asyncio.run(run())
+		self.assertEqual(before[1], 404)
+		self.assertEqual(after, ({'id': 3, 'name': 'west'}, 200))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Tests checking that request values are bound to queries rather than spliced into them.
+"""
+
+import unittest
+from sqlite_fixture import SQLiteFixture
+from db.StatementCache import StatementCache
+
+QUOTES = ['" OR "1"="1', "' OR '1'='1", '1 OR 1=1', "x'); DROP TABLE region; --"]
+
+
+class BindTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture()
+		self.apic = self.fixture.apic
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def regions (self):
+		return self.fixture.rows('SELECT id, name FROM region ORDER BY id')
+
+	def test_filters_bound (self):
+		for value in QUOTES:
+			data, retno = self.apic.context_query_multiple('main_region', {'name': value})
+			self.assertEqual(retno, 404, value)
+			data, retno = self.apic.context_query_multiple('main_region', {'name': value, 'name_comp': 'LIKE'})
+			self.assertEqual(retno, 404, value)
+			data, retno = self.apic.context_query_multiple('main_region', {'q': value})
+			self.assertEqual(retno, 404, value)
+		self.assertEqual(len(self.regions()), 2)
+
+	def test_like_matches_text (self):
+		data, retno = self.apic.context_query_multiple('main_region', {'q': 'orth'})
+		self.assertEqual([row['name'] for row in data], ['north'])
+
+	def test_id_bound (self):
+		for value in QUOTES:
+			self.assertEqual(self.apic.context_query_single('main_region', value)[1], 404, value)
+			self.assertEqual(self.apic.context_del_single('main_region', value)[1], 404, value)
+		self.assertEqual(len(self.regions()), 2)
+
+	def test_body_stored_as_given (self):
+		for i in range(len(QUOTES)):
+			data, retno = self.apic.context_post_single('main_region', {'id': 10 + i, 'name': QUOTES[i]})
+			self.assertEqual(retno, 201, QUOTES[i])
+		self.assertEqual(self.regions()[2:], [(10 + i, QUOTES[i]) for i in range(len(QUOTES))])
+		data, retno = self.apic.context_query_multiple('main_region', {'name': QUOTES[0]})
+		self.assertEqual([row['id'] for row in data], [10])
+
+
+class Statement:
+	def __init__ (self):
+		self.closed = False
+
+	def close (self):
+		self.closed = True
+
+
+class StatementCacheTest (unittest.TestCase):
+	def test_statements_reused (self):
+		cache = StatementCache(Statement, max_size=2)
+		a = cache.get('SELECT %s')
+		self.assertIs(cache.get('SELECT %s'), a)
+		self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+	def test_least_recent_closed (self):
+		cache = StatementCache(Statement, max_size=2)
+		a = cache.get('a')
+		b = cache.get('b')
+		cache.get('a')
+		c = cache.get('c')
+		self.assertEqual(len(cache), 2)
+		self.assertTrue(b.closed)
+		self.assertFalse(a.closed or c.closed)
+		cache.discard('a')
+		self.assertTrue(a.closed)
+		cache.clear()
+		self.assertTrue(c.closed)
+		self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
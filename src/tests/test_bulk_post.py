@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Tests checking that bulk posts create all of their valid instances or none of them.
+"""
+
+import json
+import unittest
+import falcon.testing
+from sqlite_fixture import SQLiteFixture
+from FalconAPI import FalconAPI
+
+
+class BulkPostTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture(insert_chunk=2)
+		self.apic = self.fixture.apic
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def regions (self):
+		return self.fixture.rows('SELECT id, name FROM region ORDER BY id')
+
+	def test_all_created (self):
+		items = [{'id': i, 'name': 'r' + str(i)} for i in range(3, 8)]
+		data, retno = self.apic.context_post_many('main_region', items)
+		self.assertEqual(retno, 201)
+		self.assertEqual((data['created'], data['failed']), (5, 0))
+		self.assertEqual([r['data'] for r in data['results']], items)
+		self.assertEqual(self.regions()[2:], [(i, 'r' + str(i)) for i in range(3, 8)])
+
+	def test_partly_created (self):
+		items = [{'id': 3, 'name': 'west'}, {'id': 4}, 'x', {'id': 5, 'name': 'east'}]
+		data, retno = self.apic.context_post_many('main_region', items)
+		self.assertEqual(retno, 207)
+		self.assertEqual((data['created'], data['failed']), (2, 2))
+		self.assertEqual([(r['index'], r['status']) for r in data['results']], [(0, 201), (1, 400), (2, 400), (3, 201)])
+		self.assertIn('name', data['results'][1]['error'])
+		self.assertEqual(self.regions()[2:], [(3, 'west'), (5, 'east')])
+
+	def test_none_valid (self):
+		data, retno = self.apic.context_post_many('main_region', [{'id': 3}, 1])
+		self.assertEqual(retno, 400)
+		self.assertEqual(data['created'], 0)
+		self.assertEqual(self.apic.context_post_many('main_region', [])[1], 400)
+
+	def test_failure_rolls_back (self):
+		# The duplicate is in the second insert chunk, the first one is rolled back too
+		items = [{'id': 3, 'name': 'a'}, {'id': 4, 'name': 'b'}, {'id': 1, 'name': 'dup'}, {'id': 5}]
+		data, retno = self.apic.context_post_many('main_region', items)
+		self.assertEqual(retno, 500)
+		self.assertEqual((data['created'], data['failed']), (0, 4))
+		self.assertEqual([r['status'] for r in data['results']], [500, 500, 500, 400])
+		self.assertEqual(self.regions(), [(1, 'north'), (2, 'south')])
+
+	def test_single_conflict (self):
+		data, retno = self.apic.context_post_single('main_region', {'id': 1, 'name': 'dup'})
+		self.assertEqual(retno, 409)
+		self.assertEqual(self.regions(), [(1, 'north'), (2, 'south')])
+
+	def test_http_bodies (self):
+		client = falcon.testing.TestClient(FalconAPI(self.apic).run_app())
+		resp = client.simulate_post('/api/main_region', body=json.dumps([{'id': 3, 'name': 'a'}, {'id': 4}]))
+		self.assertEqual(resp.status_code, 207)
+		self.assertEqual(resp.json['created'], 1)
+		lines = '{"id": 5, "name": "b"}\n\n{"id": 6, "name": "c"}\n'
+		resp = client.simulate_post('/api/main_region', body=lines, content_type='application/x-ndjson')
+		self.assertEqual(resp.status_code, 201)
+		self.assertEqual(resp.json['created'], 2)
+		resp = client.simulate_post('/api/main_region', body='[{"id": 7,')
+		self.assertEqual(resp.status_code, 400)
+		self.assertEqual([r[0] for r in self.regions()], [1, 2, 3, 5, 6])
+
+
+if __name__ == '__main__':
+	unittest.main()
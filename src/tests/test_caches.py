@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""Tests checking that cached results are dropped once they may be stale.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+import unittest
+from sqlite_fixture import SQLiteFixture
+from api.APIContext import APIContext
+from api.ObjectCache import ObjectCache, NOT_FOUND
+from api.ResultCache import ResultCache
+from api.SingleFlight import SingleFlight
+from api.TableVersions import TableVersions
+
+
+class CacheTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture(cache_bytes=1 << 20, object_cache=100, object_ttl=60.0)
+		self.apic = self.fixture.apic
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def write (self, sql):
+		"""Writes to the database behind the api's back.
+		"""
+		conn = sqlite3.connect(self.fixture.path)
+		conn.execute(sql)
+		conn.commit()
+		conn.close()
+
+	def totals (self):
+		data, retno = self.apic.context_query_multiple('main_orders', {'fields': 'id,total'})
+		self.assertEqual(retno, 200)
+		return dict([(row['id'], row['total']) for row in data])
+
+	def count_queries (self):
+		"""Counts the queries reaching the database from now on.
+		"""
+		dbc = self.apic.dbc
+		counts = {'query': 0, 'stream': 0}
+		query = dbc.query
+		fetch_stream = dbc.fetch_stream
+		def counted_query (sql, params=None):
+			counts['query'] += 1
+			return query(sql, params)
+		def counted_stream (sql, params=None, size=500):
+			counts['stream'] += 1
+			return fetch_stream(sql, params, size)
+		dbc.query = counted_query
+		dbc.fetch_stream = counted_stream
+		return counts
+
+	def new_context (self, name):
+		schema = self.apic.dbc.get_schema()
+		return [APIContext(schema, t) for d in schema for t in d.children if t.fq_name == name][0]
+
+	def test_results_reused (self):
+		counts = self.count_queries()
+		first = self.totals()
+		self.assertEqual(self.totals(), first)
+		self.assertEqual(counts['query'], 1)
+		stream, retno = self.apic.context_stream_multiple('main_item', {})
+		rows = [row for chunk in stream for row in chunk]
+		stream, retno = self.apic.context_stream_multiple('main_item', {})
+		self.assertEqual([row for chunk in stream for row in chunk], rows)
+		self.assertEqual(counts['stream'], 1)
+		self.assertEqual(self.apic.cache.stats()['hits'], 2)
+
+	def test_writes_invalidate_readers (self):
+		counts = self.count_queries()
+		self.apic.context_query_multiple('main_orders', {})
+		self.apic.context_query_multiple('main_item', {})
+		data, retno = self.apic.context_post_single('main_region', {'id': 3, 'name': 'west'})
+		self.assertEqual(retno, 201)
+		queried = counts['query']
+		# Orders read regions through their customers, items don't read regions
+		self.apic.context_query_multiple('main_orders', {})
+		self.apic.context_query_multiple('main_item', {})
+		self.assertEqual(counts['query'], queried + 1)
+		data, retno = self.apic.context_del_single('main_orders', 1)
+		self.assertEqual(retno, 204)
+		self.assertNotIn(1, self.totals())
+
+	def test_replaced_context_not_cached (self):
+		self.assertEqual(self.totals()[1], 10.0)
+		self.assertEqual(self.apic.context_query_single('main_orders', 1)[0]['total'], 10.0)
+		self.write('UPDATE orders SET total = 11.0 WHERE id = 1')
+		self.assertEqual(self.totals()[1], 10.0)
+		self.apic.add_context(self.new_context('main.orders'))
+		self.assertEqual(self.totals()[1], 11.0)
+		self.assertEqual(self.apic.context_query_single('main_orders', 1)[0]['total'], 11.0)
+
+	def test_removed_context_not_cached (self):
+		self.assertEqual(self.totals()[1], 10.0)
+		self.write('UPDATE orders SET total = 12.0 WHERE id = 1')
+		self.apic.remove_context('main_orders')
+		self.apic.add_context(self.new_context('main.orders'))
+		self.assertEqual(self.totals()[1], 12.0)
+
+	def test_objects_reused (self):
+		counts = self.count_queries()
+		obj, retno = self.apic.context_query_single('main_orders', 1)
+		self.apic.cache.clear()
+		self.assertEqual(self.apic.context_query_single('main_orders', 1), (obj, 200))
+		self.assertEqual(self.apic.context_query_single('main_orders', 99)[1], 404)
+		self.apic.cache.clear()
+		self.assertEqual(self.apic.context_query_single('main_orders', 99)[1], 404)
+		self.assertEqual(counts['query'], 2)
+		stats = self.apic.objects.stats()
+		self.assertEqual((stats['hits'], stats['negative_hits']), (1, 1))
+
+	def test_writes_invalidate_objects (self):
+		self.assertEqual(self.apic.context_query_single('main_region', 3)[1], 404)
+		data, retno = self.apic.context_post_single('main_region', {'id': 3, 'name': 'west'})
+		self.assertEqual(self.apic.context_query_single('main_region', 3), ({'id': 3, 'name': 'west'}, 200))
+		self.assertEqual(self.apic.context_query_single('main_orders', 1)[0]['customer_id']['customer_id_name'], 'ann')
+		self.assertEqual(self.apic.context_del_single('main_orders', 1)[1], 204)
+		self.assertEqual(self.apic.context_query_single('main_orders', 1)[1], 404)
+
+	def test_miss_read_before_insert_not_cached (self):
+		dbc = self.apic.dbc
+		query = dbc.query
+		def query_then_insert (sql, params=None):
+			result = query(sql, params)
+			dbc.query = query
+			data, retno = self.apic.context_post_single('main_region', {'id': 3, 'name': 'west'})
+			self.assertEqual(retno, 201)
+			return result
+		dbc.query = query_then_insert
+		self.assertEqual(self.apic.context_query_single('main_region', 3)[1], 404)
+		data, retno = self.apic.context_query_single('main_region', 3)
+		self.assertEqual(retno, 200)
+		self.assertEqual(data['name'], 'west')
+
+	def test_ids_missed_before_insert_not_cached (self):
+		dbc = self.apic.dbc
+		query = dbc.query
+		def query_then_insert (sql, params=None):
+			result = query(sql, params)
+			dbc.query = query
+			self.apic.context_post_single('main_region', {'id': 3, 'name': 'west'})
+			return result
+		dbc.query = query_then_insert
+		data, retno = self.apic.context_query_ids('main_region', ['1', '3'])
+		self.assertEqual(sorted(data), ['1'])
+		data, retno = self.apic.context_query_ids('main_region', ['1', '3'])
+		self.assertEqual(sorted(data), ['1', '3'])
+
+
+class ResultCacheTest (unittest.TestCase):
+	def setUp (self):
+		self.versions = TableVersions()
+
+	def test_version_invalidates (self):
+		cache = ResultCache(self.versions)
+		cache.put('a', [(1,)], ['t', 'u'], self.versions.snapshot(['t', 'u']), 10)
+		cache.put('b', [(2,)], ['v'], self.versions.snapshot(['v']), 10)
+		self.assertEqual(cache.get('a'), [(1,)])
+		self.versions.bump(['u'])
+		self.assertEqual(cache.get('a'), None)
+		self.assertEqual(cache.get('b'), [(2,)])
+		self.assertEqual(cache.stats()['invalidations'], 1)
+
+	def test_stale_stamp_never_served (self):
+		cache = ResultCache(self.versions)
+		stamp = self.versions.snapshot(['t'])
+		self.versions.bump(['t'])
+		cache.put('a', [(1,)], ['t'], stamp, 10)
+		self.assertEqual(cache.get('a'), None)
+
+	def test_budget_evicts_least_recent (self):
+		cache = ResultCache(self.versions, max_bytes=30)
+		for key in ['a', 'b', 'c']:
+			cache.put(key, key, [], (), 10)
+		cache.get('a')
+		cache.put('d', 'd', [], (), 10)
+		self.assertEqual([cache.get(k) for k in ['a', 'b', 'c', 'd']], ['a', None, 'c', 'd'])
+		cache.put('e', 'e', [], (), 31)
+		self.assertEqual(cache.get('e'), None)
+		self.assertEqual(cache.stats()['bytes'], 30)
+
+	def test_ttl (self):
+		cache = ResultCache(self.versions, ttl=0.01)
+		cache.put('a', 'a', [], (), 10)
+		time.sleep(0.02)
+		self.assertEqual(cache.get('a'), None)
+
+	def test_collect_large_stream (self):
+		cache = ResultCache(self.versions, max_bytes=16 * 1024)
+		small = [[(1, 'a')], [(2, 'b')]]
+		self.assertEqual(list(cache.collect(iter(small), 'small', [], ())), small)
+		self.assertEqual(cache.get('small'), [(1, 'a'), (2, 'b')])
+		large = [[(i, 'x' * 100) for i in range(10)] for j in range(5)]
+		self.assertEqual(list(cache.collect(iter(large), 'large', [], ())), large)
+		self.assertEqual(cache.get('large'), None)
+
+
+class ObjectCacheTest (unittest.TestCase):
+	def test_lookups (self):
+		cache = ObjectCache(max_entries=2)
+		self.assertEqual(cache.get('c', '1'), None)
+		cache.put('c', '1', {'id': 1}, cache.generation('c'))
+		cache.put_missing('c', '9', cache.generation('c'), cache.epoch('c'))
+		self.assertEqual(cache.get('c', '1'), {'id': 1})
+		self.assertIs(cache.get('c', '9'), NOT_FOUND)
+		self.assertEqual(cache.get('d', '1'), None)
+
+	def test_least_recent_evicted (self):
+		cache = ObjectCache(max_entries=2)
+		for pk in ['1', '2']:
+			cache.put('c', pk, pk, 0)
+		cache.get('c', '1')
+		cache.put('c', '3', '3', 0)
+		self.assertEqual([cache.get('c', pk) for pk in ['1', '2', '3']], ['1', None, '3'])
+
+	def test_ttl (self):
+		cache = ObjectCache(ttl=0.01, negative_ttl=0.01)
+		cache.put('c', '1', 1, 0)
+		cache.put_missing('c', '2', 0, 0)
+		time.sleep(0.02)
+		self.assertEqual((cache.get('c', '1'), cache.get('c', '2')), (None, None))
+
+	def test_invalidate (self):
+		cache = ObjectCache()
+		generation = cache.generation('c')
+		cache.put('c', '1', 1, generation)
+		cache.put('d', '1', 1, cache.generation('d'))
+		cache.invalidate(['c'])
+		self.assertEqual((cache.get('c', '1'), cache.get('d', '1')), (None, 1))
+		cache.put('c', '1', 1, generation)
+		cache.put_missing('c', '2', generation, cache.epoch('c'))
+		self.assertEqual((cache.get('c', '1'), cache.get('c', '2')), (None, None))
+
+	def test_forget_missing (self):
+		cache = ObjectCache()
+		epoch = cache.epoch('c')
+		cache.put('c', '1', 1, 0)
+		cache.put_missing('c', '2', 0, epoch)
+		cache.forget_missing(['c'])
+		self.assertEqual((cache.get('c', '1'), cache.get('c', '2')), (1, None))
+		cache.put_missing('c', '2', 0, epoch)
+		self.assertEqual(cache.get('c', '2'), None)
+
+
+class SingleFlightTest (unittest.TestCase):
+	def setUp (self):
+		self.flight = SingleFlight()
+		self.calls = 0
+		self.release = threading.Event()
+
+	def tearDown (self):
+		self.release.set()
+
+	def slow (self, value):
+		self.calls += 1
+		self.release.wait(5.0)
+		if value == None:
+			raise KeyError('none')
+		return [value]
+
+	def run_threads (self, key, value, n=5):
+		results = []
+		def call ():
+			try:
+				results.append(self.flight.do(key, self.slow, value))
+			except KeyError as e:
+				results.append(e)
+		threads = [threading.Thread(target=call) for i in range(n)]
+		for t in threads:
+			t.start()
+		while self.flight.stats()['shared'] < n - 1:
+			time.sleep(0.001)
+		self.release.set()
+		for t in threads:
+			t.join()
+		return results
+
+	def test_calls_shared (self):
+		results = self.run_threads('a', 1)
+		self.assertEqual(self.calls, 1)
+		self.assertEqual(results, [[1]] * 5)
+		self.assertIs(results[0], results[1])
+		self.assertEqual(self.flight.stats(), {'led': 1, 'shared': 4, 'in_flight': 0})
+
+	def test_error_shared (self):
+		results = self.run_threads('a', None)
+		self.assertEqual(self.calls, 1)
+		self.assertEqual(len(results), 5)
+		for r in results:
+			self.assertIsInstance(r, KeyError)
+
+	def test_key_freed (self):
+		self.release.set()
+		self.assertEqual(self.flight.do('a', self.slow, 1), [1])
+		self.assertEqual(self.flight.do('a', self.slow, 2), [2])
+		self.assertEqual(self.calls, 2)
+
+	def test_async_calls_shared (self):
+		async def slow (value):
+			self.calls += 1
+			await asyncio.sleep(0.01)
+			return [value]
+		async def calls ():
+			same = await asyncio.gather(*[self.flight.do_async('a', slow, 1) for i in range(5)])
+			other = await self.flight.do_async('b', slow, 2)
+			return same, other
+		same, other = asyncio.run(calls())
+		self.assertEqual(same, [[1]] * 5)
+		self.assertEqual(other, [2])
+		self.assertEqual(self.calls, 2)
+		self.assertEqual(self.flight.stats()['in_flight'], 0)
+
+	def test_reads_coalesced (self):
+		fixture = SQLiteFixture()
+		try:
+			apic = fixture.apic
+			query = apic.dbc.query
+			def slow_query (sql, params=None):
+				self.slow(1)
+				return query(sql, params)
+			apic.dbc.query = slow_query
+			results = []
+			threads = [threading.Thread(target=lambda: results.append(apic.context_query_multiple('main_orders', {}))) for i in range(4)]
+			for t in threads:
+				t.start()
+			while apic.flight.stats()['shared'] < 3:
+				time.sleep(0.001)
+			self.release.set()
+			for t in threads:
+				t.join()
+			self.assertEqual(self.calls, 1)
+			self.assertEqual(len(set([len(r[0]) for r in results])), 1)
+		finally:
+			fixture.close()
+
+
+if __name__ == '__main__':
+	unittest.main()
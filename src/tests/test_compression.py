@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Tests checking that responses are compressed with the coding the client accepts.
+"""
+
+import gzip
+import json
+import unittest
+import zlib
+import falcon.testing
+from sqlite_fixture import SQLiteFixture
+from falc.CompressionMiddleware import CompressionMiddleware, parse_accept_encoding
+from FalconAPI import FalconAPI
+
+
+class NegotiateTest (unittest.TestCase):
+	def test_parse (self):
+		self.assertEqual(parse_accept_encoding('gzip;q=0.5, Deflate, br;q=x, '), {'gzip': 0.5, 'deflate': 1.0, 'br': 0.0})
+
+	def test_negotiate (self):
+		middleware = CompressionMiddleware()
+		self.assertEqual(middleware.negotiate(None), None)
+		self.assertEqual(middleware.negotiate('identity'), None)
+		self.assertEqual(middleware.negotiate('deflate, gzip'), 'gzip')
+		self.assertEqual(middleware.negotiate('deflate, gzip;q=0.5'), 'deflate')
+		self.assertEqual(middleware.negotiate('*'), 'gzip')
+		self.assertEqual(middleware.negotiate('*, gzip;q=0'), 'deflate')
+		self.assertRaises(ValueError, CompressionMiddleware, encodings=['br'])
+
+
+class CompressionTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture(stream_chunk=2)
+		self.apic = self.fixture.apic
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def client (self, **options):
+		return falcon.testing.TestClient(FalconAPI(self.apic, **options).run_app())
+
+	def get (self, client, path, encoding, query_string=''):
+		return client.simulate_get(path, query_string=query_string, headers={'Accept-Encoding': encoding})
+
+	def test_buffered_body (self):
+		client = self.client(compress_min=10)
+		plain = self.get(client, '/api/main_orders/1', 'identity')
+		self.assertEqual(plain.headers.get('content-encoding'), None)
+		resp = self.get(client, '/api/main_orders/1', 'gzip')
+		self.assertEqual(resp.headers['content-encoding'], 'gzip')
+		self.assertIn('Accept-Encoding', resp.headers['vary'])
+		self.assertEqual(gzip.decompress(resp.content), plain.content)
+		resp = self.get(client, '/api/main_orders/1', 'deflate')
+		self.assertEqual(resp.headers['content-encoding'], 'deflate')
+		self.assertEqual(zlib.decompress(resp.content), plain.content)
+
+	def test_streamed_body (self):
+		client = self.client(compress_min=100)
+		plain = self.get(client, '/api/main_orders', 'identity')
+		self.assertGreater(len(plain.content), 100)
+		resp = self.get(client, '/api/main_orders', 'gzip')
+		self.assertEqual(resp.headers['content-encoding'], 'gzip')
+		self.assertEqual(json.loads(gzip.decompress(resp.content)), plain.json)
+
+	def test_small_body_plain (self):
+		client = self.client(compress_min=10000)
+		for path in ['/api/main_orders/1', '/api/main_orders']:
+			resp = self.get(client, path, 'gzip')
+			self.assertEqual(resp.headers.get('content-encoding'), None, path)
+			self.assertIsInstance(resp.json, (dict, list), path)
+
+	def test_disabled (self):
+		resp = self.get(self.client(compress_min=None), '/api/main_orders', 'gzip')
+		self.assertEqual(resp.headers.get('content-encoding'), None)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Tests of keyset pages and id lists combined with a selection of fields.
+"""
+
+import unittest
+from sqlite_fixture import SQLiteFixture
+
+
+class CursorTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture()
+		self.apic = self.fixture.apic
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def pages (self, args, context='main_orders'):
+		rows = []
+		args = dict(args, cursor='', page_size='2')
+		while True:
+			data, retno = self.apic.context_query_multiple(context, args)
+			self.assertEqual(retno, 200)
+			rows += data['results']
+			if data['next'] == None:
+				return rows
+			args['cursor'] = data['next']
+
+	def test_fields_with_cursor (self):
+		args = {'order_by': 'customer_id_name', 'order_dir': 'DESC'}
+		full, retno = self.apic.context_query_multiple('main_orders', {'fields': 'id,total,customer_id_name'})
+		# Pages are ordered by the key after the ordering field
+		full.sort(key=lambda r: (r['customer_id']['customer_id_name'], r['id']), reverse=True)
+		rows = self.pages(dict(args, fields='total'))
+		for row in rows:
+			self.assertEqual(list(row), ['total'])
+		self.assertEqual(rows, [{'total': r['total']} for r in full])
+
+	def test_fields_with_ids (self):
+		data, retno = self.apic.context_query_multiple('main_orders', {'fields': 'total', 'id_in': '4,1,99'})
+		self.assertEqual(retno, 200)
+		self.assertEqual(data, {'results': [{'total': 40.0}, {'total': 10.0}], 'missing': ['99']})
+
+	def test_nullable_order (self):
+		asc = self.pages({'order_by': 'name', 'order_dir': 'ASC'}, 'main_item')
+		self.assertEqual([r['id'] for r in asc], [2, 4, 3, 1, 5])
+		desc = self.pages({'order_by': 'name', 'order_dir': 'DESC'}, 'main_item')
+		self.assertEqual([r['id'] for r in desc], [5, 1, 3, 4, 2])
+		
+	def test_last_page_empty (self):
+		args = {'order_by': 'name', 'order_dir': 'ASC', 'cursor': '', 'page_size': '4'}
+		data, retno = self.apic.context_query_multiple('main_item', args)
+		# The only row after the page is gone by the time the next page is read
+		self.fixture.rows('DELETE FROM item WHERE id = 5;')
+		args['cursor'] = data['next']
+		data, retno = self.apic.context_query_multiple('main_item', args)
+		self.assertEqual((data, retno), ({'results': [], 'next': None}, 200))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Tests checking that expanded relations are loaded with batched, de-duplicated queries.
+"""
+
+import unittest
+from sqlite_fixture import SQLiteFixture
+from api.DataLoader import DataLoader
+from api.Relation import MAX_IN
+
+EXPAND_ALL = 'customer_id,customer_id_region_id,ship_id,ship_id_region_id'
+
+
+class DataLoaderTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture()
+		self.apic = self.fixture.apic
+		self.plan = self.apic.plans['main_orders']
+		self.queries = []
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def run_loader (self, gen):
+		"""Drives a loader query generator, logging its queries.
+		"""
+		try:
+			sql, params = next(gen)
+			while True:
+				self.queries.append(params)
+				sql, params = gen.send(self.apic.dbc.query(sql, params))
+		except StopIteration as done:
+			return done.value
+
+	def test_expand_matches_eager (self):
+		eager, retno = self.apic.context_query_multiple('main_orders', {})
+		data, retno = self.apic.context_query_multiple('main_orders', {'expand': EXPAND_ALL})
+		self.assertEqual(retno, 200)
+		self.assertEqual(sorted(data, key=lambda o: o['id']), sorted(eager, key=lambda o: o['id']))
+
+	def test_expand_leaves_keys (self):
+		data, retno = self.apic.context_query_multiple('main_orders', {'expand': 'ship_id', 'id': '1'})
+		self.assertEqual(data, [{'id': 1, 'total': 10.0, 'customer_id': 1, 'ship_id': {'ship_id_id': 2, 'ship_id_name': 'bob', 'ship_id_region_id': 1}}])
+
+	def test_shared_rows_loaded_once (self):
+		rels = self.plan.relations_by_name
+		objects = [{'customer_id': c, 'ship_id': s} for c, s in [(1, 2), (3, 3), (4, 4), (4, 5), (None, 4)]]
+		loader = DataLoader()
+		self.run_loader(loader.expand(objects, self.plan.relations, set(EXPAND_ALL.split(','))))
+		# Customers of both relations in one query, then their regions in one more
+		self.assertEqual(loader.queries, 2)
+		self.assertEqual(sorted(self.queries[0]), [1, 2, 3, 4, 5])
+		self.assertEqual(sorted(self.queries[1]), [1, 2])
+		self.assertIs(objects[2]['customer_id'], objects[3]['customer_id'])
+		self.assertIs(objects[2]['ship_id'], objects[4]['ship_id'])
+		self.assertEqual(objects[4]['customer_id'], None)
+		self.assertEqual(objects[0]['ship_id']['ship_id_region_id']['ship_id_region_id_name'], 'north')
+		self.run_loader(loader.load([(rels['customer_id'], [1, 4, 99])]))
+		self.assertEqual(loader.queries, 3)
+		self.assertEqual(self.queries[2], (99,))
+		self.assertEqual(loader.get(rels['customer_id'], 99), None)
+
+	def test_many_keys_batched (self):
+		rel = self.plan.relations_by_name['customer_id']
+		keys = list(range(1, 2 * MAX_IN + 10))
+		loader = DataLoader()
+		self.run_loader(loader.load([(rel, keys + keys)]))
+		self.assertEqual(loader.queries, 3)
+		self.assertEqual([len(p) for p in self.queries], [MAX_IN, MAX_IN, 9])
+		self.assertEqual(sorted([k for p in self.queries for k in p]), keys)
+		self.assertEqual([loader.get(rel, k)['customer_id_name'] for k in range(1, 6)], ['ann', 'bob', 'cid', 'dee', 'eve'])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Tests checking that compiled row decoders build the nested api structure of a context.
+"""
+
+import unittest
+from sqlite_fixture import SQLiteFixture
+from api.RowDecoder import RowDecoder
+from shared.SharedServices import is_type
+
+
+def unpack (context, row):
+	"""Decodes a row the way contexts did before decoders were compiled, for reference.
+	"""
+	names = [f.api_name.name for f in context.flat_fields()]
+	def fill (structure):
+		for key in structure:
+			if is_type(structure[key], 'dict'):
+				fill(structure[key])
+			else:
+				structure[key] = row[names.index(key)]
+		return structure
+	return fill(context.types_view())
+
+
+class DecoderTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture()
+		self.apic = self.fixture.apic
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def rows (self, context_name):
+		plan = self.apic.plans[context_name]
+		return self.fixture.rows(plan.sql([]))
+
+	def test_matches_reference (self):
+		for name in ['main_region', 'main_customer', 'main_orders']:
+			context = self.apic.registry.get(name)
+			rows = self.rows(name)
+			self.assertGreater(len(rows), 0)
+			decoder = RowDecoder(context)
+			self.assertEqual(decoder.decode_all(rows), [unpack(context, r) for r in rows])
+			self.assertEqual(context.unpack_single(rows[0]), unpack(context, rows[0]))
+
+	def test_names_drop_relations (self):
+		context = self.apic.registry.get('main_orders')
+		fields = context.flat_fields()
+		decoder = RowDecoder(context, names=['total', 'ship_id_name'])
+		row = tuple(range(len(fields)))
+		self.assertEqual(decoder.decode(row), {'total': 1, 'ship_id': {'ship_id_name': 7}})
+
+	def test_fields_order_rows (self):
+		context = self.apic.registry.get('main_region')
+		fields = list(reversed(context.flat_fields()))
+		decoder = RowDecoder(context, fields=fields)
+		self.assertEqual(decoder.decode(('north', 1)), {'id': 1, 'name': 'north'})
+
+	def test_controller_decodes (self):
+		data, retno = self.apic.context_query_multiple('main_orders', {})
+		context = self.apic.registry.get('main_orders')
+		expected = [unpack(context, r) for r in self.rows('main_orders')]
+		self.assertEqual(sorted(data, key=lambda o: o['id']), sorted(expected, key=lambda o: o['id']))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Tests deleting instances along with the rows of their relations.
+"""
+
+import unittest
+from sqlite_fixture import SQLiteFixture
+
+
+class DeleteTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture()
+		self.apic = self.fixture.apic
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def ids (self, table):
+		return sorted([r[0] for r in self.fixture.rows('SELECT id FROM ' + table)])
+
+	def test_deletes_grouped_per_table (self):
+		deletes = self.apic.plans['main_orders'].deletes
+		self.assertEqual([d[0] for d in deletes], ['main.orders', 'main.customer', 'main.region'])
+		self.assertEqual(len(deletes[1][2]), 2)
+
+	def test_relations_sharing_a_row (self):
+		# Both customers of order 1 are in region 1
+		self.assertEqual(self.apic.context_del_single('main_orders', '1'), ('', 204))
+		self.assertEqual(self.ids('orders'), [2, 3, 4, 5, 6, 7, 8])
+		self.assertEqual(self.ids('customer'), [3, 4, 5])
+		self.assertEqual(self.ids('region'), [2])
+
+	def test_referenced_rows_roll_back (self):
+		data, retno = self.apic.context_del_single('main_orders', '2')
+		self.assertEqual(retno, 409)
+		self.assertEqual(self.ids('orders'), [1, 2, 3, 4, 5, 6, 7, 8])
+		self.assertEqual(self.ids('customer'), [1, 2, 3, 4, 5])
+
+	def test_missing_instance (self):
+		self.assertEqual(self.apic.context_del_single('main_orders', '99')[1], 404)
+
+	def test_delete_many (self):
+		data, retno = self.apic.context_del_many('main_orders', {'id': '1'})
+		self.assertEqual((data, retno), ({'deleted': 1}, 200))
+		self.assertEqual(self.ids('region'), [2])
+
+	def test_delete_many_needs_a_condition (self):
+		for args in [{}, {'total_comp': 'EQ'}, {'q': ''}]:
+			data, retno = self.apic.context_del_many('main_orders', args)
+			self.assertEqual(retno, 400)
+		self.assertEqual(self.ids('orders'), [1, 2, 3, 4, 5, 6, 7, 8])
+
+
+if __name__ == '__main__':
+	unittest.main()
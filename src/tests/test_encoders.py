@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Tests checking that every JSON encoder writes the same JSON for api data.
+"""
+
+import datetime
+import decimal
+import json
+import unittest
+import falcon.testing
+from sqlite_fixture import SQLiteFixture
+from shared import JSONEncoder
+from shared.JSONEncoder import available_encoders, get_encoder, register_encoder, ENCODERS
+from FalconAPI import FalconAPI
+
+DATA = 	[
+			{'id': 1, 'name': 'åsa', 'total': 10.5, 'parent': None, 'ok': True},
+			{
+				'price': decimal.Decimal('12345678901234567890.12'),
+				'day': datetime.date(2026, 1, 2),
+				'at': datetime.datetime(2026, 1, 2, 3, 4, 5),
+				'time': datetime.time(3, 4, 5),
+				'span': datetime.timedelta(hours=1),
+				'text': b'abc',
+				'blob': b'\xff\x00'
+			}
+		]
+EXPECTED = 	[
+				{'id': 1, 'name': 'åsa', 'total': 10.5, 'parent': None, 'ok': True},
+				{
+					'price': '12345678901234567890.12',
+					'day': '2026-01-02',
+					'at': '2026-01-02T03:04:05',
+					'time': '03:04:05',
+					'span': '1:00:00',
+					'text': 'abc',
+					'blob': '/wA='
+				}
+			]
+
+
+class Upper:
+	name = 'upper'
+
+	def encode (self, obj):
+		return json.dumps(obj).upper().encode('utf-8')
+
+
+class EncoderTest (unittest.TestCase):
+	def test_encoders_agree (self):
+		self.assertIn('json', available_encoders())
+		for name in available_encoders():
+			out = get_encoder(name).encode(DATA)
+			self.assertIsInstance(out, bytes, name)
+			self.assertEqual(json.loads(out), EXPECTED, name)
+			self.assertIn('åsa'.encode('utf-8'), out, name)
+
+	def test_unsupported_type (self):
+		for name in available_encoders():
+			self.assertRaises(TypeError, get_encoder(name).encode, {'x': object()})
+
+	def test_unknown_encoder (self):
+		self.assertRaises(ValueError, get_encoder, 'nope')
+
+	def test_missing_package (self):
+		orjson = JSONEncoder.orjson
+		JSONEncoder.orjson = None
+		try:
+			self.assertNotIn('orjson', available_encoders())
+			self.assertRaises(ImportError, get_encoder, 'orjson')
+			self.assertEqual(get_encoder().name, 'json')
+		finally:
+			JSONEncoder.orjson = orjson
+
+	def test_register (self):
+		register_encoder('upper', Upper)
+		try:
+			self.assertIn('upper', available_encoders())
+			self.assertEqual(get_encoder('upper').encode({'a': 'b'}), b'{"A": "B"}')
+		finally:
+			del ENCODERS['upper']
+
+	def test_response_body (self):
+		fixture = SQLiteFixture()
+		try:
+			for name in available_encoders():
+				client = falcon.testing.TestClient(FalconAPI(fixture.apic, encoder=name).run_app())
+				resp = client.simulate_get('/api/main_region/1')
+				self.assertEqual(resp.status_code, 200, name)
+				self.assertEqual(resp.headers['content-type'], 'application/json', name)
+				self.assertEqual(resp.json, {'id': 1, 'name': 'north'}, name)
+		finally:
+			fixture.close()
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Tests checking that GET responses carry entity tags and conditional GETs get a 304.
+"""
+
+import unittest
+import falcon.testing
+from sqlite_fixture import SQLiteFixture
+from FalconAPI import FalconAPI
+
+
+class ETagTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture()
+		self.apic = self.fixture.apic
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def client (self, **options):
+		return falcon.testing.TestClient(FalconAPI(self.apic, **options).run_app())
+
+	def get (self, client, path, tag=None, **kwargs):
+		headers = kwargs.pop('headers', {})
+		if tag != None:
+			headers['If-None-Match'] = tag
+		return client.simulate_get(path, headers=headers, **kwargs)
+
+	def count_queries (self):
+		counts = {'query': 0}
+		query = self.apic.dbc.query
+		def counted (sql, params=None):
+			counts['query'] += 1
+			return query(sql, params)
+		self.apic.dbc.query = counted
+		return counts
+
+	def test_body_tags (self):
+		client = self.client()
+		resp = self.get(client, '/api/main_region/1')
+		tag = resp.headers['etag']
+		self.assertTrue(tag.startswith('"') and tag.endswith('"'))
+		resp = self.get(client, '/api/main_region/1', tag)
+		self.assertEqual(resp.status_code, 304)
+		self.assertEqual(resp.content, b'')
+		self.assertEqual(resp.headers['etag'], tag)
+		for header in ['"x", ' + tag, 'W/' + tag, '*']:
+			self.assertEqual(self.get(client, '/api/main_region/1', header).status_code, 304, header)
+		self.assertEqual(self.get(client, '/api/main_region/1', '"x"').status_code, 200)
+		self.assertNotEqual(self.get(client, '/api/main_region/2').headers['etag'], tag)
+
+	def test_body_tags_follow_data (self):
+		client = self.client()
+		tag = self.get(client, '/api/main_orders', query_string='page_size=2&cursor=').headers['etag']
+		self.apic.context_post_single('main_orders', {'id': 9, 'total': 1.0, 'ship_id': 1})
+		resp = self.get(client, '/api/main_orders', tag, query_string='page_size=2&cursor=')
+		self.assertEqual(resp.status_code, 304)
+		self.apic.context_del_single('main_orders', 1)
+		resp = self.get(client, '/api/main_orders', tag, query_string='page_size=2&cursor=')
+		self.assertEqual(resp.status_code, 200)
+		self.assertNotEqual(resp.headers['etag'], tag)
+
+	def test_version_tags (self):
+		client = self.client(etags='versions')
+		resp = self.get(client, '/api/main_orders')
+		self.assertEqual(resp.status_code, 200)
+		tag = resp.headers['etag']
+		single = self.get(client, '/api/main_orders/1').headers['etag']
+		self.assertNotEqual(single, tag)
+		counts = self.count_queries()
+		self.assertEqual(self.get(client, '/api/main_orders', tag).status_code, 304)
+		self.assertEqual(self.get(client, '/api/main_orders/1', single).status_code, 304)
+		self.assertEqual(counts['query'], 0)
+		self.assertEqual(self.get(client, '/api/main_orders', tag, query_string='fields=id').status_code, 200)
+		self.apic.context_post_single('main_region', {'id': 3, 'name': 'west'})
+		resp = self.get(client, '/api/main_orders', tag)
+		self.assertEqual(resp.status_code, 200)
+		self.assertNotEqual(resp.headers['etag'], tag)
+
+	def test_errors_untagged (self):
+		client = self.client()
+		resp = self.get(client, '/api/main_region/99')
+		self.assertEqual(resp.status_code, 404)
+		self.assertNotIn('etag', resp.headers)
+
+	def test_disabled (self):
+		self.assertNotIn('etag', self.get(self.client(etags=None), '/api/main_region/1').headers)
+		self.assertRaises(ValueError, self.client, etags='weak')
+
+	def test_tags_name_coding (self):
+		client = self.client(compress_min=10)
+		plain = self.get(client, '/api/main_orders/1', headers={'Accept-Encoding': 'identity'}).headers['etag']
+		tag = self.get(client, '/api/main_orders/1', headers={'Accept-Encoding': 'gzip'}).headers['etag']
+		self.assertEqual(tag, plain[:-1] + '-gzip"')
+		resp = self.get(client, '/api/main_orders/1', tag, headers={'Accept-Encoding': 'gzip'})
+		self.assertEqual(resp.status_code, 304)
+		self.assertIn('Accept-Encoding', resp.headers['vary'])
+
+
+if __name__ == '__main__':
+	unittest.main()
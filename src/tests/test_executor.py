@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Tests checking that the executor rejects calls it can't queue and abandons slow ones.
+"""
+
+import asyncio
+import threading
+import unittest
+from sqlite_fixture import SQLiteFixture
+from api.APIExecutor import APIExecutor
+
+
+class ExecutorTest (unittest.TestCase):
+	def setUp (self):
+		self.release = threading.Event()
+
+	def tearDown (self):
+		self.release.set()
+
+	def blocked (self, value):
+		self.release.wait(5.0)
+		return value, 200
+
+	def test_call_result (self):
+		executor = APIExecutor(workers=2)
+		fixture = SQLiteFixture()
+		try:
+			data, retno = asyncio.run(executor.run(fixture.apic.context_query_single, 'main_region', 1))
+			self.assertEqual((data['name'], retno), ('north', 200))
+		finally:
+			fixture.close()
+			executor.shutdown()
+
+	def test_full_queue_rejected (self):
+		executor = APIExecutor(workers=1, max_pending=1)
+		async def calls ():
+			first = asyncio.ensure_future(executor.run(self.blocked, 'a'))
+			second = asyncio.ensure_future(executor.run(self.blocked, 'b'))
+			await asyncio.sleep(0.05)
+			third = await executor.run(self.blocked, 'c')
+			self.release.set()
+			return [await first, await second, third]
+		results = asyncio.run(calls())
+		self.assertEqual(results, [('a', 200), ('b', 200), ('Server busy, try again later', 503)])
+		stats = executor.stats()
+		self.assertEqual((stats['completed'], stats['rejected']), (2, 1))
+		executor.shutdown()
+
+	def test_slow_call_times_out (self):
+		executor = APIExecutor(workers=1, timeout=0.05)
+		self.assertEqual(asyncio.run(executor.run(self.blocked, 'a')), ('Request timed out', 504))
+		self.assertEqual(executor.stats()['timed_out'], 1)
+		self.release.set()
+		executor.shutdown()
+		self.assertEqual(executor.stats()['running'], 0)
+
+	def test_no_timeout_waits (self):
+		executor = APIExecutor(workers=1, timeout=0)
+		async def call ():
+			pending = asyncio.ensure_future(executor.run(self.blocked, 'a'))
+			await asyncio.sleep(0.1)
+			self.release.set()
+			return await pending
+		self.assertEqual(asyncio.run(call()), ('a', 200))
+		executor.shutdown()
+
+
+if __name__ == '__main__':
+	unittest.main()
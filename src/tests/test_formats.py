@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Tests checking that list responses are written in the negotiated format.
+"""
+
+import csv
+import io
+import json
+import unittest
+import falcon.testing
+from sqlite_fixture import SQLiteFixture
+from FalconAPI import FalconAPI
+
+
+class FormatTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture(stream_chunk=2)
+		self.apic = self.fixture.apic
+		self.client = falcon.testing.TestClient(FalconAPI(self.apic).run_app())
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def get (self, path, query_string='', **kwargs):
+		resp = self.client.simulate_get(path, query_string=query_string, **kwargs)
+		self.assertIn('Accept', resp.headers.get('vary', ''))
+		return resp
+
+	def test_ndjson (self):
+		data, retno = self.apic.context_query_multiple('main_orders', {})
+		resp = self.get('/api/main_orders', 'format=ndjson')
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(resp.headers['content-type'], 'application/x-ndjson')
+		self.assertEqual([json.loads(line) for line in resp.text.splitlines()], data)
+
+	def test_csv (self):
+		resp = self.get('/api/main_item', 'format=csv')
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(resp.headers['content-type'], 'text/csv')
+		rows = list(csv.reader(io.StringIO(resp.text)))
+		self.assertEqual(rows, [['id', 'name'], ['1', 'b'], ['2', ''], ['3', 'a'], ['4', ''], ['5', 'c']])
+
+	def test_csv_flattens_relations (self):
+		resp = self.get('/api/main_orders', 'format=csv&fields=id,customer_id_name')
+		rows = list(csv.reader(io.StringIO(resp.text)))
+		self.assertEqual(rows[0], ['id', 'customer_id_name'])
+		self.assertEqual(rows[1:3], [['1', 'ann'], ['2', 'cid']])
+
+	def test_columnar (self):
+		data, retno = self.apic.context_query_multiple('main_orders', {})
+		resp = self.get('/api/main_orders', 'format=columnar')
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(resp.headers['content-type'], 'application/vnd.apinfly.columnar+json')
+		body = resp.json
+		self.assertEqual(body['schema'], self.apic.registry.get('main_orders').types_view())
+		self.assertEqual(body['count'], len(data))
+		self.assertEqual(body['columns']['id'], [row['id'] for row in data])
+		self.assertEqual(body['columns']['ship_id_region_id_name'], [row['ship_id']['ship_id_region_id']['ship_id_region_id_name'] for row in data])
+
+	def test_columnar_fields (self):
+		body = self.get('/api/main_item', 'format=columnar&fields=name').json
+		self.assertEqual(body['columns'], {'name': ['b', None, 'a', None, 'c']})
+		self.assertEqual(body['count'], 5)
+
+	def test_accept_header (self):
+		resp = self.get('/api/main_item', headers={'Accept': 'text/csv'})
+		self.assertEqual(resp.headers['content-type'], 'text/csv')
+		resp = self.get('/api/main_item', headers={'Accept': 'application/x-ndjson;q=0.5, application/json'})
+		self.assertEqual(resp.headers['content-type'], 'application/json')
+		resp = self.get('/api/main_item', 'format=json', headers={'Accept': 'text/csv'})
+		self.assertEqual(resp.json[0], {'id': 1, 'name': 'b'})
+
+	def test_bad_format (self):
+		self.assertEqual(self.get('/api/main_item', 'format=xml').status_code, 400)
+		self.assertEqual(self.get('/api/main_orders', 'format=csv&expand=').status_code, 400)
+
+	def test_empty (self):
+		for fmt in ['json', 'ndjson', 'csv', 'columnar']:
+			self.assertEqual(self.get('/api/main_item', 'format=' + fmt + '&id=99').status_code, 404, fmt)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Tests of `{pk}_in` id lists and the IN and NIN comparators.
+"""
+
+import unittest
+from sqlite_fixture import SQLiteFixture
+from api.APIContext import MAX_BIND
+
+
+class IdListTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture()
+		self.apic = self.fixture.apic
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def test_ids_in_order (self):
+		data, retno = self.apic.context_query_multiple('main_customer', {'id_in': '4,2,9,2'})
+		self.assertEqual(retno, 200)
+		self.assertEqual([r['id'] for r in data['results']], [4, 2])
+		self.assertEqual(data['missing'], ['9'])
+
+	def test_comparators (self):
+		data, retno = self.apic.context_query_multiple('main_customer', {'id': '1,3', 'id_comp': 'IN'})
+		self.assertEqual(sorted([r['id'] for r in data]), [1, 3])
+		data, retno = self.apic.context_query_multiple('main_customer', {'id': '1,3', 'id_comp': 'NIN'})
+		self.assertEqual(sorted([r['id'] for r in data]), [2, 4, 5])
+
+	def test_long_lists (self):
+		ids = ','.join([str(i) for i in range(MAX_BIND)])
+		data, retno = self.apic.context_query_multiple('main_customer', {'id_in': ids, 'order_by': 'id', 'order_dir': 'ASC'})
+		self.assertEqual(retno, 200)
+		self.assertEqual(len(data['results']), 5)
+		
+		ids = ','.join([str(i) for i in range(MAX_BIND + 1)])
+		self.assertEqual(self.apic.context_query_multiple('main_customer', {'id_in': ids})[1], 400)
+		self.assertEqual(self.apic.context_query_multiple('main_customer', {'id': ids, 'id_comp': 'IN'})[1], 400)
+		self.assertEqual(self.apic.context_del_many('main_customer', {'id': ids, 'id_comp': 'NIN'})[1], 400)
+		
+		# Unordered ids are bound a second time to order the rows by
+		ids = ','.join([str(i) for i in range(MAX_BIND // 2 + 1)])
+		self.assertEqual(self.apic.context_query_multiple('main_customer', {'id_in': ids})[1], 400)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Tests checking that batched id lookups find the same instances as single lookups.
+"""
+
+import asyncio
+import unittest
+from sqlite_fixture import SQLiteFixture
+from api.MicroBatcher import MicroBatcher
+
+IDS = ['1', '03', '3', '2.0', '4', '99', 'x']
+
+
+class LookupTest (unittest.TestCase):
+	def fixture (self, **options):
+		fixture = SQLiteFixture(**options)
+		self.addCleanup(fixture.close)
+		return fixture.apic
+
+	def singles (self, apic):
+		found = {}
+		for id in IDS:
+			data, retno = apic.context_query_single('main_customer', id)
+			if retno == 200:
+				found[id] = data
+		return found
+
+	def test_batched_match_single (self):
+		for cache in [0, 100]:
+			apic = self.fixture(object_cache=cache)
+			singles = self.singles(apic)
+			self.assertEqual(sorted(singles), ['03', '1', '2.0', '3', '4'])
+			for i in range(2):
+				data, retno = apic.context_query_ids('main_customer', IDS)
+				self.assertEqual(retno, 200)
+				self.assertEqual(data, singles)
+
+	def test_micro_batcher (self):
+		apic = self.fixture(asyn=True)
+		singles = self.singles(apic)
+
+		async def lookup ():
+			batcher = MicroBatcher(apic.context_query_ids_async, window=0.01)
+			return await asyncio.gather(*[batcher.get('main_customer', id) for id in IDS])
+
+		results = asyncio.run(lookup())
+		for id, (data, retno) in zip(IDS, results):
+			if id in singles:
+				self.assertEqual((data, retno), (singles[id], 200))
+			else:
+				self.assertEqual(retno, 404)
+
+
+if __name__ == '__main__':
+	unittest.main()
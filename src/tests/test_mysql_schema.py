@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Tests of the schema model built from mysql column rows, queried against the sqlite
+fixture database, whose tables it describes.
+"""
+
+import unittest
+from sqlite_fixture import SQLiteFixture
+from db.Database import Database
+from db.DatabaseTable import DatabaseTable
+from db.ProtectionOption import ProtectionOption
+from db.providers.MySQL import column_field
+from api.APIContext import APIContext
+from api.APIController import APIController
+
+COLUMNS = 	{
+				'region': [('id', b'int', 'NO', 'PRI', None), ('name', b'varchar(20)', 'YES', '', None)],
+				'customer': [('id', b'int', 'NO', 'PRI', None), ('name', b'varchar(20)', 'YES', '', None), 
+							('region_id', b'int', 'NO', 'MUL', None)],
+				'orders': [('id', b'int', 'NO', 'PRI', None), ('total', b'double', 'YES', '', None), 
+							('customer_id', b'int', 'YES', 'MUL', None), ('ship_id', b'int', 'NO', 'MUL', None)]
+			}
+REFERENCES = [('customer', 'region_id', 'region'), ('orders', 'customer_id', 'customer'), ('orders', 'ship_id', 'customer')]
+
+def mysql_schema ():
+	"""Models the fixture tables the way `MySQL.get_schema` does.
+	"""
+	d = Database('main', [], protection=ProtectionOption('main'))
+	tables = {}
+	for name in COLUMNS:
+		t = DatabaseTable(name, d, [], protection=ProtectionOption('main.' + name))
+		for row in COLUMNS[name]:
+			t.children.append(column_field(row, t, d, ProtectionOption(d.name + '.' + name + '.' + row[0])))
+		d.children.append(t)
+		tables[name] = t
+	for table, column, referenced in REFERENCES:
+		infield = [f for f in tables[table].children if f.name == column][0]
+		infield.relation = [f for f in tables[referenced].children if f.name == 'id'][0]
+		infield.key += ',FOR'
+	return [d]
+
+
+class MySQLSchemaTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture()
+		schema = mysql_schema()
+		self.apic = APIController(self.fixture.apic.dbc, [APIContext(schema, t) for d in schema for t in d.children], 0)
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def ids (self, args):
+		data, retno = self.apic.context_query_multiple('main_orders', args)
+		self.assertEqual(retno, 200)
+		return sorted([row['id'] for row in data])
+
+	def test_nullable (self):
+		fields = dict([(f.name, f) for f in mysql_schema()[0].children[2].children])
+		self.assertTrue(fields['customer_id'].nullable)
+		self.assertFalse(fields['ship_id'].nullable)
+		self.assertFalse(fields['id'].nullable)
+
+	def test_only_not_null_joins_pruned (self):
+		plan = self.apic.plans['main_orders']
+		rels = plan.relations_by_name
+		self.assertNotIn(rels['customer_id'].index, plan.prunable)
+		self.assertIn(rels['ship_id'].index, plan.prunable)
+
+	def test_fields_keep_rows (self):
+		full = self.ids({})
+		self.assertNotIn(3, full)
+		self.assertEqual(self.ids({'fields': 'id'}), full)
+
+	def test_expand_keeps_rows (self):
+		full = self.ids({})
+		self.assertEqual(self.ids({'expand': ''}), full)
+		self.assertEqual(self.ids({'expand': 'customer_id'}), full)
+		
+	def test_expand_joins_nullable_relation (self):
+		plan = self.apic.plans['main_orders']
+		view = plan.project(plan.root_names, [], [r.field for r in plan.relations])
+		self.assertIn(plan.relations_by_name['customer_id'].index, [plan.tables.index(t) for t in view.tables])
+		self.assertEqual(len(view.joins), len(view.tables) - 1)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Tests checking that numbered pages split the full result without gaps or repeats.
+"""
+
+import unittest
+from sqlite_fixture import SQLiteFixture
+
+
+class PagingTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture(page_lim=3)
+		self.apic = self.fixture.apic
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def pages (self, args):
+		rows = []
+		page = 1
+		while True:
+			data, retno = self.apic.context_query_multiple('main_orders', dict(args, page=str(page)))
+			if retno == 404:
+				return rows
+			self.assertEqual(retno, 200)
+			self.assertLessEqual(len(data), int(args.get('page_size', 3)))
+			rows += [row['id'] for row in data]
+			page += 1
+
+	def test_pages_cover_rows (self):
+		self.assertEqual(self.pages({'fields': 'id'}), [1, 2, 4, 5, 6, 7, 8])
+		self.assertEqual(self.pages({'fields': 'id', 'page_size': '2'}), [1, 2, 4, 5, 6, 7, 8])
+
+	def test_ordered_pages_break_ties (self):
+		# Customer dee placed orders 4, 6 and 8, which straddle the page boundary
+		rows = self.pages({'fields': 'id', 'order_by': 'customer_id_name', 'order_dir': 'DESC'})
+		self.assertEqual(rows, [7, 5, 8, 6, 4, 2, 1])
+
+	def test_page_size_capped (self):
+		data, retno = self.apic.context_query_multiple('main_orders', {'page': '2', 'page_size': '10', 'fields': 'id'})
+		self.assertEqual([row['id'] for row in data], [5, 6, 7])
+
+	def test_page_reads_window (self):
+		queries = []
+		query = self.apic.dbc.query
+		def logged (sql, params=None):
+			queries.append((sql, params))
+			return query(sql, params)
+		self.apic.dbc.query = logged
+		data, retno = self.apic.context_query_multiple('main_orders', {'page': '2'})
+		self.assertEqual(len(data), 3)
+		sql, params = queries[-1]
+		self.assertIn('LIMIT %s OFFSET %s', sql)
+		self.assertEqual(params[-2:], (3, 3))
+
+	def test_bad_pages (self):
+		for args in [{}, {'page': '0'}, {'page': 'x'}, {'page': '1', 'page_size': '0'}]:
+			self.assertEqual(self.apic.context_query_multiple('main_orders', args)[1], 400, args)
+
+	def test_no_paging (self):
+		fixture = SQLiteFixture()
+		try:
+			for args in [{'page': '1'}, {'page_size': '2'}]:
+				self.assertEqual(fixture.apic.context_query_multiple('main_orders', args)[1], 400, args)
+		finally:
+			fixture.close()
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Tests checking how the connection pool hands out, reuses and drops connections.
+"""
+
+import threading
+import time
+import unittest
+from sqlite_fixture import SQLiteFixture
+from db.ConnectionPool import ConnectionPool
+
+
+class FakeConnections:
+	"""Opens numbered fake connections, which are alive unless listed in `dead`.
+	"""
+	def __init__ (self):
+		self.opened = 0
+		self.closed = []
+		self.dead = set()
+
+	def open (self):
+		self.opened += 1
+		return self.opened
+
+	def ping (self, raw):
+		return raw not in self.dead
+
+	def close (self, raw):
+		self.closed.append(raw)
+
+	def pool (self, **options):
+		return ConnectionPool(self.open, self.ping, self.close, **options)
+
+
+class ConnectionPoolTest (unittest.TestCase):
+	def setUp (self):
+		self.fake = FakeConnections()
+
+	def test_sizes_checked (self):
+		self.assertRaises(ValueError, self.fake.pool, min_size=2, max_size=1)
+		self.assertRaises(ValueError, self.fake.pool, max_size=0)
+		self.assertRaises(TypeError, self.fake.pool, max_size='2')
+
+	def test_warm_opens_min_size (self):
+		pool = self.fake.pool(min_size=2, max_size=4)
+		pool.warm()
+		self.assertEqual((pool.size, pool.idle, self.fake.opened), (2, 2, 2))
+
+	def test_connection_reused (self):
+		pool = self.fake.pool(min_size=0, max_size=2)
+		with pool.connection() as conn:
+			first = conn.raw
+		with pool.connection() as conn:
+			self.assertEqual(conn.raw, first)
+		self.assertEqual(self.fake.opened, 1)
+
+	def test_dead_connection_replaced (self):
+		pool = self.fake.pool(min_size=0, max_size=2)
+		with pool.connection() as conn:
+			self.fake.dead.add(conn.raw)
+		with pool.connection() as conn:
+			self.assertEqual(conn.raw, 2)
+		self.assertEqual(self.fake.closed, [1])
+		self.assertEqual(pool.size, 1)
+
+	def test_old_connection_recycled (self):
+		pool = self.fake.pool(min_size=0, max_size=2, max_lifetime=0.0)
+		with pool.connection() as conn:
+			pass
+		self.assertEqual(self.fake.closed, [1])
+		self.assertEqual(pool.size, 0)
+
+	def test_idle_connection_evicted (self):
+		pool = self.fake.pool(min_size=1, max_size=3, idle_timeout=0.0)
+		a = pool.acquire()
+		b = pool.acquire()
+		pool.release(a)
+		pool.release(b)
+		time.sleep(0.01)
+		with pool.connection() as conn:
+			pass
+		self.assertEqual(self.fake.closed, [1])
+		self.assertEqual(pool.size, 1)
+
+	def test_error_discards_connection (self):
+		pool = self.fake.pool(min_size=0, max_size=2)
+		try:
+			with pool.connection() as conn:
+				raise KeyError()
+		except KeyError:
+			pass
+		self.assertEqual(self.fake.closed, [1])
+		self.assertEqual((pool.size, pool.idle), (0, 0))
+
+	def test_failed_open_frees_slot (self):
+		pool = ConnectionPool(lambda: 1 / 0, self.fake.ping, self.fake.close, min_size=0, max_size=1)
+		self.assertRaises(ZeroDivisionError, pool.acquire)
+		self.assertEqual(pool.size, 0)
+
+	def test_exhausted_pool_waits (self):
+		pool = self.fake.pool(min_size=0, max_size=1)
+		conn = pool.acquire()
+		self.assertRaises(RuntimeError, pool.acquire, 0.01)
+		threading.Timer(0.05, pool.release, [conn]).start()
+		self.assertEqual(pool.acquire(1.0).raw, conn.raw)
+		self.assertEqual(self.fake.opened, 1)
+
+
+class DatabasePoolTest (unittest.TestCase):
+	def test_queries_share_connections (self):
+		fixture = SQLiteFixture()
+		try:
+			dbc = fixture.apic.dbc
+			results = []
+			threads = [threading.Thread(target=lambda: results.append(dbc.query('SELECT COUNT(*) FROM orders'))) for i in range(20)]
+			for t in threads:
+				t.start()
+			for t in threads:
+				t.join()
+			self.assertEqual(results, [[(8,)]] * 20)
+			self.assertLessEqual(dbc.pool.size, dbc.pool.max_size)
+			self.assertEqual(dbc.pool.idle, dbc.pool.size)
+		finally:
+			fixture.close()
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Tests checking that projected queries return the same rows as the full query.
+"""
+
+import unittest
+from sqlite_fixture import SQLiteFixture
+
+
+class ProjectionTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture()
+		self.apic = self.fixture.apic
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def ids (self, args):
+		data, retno = self.apic.context_query_multiple('main_orders', args)
+		self.assertEqual(retno, 200)
+		return sorted([row['id'] for row in data])
+
+	def test_fields_keep_rows (self):
+		full = self.ids({})
+		self.assertNotIn(3, full)
+		self.assertEqual(self.ids({'fields': 'id'}), full)
+		self.assertEqual(self.ids({'fields': 'id,total'}), full)
+
+	def test_fields_return_only_fields (self):
+		data, retno = self.apic.context_query_multiple('main_orders', {'fields': 'total'})
+		self.assertEqual(retno, 200)
+		self.assertEqual(len(data), len(self.ids({})))
+		for row in data:
+			self.assertEqual(list(row), ['total'])
+
+	def test_expand_keeps_rows (self):
+		full = self.ids({})
+		self.assertEqual(self.ids({'expand': ''}), full)
+		self.assertEqual(self.ids({'expand': 'customer_id'}), full)
+
+	def test_only_not_null_joins_pruned (self):
+		plan = self.apic.plans['main_orders']
+		rels = plan.relations_by_name
+		self.assertNotIn(rels['customer_id'].index, plan.prunable)
+		self.assertIn(rels['ship_id'].index, plan.prunable)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Tests checking that streamed list results match the buffered ones and free their connection.
+"""
+
+import asyncio
+import threading
+import unittest
+import falcon.testing
+from sqlite_fixture import SQLiteFixture
+from api.APIExecutor import APIExecutor
+from api.BusyError import BusyError
+from api.RowStream import RowStream
+from FalconAPI import FalconAPI
+
+
+class StreamTest (unittest.TestCase):
+	def setUp (self):
+		self.fixture = SQLiteFixture(stream_chunk=3)
+		self.apic = self.fixture.apic
+
+	def tearDown (self):
+		self.fixture.close()
+
+	def stream (self, args, context='main_orders'):
+		stream, retno = self.apic.context_stream_multiple(context, args)
+		self.assertEqual(retno, 200)
+		self.assertIsInstance(stream, RowStream)
+		return stream
+
+	def test_stream_matches_query (self):
+		for args in [{}, {'fields': 'id,total'}, {'order_by': 'total', 'order_dir': 'DESC'}, {'total': '40', 'total_comp': 'GTE'}]:
+			data, retno = self.apic.context_query_multiple('main_orders', args)
+			stream = self.stream(args)
+			self.assertFalse(stream.buffered)
+			chunks = list(stream)
+			self.assertEqual([len(c) for c in chunks][:-1], [3] * (len(chunks) - 1), args)
+			self.assertEqual([row for chunk in chunks for row in chunk], data, args)
+
+	def test_raw_rows (self):
+		stream = self.stream({'fields': 'id'}).raw()
+		self.assertEqual(sorted([row for chunk in stream for row in chunk]), [(i,) for i in [1, 2, 4, 5, 6, 7, 8]])
+
+	def test_empty_stream (self):
+		self.assertEqual(list(self.stream({'total': '1000'})), [])
+
+	def test_closed_stream_frees_connection (self):
+		pool = self.apic.dbc.pool
+		it = iter(self.stream({}))
+		next(it)
+		self.assertEqual(pool.idle, pool.size - 1)
+		it.close()
+		self.assertEqual(pool.idle, pool.size)
+
+	def test_paged_stream_buffered (self):
+		fixture = SQLiteFixture(page_lim=3)
+		try:
+			stream, retno = fixture.apic.context_stream_multiple('main_orders', {'page': '1'})
+			self.assertTrue(stream.buffered)
+			self.assertEqual(len(list(stream)[0]), 3)
+		finally:
+			fixture.close()
+
+	def test_response_body (self):
+		data, retno = self.apic.context_query_multiple('main_orders', {})
+		client = falcon.testing.TestClient(FalconAPI(self.apic).run_app())
+		resp = client.simulate_get('/api/main_orders')
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(resp.json, data)
+		resp = client.simulate_get('/api/main_orders', params={'total': '1000'})
+		self.assertEqual(resp.status_code, 404)
+
+	def test_busy_iteration_rejected (self):
+		executor = APIExecutor(workers=1, max_pending=0)
+		release = threading.Event()
+		async def pull ():
+			blocked = asyncio.ensure_future(executor.run(release.wait, 5.0))
+			await asyncio.sleep(0.05)
+			try:
+				async for chunk in executor.iterate(self.stream({})):
+					pass
+			finally:
+				release.set()
+				await blocked
+		self.assertRaises(BusyError, asyncio.run, pull())
+		executor.shutdown()
+
+
+if __name__ == '__main__':
+	unittest.main()